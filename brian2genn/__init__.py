@@ -3,6 +3,7 @@ import warnings
 
 from brian2genn.codeobject import GeNNCodeObject
 from brian2genn.device import genn_device
+from brian2genn.parallel import run_networks
 # Register preferences and the binomial implementation:
 import brian2genn.preferences
 import brian2genn.binomial
@@ -0,0 +1,84 @@
+#pragma once
+
+// Helper functions for batched simulations, i.e. for simulating several
+// instances of the model in parallel. StateMonitors record the values of all
+// instances into the same arrays, one row for each instance per time step.
+
+#include <vector>
+#include <string>
+#include <fstream>
+#include <iostream>
+#include <utility>
+#include "brianlib/dynamic_array.h"
+
+#ifdef _WIN32
+#include <direct.h>
+#define b2g_chdir _chdir
+#else
+#include <unistd.h>
+#define b2g_chdir chdir
+#endif
+
+namespace b2g {
+
+// Write the rows recorded for the given model instance to a file
+template<class T>
+void write_batch_rows(std::vector<T> &values, unsigned int batch,
+                      unsigned int batchSize, const std::string &filename)
+{
+    std::ofstream outfile(filename.c_str(), std::ios::binary | std::ios::out);
+    if (!outfile.is_open())
+    {
+        std::cerr << "Error writing output file " << filename << std::endl;
+        return;
+    }
+    for (size_t row = batch; row < values.size(); row += batchSize)
+    {
+        outfile.write(reinterpret_cast<char*>(&values[row]), sizeof(T));
+    }
+}
+
+template<class T>
+void write_batch_rows(DynamicArray2D<T> &values, unsigned int batch,
+                      unsigned int batchSize, const std::string &filename)
+{
+    std::ofstream outfile(filename.c_str(), std::ios::binary | std::ios::out);
+    if (!outfile.is_open())
+    {
+        std::cerr << "Error writing output file " << filename << std::endl;
+        return;
+    }
+    for (int row = batch; row < values.n; row += batchSize)
+    {
+        if (!values(row).empty())
+        {
+            outfile.write(reinterpret_cast<char*>(&values(row, 0)), values.m*sizeof(T));
+        }
+    }
+}
+
+// Only keep the rows recorded for the first model instance
+template<class T>
+void compact_batch_rows(std::vector<T> &values, unsigned int batchSize)
+{
+    const size_t rows = values.size() / batchSize;
+    for (size_t row = 1; row < rows; row++)
+    {
+        values[row] = values[row*batchSize];
+    }
+    values.resize(rows);
+}
+
+template<class T>
+void compact_batch_rows(DynamicArray2D<T> &values, unsigned int batchSize)
+{
+    const int rows = values.n / batchSize;
+    for (int row = 1; row < rows; row++)
+    {
+        // Swapping the row vectors does not copy any data
+        std::swap(values(row), values(row*batchSize));
+    }
+    values.resize(rows, values.m);
+}
+
+} // namespace b2g
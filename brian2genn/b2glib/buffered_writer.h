@@ -0,0 +1,138 @@
+#pragma once
+
+// Writing recorded values to disk during the simulation (see the
+// devices.genn.spike_monitor_streaming and devices.genn.state_monitor_streaming
+// preferences). Values are collected in a buffer of fixed size, and full
+// buffers are appended to the file by a background thread. Memory use is
+// therefore bounded by two buffers.
+
+#include <condition_variable>
+#include <cstdio>
+#include <cstring>
+#include <iostream>
+#include <mutex>
+#include <string>
+#include <thread>
+#include <utility>
+#include <vector>
+#include "brianlib/stdint_compat.h"
+
+namespace b2g {
+
+class BufferedWriter
+{
+public:
+    BufferedWriter() : m_file(NULL), m_capacity(0), m_pending(false), m_stop(false)
+    {
+    }
+
+    ~BufferedWriter()
+    {
+        close();
+    }
+
+    // Start a new file, with a buffer of the given size (in bytes)
+    bool open(const std::string &filename, size_t capacity)
+    {
+        close();
+        // Do not overwrite the previous file, it might still be memory-mapped
+        std::remove(filename.c_str());
+        m_file = fopen(filename.c_str(), "wb");
+        if (m_file == NULL)
+        {
+            std::cerr << "Error writing output file " << filename << std::endl;
+            return false;
+        }
+        m_capacity = capacity;
+        m_buffer.reserve(m_capacity);
+        m_writing.reserve(m_capacity);
+        m_pending = false;
+        m_stop = false;
+        m_thread = std::thread(&BufferedWriter::write_buffers, this);
+        return true;
+    }
+
+    void write(const void *data, size_t size)
+    {
+        const char *bytes = static_cast<const char*>(data);
+        m_buffer.insert(m_buffer.end(), bytes, bytes + size);
+        if (m_buffer.size() >= m_capacity)
+            hand_over();
+    }
+
+    // Write all values recorded so far to the file
+    void flush()
+    {
+        if (m_file == NULL)
+            return;
+        hand_over();
+        std::unique_lock<std::mutex> lock(m_mutex);
+        m_condition.wait(lock, [this] { return !m_pending; });
+        fflush(m_file);
+    }
+
+    void close()
+    {
+        if (m_file == NULL)
+            return;
+        flush();
+        {
+            std::lock_guard<std::mutex> lock(m_mutex);
+            m_stop = true;
+        }
+        m_condition.notify_all();
+        m_thread.join();
+        fclose(m_file);
+        m_file = NULL;
+    }
+
+private:
+    // Writers cannot be copied
+    BufferedWriter(const BufferedWriter&);
+    BufferedWriter &operator=(const BufferedWriter&);
+
+    // Pass the current buffer to the writing thread (waiting until it has
+    // finished writing the previous one)
+    void hand_over()
+    {
+        std::unique_lock<std::mutex> lock(m_mutex);
+        m_condition.wait(lock, [this] { return !m_pending; });
+        std::swap(m_buffer, m_writing);
+        m_pending = true;
+        lock.unlock();
+        m_condition.notify_all();
+    }
+
+    void write_buffers()
+    {
+        std::unique_lock<std::mutex> lock(m_mutex);
+        while (true)
+        {
+            m_condition.wait(lock, [this] { return m_pending || m_stop; });
+            if (!m_pending)
+                return;
+            lock.unlock();
+            if (!m_writing.empty()
+                && fwrite(&m_writing[0], 1, m_writing.size(), m_file) != m_writing.size())
+            {
+                std::cerr << "Error writing recorded values" << std::endl;
+            }
+            m_writing.clear();
+            lock.lock();
+            m_pending = false;
+            m_condition.notify_all();
+        }
+    }
+
+    FILE *m_file;
+    size_t m_capacity;
+    std::vector<char> m_buffer;
+    std::vector<char> m_writing;
+    bool m_pending;
+    bool m_stop;
+    std::mutex m_mutex;
+    std::condition_variable m_condition;
+    std::thread m_thread;
+};
+
+} // namespace b2g
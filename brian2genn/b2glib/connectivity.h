@@ -0,0 +1,64 @@
+#pragma once
+
+// Choosing the connectivity format of synapses with the connectivity 'AUTO'
+// (see the devices.genn.connectivity preference) during the model definition,
+// based on the number of synapses of each presynaptic neuron that was
+// determined in the dry run of the synapse creation. The chosen formats are
+// stored in a header file that is included by main.cpp.
+
+#include <string>
+#include <vector>
+#include "brianlib/stdint_compat.h"
+
+#define B2G_DENSE 1
+#define B2G_SPARSE 2
+#define B2G_BITMASK 3
+
+namespace b2g {
+
+// The dense formats process all possible synapses of a presynaptic neuron
+// for each of its spikes, they are therefore only used if at least this
+// fraction of all neuron pairs is connected
+const double DENSE_MIN_FILL = 0.5;
+
+// Return the format (B2G_DENSE, B2G_SPARSE or B2G_BITMASK) that needs the
+// least memory, given the number of synapses of each presynaptic neuron and
+// the size of the variables of a synapse in bytes
+inline int choose_connectivity(const std::vector<int32_t> &N_outgoing, int srcNN, int trgNN,
+                               size_t synapse_bytes, bool allow_bitmask)
+{
+    size_t synapses = 0;
+    size_t maxRowLength = 0;
+    for (size_t i = 0; i < N_outgoing.size(); i++)
+    {
+        synapses += N_outgoing[i];
+        if ((size_t)N_outgoing[i] > maxRowLength)
+            maxRowLength = N_outgoing[i];
+    }
+    const double pairs = (double)srcNN * trgNN;
+    if (synapses == 0 || synapses < DENSE_MIN_FILL * pairs)
+        return B2G_SPARSE;
+    // row lengths, postsynaptic indices and variables of the ragged matrix
+    const double sparseBytes = (double)srcNN * (sizeof(unsigned int) +
+                                                maxRowLength * (sizeof(uint32_t) + synapse_bytes));
+    // variables and the hidden weight matrix marking existing synapses
+    const double denseBytes = pairs * (synapse_bytes + 1);
+    const double bitmaskBytes = pairs / 8;
+    if (allow_bitmask && bitmaskBytes < sparseBytes)
+        return B2G_BITMASK;
+    if (denseBytes < sparseBytes)
+        return B2G_DENSE;
+    return B2G_SPARSE;
+}
+
+inline std::string connectivity_name(int connectivity)
+{
+    switch (connectivity)
+    {
+        case B2G_DENSE: return "DENSE";
+        case B2G_BITMASK: return "BITMASK";
+        default: return "SPARSE";
+    }
+}
+
+} // namespace b2g
@@ -5,44 +5,56 @@
 #include <string>
 #include <fstream>
 #include <iostream>
+#include <algorithm>
 #include <cmath>
+#include <cstring>
+#include <cstddef>
+#include <vector>
 
-template<class scalar>
-void convert_dynamic_arrays_2_dense_matrix(vector<int32_t> &source, vector<int32_t> &target, vector<scalar> &gvector, scalar *g, int srcNN, int trgNN)
-{
-    assert(source.size() == target.size());
-    assert(source.size() == gvector.size());
-    unsigned int size= source.size(); 
-    for (int s= 0; s < srcNN; s++) {
-        for (int t= 0; t < trgNN; t++) {
-            g[s*trgNN+t]= (scalar)NAN;
-        }
-    }
+// The conversions below only touch the existing synapses (apart from clearing
+// dense matrices with memset), and run in parallel if compiled with OpenMP.
 
-    for (int i= 0; i < size; i++) {
+// Exit if the same pair of neurons is connected more than once, which cannot
+// be represented with DENSE or BITMASK connectivity
+void check_unique_synapses(const vector<int32_t> &source, const vector<int32_t> &target, int srcNN, int trgNN)
+{
+    const size_t size= source.size();
+    std::vector<uint64_t> seen(((size_t)srcNN * trgNN + 63) / 64, 0);
+    for (size_t i= 0; i < size; i++) {
         assert(source[i] < srcNN);
         assert(target[i] < trgNN);
-        // Check for duplicate entries
-        if (! std::isnan(g[source[i]*trgNN+target[i]])) {
+        const size_t index= (size_t)source[i] * trgNN + target[i];
+        const uint64_t bit= (uint64_t)1 << (index % 64);
+        if (seen[index / 64] & bit) {
             std::cerr << "*****" << std::endl;
-            std::cerr << "ERROR  Cannot run GeNN simulation: More than one synapse for pair " << source[i] << " - " << target[i] << " and DENSE connectivity used." << std::endl;
+            std::cerr << "ERROR  Cannot run GeNN simulation: More than one synapse for pair " << source[i] << " - " << target[i] << " and DENSE or BITMASK connectivity used." << std::endl;
             std::cerr << "*****" << std::endl;
             exit(222);
         }
-        g[source[i]*trgNN+target[i]]= gvector[i];
-    }
-    for (int s= 0; s < srcNN; s++) {
-        for (int t= 0; t < trgNN; t++) {
-	  if (std::isnan(g[s*trgNN+t]))
-                g[s*trgNN+t] = 0.0;
-        }
+        seen[index / 64] |= bit;
     }
 }
 
-namespace b2g {
-    unsigned int FULL_MONTY= 0;
-    unsigned int COPY_ONLY= 1;
-};
+// Use check_duplicates=false if the connectivity has already been checked
+// (e.g. when copying values during the simulation)
+template<class scalar>
+void convert_dynamic_arrays_2_dense_matrix(vector<int32_t> &source, vector<int32_t> &target, vector<scalar> &gvector, scalar *g, int srcNN, int trgNN,
+                                           bool check_duplicates= true)
+{
+    assert(source.size() == target.size());
+    assert(source.size() == gvector.size());
+    const ptrdiff_t size= source.size();
+    if (check_duplicates)
+        check_unique_synapses(source, target, srcNN, trgNN);
+    // All bits zero is 0.0 for floating point types as well
+    memset(g, 0, (size_t)srcNN * trgNN * sizeof(scalar));
+#ifdef _OPENMP
+    #pragma omp parallel for
+#endif
+    for (ptrdiff_t i= 0; i < size; i++) {
+        g[(size_t)source[i] * trgNN + target[i]]= gvector[i];
+    }
+}
 
 void initialize_sparse_synapses(const vector<int32_t> &source, const vector<int32_t> &target,
                                 unsigned int *rowLength, unsigned int *ind, unsigned int maxRowLength,
@@ -53,30 +65,68 @@ void initialize_sparse_synapses(const vector<int32_t> &source, const vector<int3
     std::fill_n(rowLength, srcNN, 0);
 
     const size_t size = source.size();
+    indices.assign(size, 0);
 
-    // Reserve indices
-    indices.clear();
-    indices.reserve(size);
-
-    // Loop through input arrays
+    // Append the synapses to their rows in Brian's order, and check whether
+    // the postsynaptic indices in each row are in ascending order
+    std::vector<bool> unsorted(srcNN, false);
     for (size_t i= 0; i < size; i++) {
         assert(source[i] < srcNN);
         assert(target[i] < trgNN);
+        const size_t rowStart = (size_t)source[i] * maxRowLength;
+        const unsigned int length = rowLength[source[i]];
+        if (length > 0 && ind[rowStart + length - 1] > (unsigned int)target[i])
+            unsorted[source[i]] = true;
+        indices[i] = rowStart + length;
+        ind[rowStart + length] = target[i];
+        rowLength[source[i]]++;
+    }
 
-        // Calculate index of synapse in ragged structure
-        const size_t index = (source[i] * maxRowLength) + rowLength[source[i]];
-
-        // Add index to vector and insert postsynaptic index into correct location
-        // **TODO** insert in correct position to keep sorted
-        indices.push_back(index);
+    // Brian's synapse generation usually creates sorted rows, so that we are
+    // done in most cases
+    bool anyUnsorted = false;
+    for (int s= 0; s < srcNN && !anyUnsorted; s++)
+        anyUnsorted = unsorted[s];
+    if (!anyUnsorted)
+        return;
+
+    // Otherwise, order the synapses by postsynaptic index with a counting
+    // sort, and append them to their rows again in this order. The sort is
+    // stable, i.e. multiple synapses between the same pair of neurons stay in
+    // Brian's order.
+    std::vector<size_t> targetStart(trgNN + 1, 0);
+    for (size_t i= 0; i < size; i++)
+        targetStart[target[i] + 1]++;
+    for (int t= 0; t < trgNN; t++)
+        targetStart[t + 1] += targetStart[t];
+    std::vector<size_t> byTarget(size);
+    for (size_t i= 0; i < size; i++)
+        byTarget[targetStart[target[i]]++] = i;
+    std::fill_n(rowLength, srcNN, 0);
+    for (size_t k= 0; k < size; k++) {
+        const size_t i = byTarget[k];
+        const size_t index = ((size_t)source[i] * maxRowLength) + rowLength[source[i]];
+        indices[i] = index;
         ind[index] = target[i];
-
-        // Increment row length
         rowLength[source[i]]++;
     }
 }
 
 
+// For synapses created by GeNN, the synapses are stored in Brian's arrays in
+// the order of the ragged matrix, only the position of each synapse in the
+// ragged matrix has to be determined
+void initialize_sparse_synapse_indices(const unsigned int *rowLength, unsigned int maxRowLength,
+                                       int srcNN, vector<size_t> &indices)
+{
+    indices.clear();
+    for (int i= 0; i < srcNN; i++) {
+        const size_t rowStart = (size_t)i * maxRowLength;
+        for (unsigned int k= 0; k < rowLength[i]; k++)
+            indices.push_back(rowStart + k);
+    }
+}
+
 template<class scalar>
 void convert_dynamic_arrays_2_sparse_synapses(const vector<scalar> &gvector, const vector<size_t> &indices,
                                               scalar *gv, int srcNN, int trgNN)
@@ -94,50 +144,55 @@ void convert_dense_matrix_2_dynamic_arrays(scalar *g, int srcNN, int trgNN, vect
 {
     assert(source.size() == target.size());
     assert(source.size() == gvector.size());
-    unsigned int size= source.size(); 
-    for (int i= 0; i < size; i++) {
+    const ptrdiff_t size= source.size();
+#ifdef _OPENMP
+    #pragma omp parallel for
+#endif
+    for (ptrdiff_t i= 0; i < size; i++) {
         assert(source[i] < srcNN);
         assert(target[i] < trgNN);
-        gvector[i]= g[source[i]*trgNN+target[i]];
+        gvector[i]= g[(size_t)source[i] * trgNN + target[i]];
     }
 }
 
+// Copy the values from the ragged structure back into Brian's order, using
+// the positions stored by initialize_sparse_synapses. The connectivity itself
+// never changes during the simulation, i.e. Brian's _synaptic_pre and
+// _synaptic_post arrays stay valid.
 template<class scalar>
-void convert_sparse_synapses_2_dynamic_arrays(unsigned int *rowLength, unsigned int *ind, unsigned int maxRowLength,
-                                              scalar *gv, int srcNN, int trgNN, vector<int32_t> &source, vector<int32_t> &target, vector<scalar> &gvector, unsigned int mode)
+void convert_sparse_synapses_2_dynamic_arrays(const scalar *gv, const vector<size_t> &indices, vector<scalar> &gvector)
 {
-// note: this does not preserve the original order of entries in the brian arrays - is that a problem?
-    if (mode == b2g::FULL_MONTY) {
-        assert(source.size() == target.size());
-        assert(source.size() == gvector.size());
-        size_t cnt= 0;
-        for (int i= 0; i < srcNN; i++) {
-            for (int j= 0; j < rowLength[i]; j++) {
-                source[cnt]= i;
-                target[cnt]= ind[(i * maxRowLength) + j];
-                gvector[cnt]= gv[(i * maxRowLength) + j];
-                cnt++;
-            }
-        }
-    }
-    else {
-        size_t cnt= 0;
-        for (int i= 0; i < srcNN; i++) {
-            for (int j= 0; j < rowLength[i]; j++) {
-                gvector[cnt++]= gv[(i * maxRowLength) + j];
-            }
-        }
+    assert(gvector.size() == indices.size());
+    const ptrdiff_t size= indices.size();
+#ifdef _OPENMP
+    #pragma omp parallel for
+#endif
+    for (ptrdiff_t i= 0; i < size; i++) {
+        gvector[i]= gv[indices[i]];
     }
 }
 
 void create_hidden_weightmatrix(vector<int32_t> &source, vector<int32_t> &target, char* hwm, int srcNN, int trgNN)
 {
-    for (int s= 0; s < srcNN; s++) {
-    for (int t= 0; t < trgNN; t++) {
-        hwm[s*trgNN+t]= 0;
-    }
+    const ptrdiff_t size= source.size();
+    memset(hwm, 0, (size_t)srcNN * trgNN);
+#ifdef _OPENMP
+    #pragma omp parallel for
+#endif
+    for (ptrdiff_t i= 0; i < size; i++) {
+        hwm[(size_t)source[i] * trgNN + target[i]]= 1;
     }
-    for (int i= 0; i < source.size(); i++) {
-    hwm[source[i]*trgNN+target[i]]= 1;
+}
+
+// Set the bits of GeNN's BITMASK connectivity (one bit per pair of neurons,
+// in row-major order) for the existing synapses
+void create_bitmask(const vector<int32_t> &source, const vector<int32_t> &target, uint32_t *gp, int srcNN, int trgNN)
+{
+    const size_t size= source.size();
+    check_unique_synapses(source, target, srcNN, trgNN);
+    memset(gp, 0, ((size_t)srcNN * trgNN + 31) / 32 * sizeof(uint32_t));
+    for (size_t i= 0; i < size; i++) {
+        const size_t index= (size_t)source[i] * trgNN + target[i];
+        gp[index / 32] |= (uint32_t)1 << (index % 32);
     }
 }
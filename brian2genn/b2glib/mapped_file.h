@@ -0,0 +1,128 @@
+#pragma once
+
+// Memory-mapping a file, used to access the packed static arrays without
+// reading and copying them (see the devices.genn.packed_static_arrays
+// preference). The mapping is private, i.e. writing to the mapped memory
+// does not change the file.
+
+#include <cstddef>
+#include <iostream>
+#include <string>
+
+#ifdef _WIN32
+#include <windows.h>
+#else
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+
+namespace b2g {
+
+class MappedFile
+{
+public:
+    MappedFile() : m_data(NULL), m_size(0)
+#ifdef _WIN32
+        , m_file(INVALID_HANDLE_VALUE), m_mapping(NULL)
+#endif
+    {
+    }
+
+    ~MappedFile()
+    {
+        close();
+    }
+
+    // Map the file, which has to have (at least) the given size
+    bool open(const std::string &filename, size_t size)
+    {
+        close();
+#ifdef _WIN32
+        m_file = CreateFileA(filename.c_str(), GENERIC_READ, FILE_SHARE_READ,
+                             NULL, OPEN_EXISTING, FILE_ATTRIBUTE_NORMAL, NULL);
+        if (m_file == INVALID_HANDLE_VALUE)
+        {
+            std::cerr << "Error opening static array file " << filename << std::endl;
+            return false;
+        }
+        LARGE_INTEGER file_size;
+        if (!GetFileSizeEx(m_file, &file_size) || (size_t)file_size.QuadPart < size)
+        {
+            std::cerr << "Static array file " << filename << " is too small" << std::endl;
+            close();
+            return false;
+        }
+        m_mapping = CreateFileMappingA(m_file, NULL, PAGE_WRITECOPY, 0, 0, NULL);
+        if (m_mapping != NULL)
+        {
+            m_data = static_cast<char*>(MapViewOfFile(m_mapping, FILE_MAP_COPY, 0, 0, size));
+        }
+#else
+        int fd = ::open(filename.c_str(), O_RDONLY);
+        if (fd == -1)
+        {
+            std::cerr << "Error opening static array file " << filename << std::endl;
+            return false;
+        }
+        struct stat file_stat;
+        if (fstat(fd, &file_stat) != 0 || (size_t)file_stat.st_size < size)
+        {
+            std::cerr << "Static array file " << filename << " is too small" << std::endl;
+            ::close(fd);
+            return false;
+        }
+        void *data = mmap(NULL, size, PROT_READ | PROT_WRITE, MAP_PRIVATE, fd, 0);
+        // The mapping stays valid after closing the file descriptor
+        ::close(fd);
+        m_data = (data == MAP_FAILED) ? NULL : static_cast<char*>(data);
+#endif
+        if (m_data == NULL)
+        {
+            std::cerr << "Error mapping static array file " << filename << std::endl;
+            close();
+            return false;
+        }
+        m_size = size;
+        return true;
+    }
+
+    void close()
+    {
+#ifdef _WIN32
+        if (m_data != NULL)
+            UnmapViewOfFile(m_data);
+        if (m_mapping != NULL)
+            CloseHandle(m_mapping);
+        if (m_file != INVALID_HANDLE_VALUE)
+            CloseHandle(m_file);
+        m_mapping = NULL;
+        m_file = INVALID_HANDLE_VALUE;
+#else
+        if (m_data != NULL)
+            munmap(m_data, m_size);
+#endif
+        m_data = NULL;
+        m_size = 0;
+    }
+
+    char *data()
+    {
+        return m_data;
+    }
+
+private:
+    // Mappings cannot be copied
+    MappedFile(const MappedFile&);
+    MappedFile &operator=(const MappedFile&);
+
+    char *m_data;
+    size_t m_size;
+#ifdef _WIN32
+    HANDLE m_file;
+    HANDLE m_mapping;
+#endif
+};
+
+} // namespace b2g
@@ -0,0 +1,30 @@
+#pragma once
+
+// Reading the values of a variable from a binary file (used to change
+// variables between runs of a persistent simulation)
+
+#include <string>
+#include <fstream>
+#include <iostream>
+
+namespace b2g {
+
+template<class T>
+bool read_array(const std::string &filename, T *data, size_t size)
+{
+    std::ifstream infile(filename.c_str(), std::ios::binary | std::ios::in);
+    if (!infile.is_open())
+    {
+        std::cerr << "Error opening input file " << filename << std::endl;
+        return false;
+    }
+    infile.read(reinterpret_cast<char*>(data), size*sizeof(T));
+    if (infile.gcount() != (std::streamsize)(size*sizeof(T)))
+    {
+        std::cerr << "Error reading " << size << " values from input file " << filename << std::endl;
+        return false;
+    }
+    return true;
+}
+
+} // namespace b2g
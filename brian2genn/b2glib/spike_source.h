@@ -0,0 +1,48 @@
+#pragma once
+
+// Converting the spikes of a SpikeGeneratorGroup into the format used by the
+// spike generator neurons simulated by GeNN (see the
+// devices.genn.spike_generator_on_device preference): the time bins of the
+// spikes of neuron i are stored consecutively, in the range
+// [startSpike[i], endSpike[i]), and nextSpike[i] is the first spike that has
+// not been emitted yet.
+
+#include <algorithm>
+#include <vector>
+#include "brianlib/stdint_compat.h"
+
+namespace b2g {
+
+// Brian stores the spikes sorted by time, the (stable) sort by neuron index
+// therefore keeps the spikes of each neuron sorted by time. Spikes before
+// lastindex lie before the start of the run, and are skipped.
+inline std::vector<int32_t> sort_spikes_by_neuron(const std::vector<int32_t> &neuron_index,
+                                                  const std::vector<int32_t> &timebins,
+                                                  int32_t lastindex, unsigned int N,
+                                                  unsigned int *startSpike,
+                                                  unsigned int *endSpike,
+                                                  unsigned int *nextSpike)
+{
+    std::fill_n(endSpike, N, 0);
+    for (size_t k = 0; k < neuron_index.size(); k++)
+        endSpike[neuron_index[k]]++;
+    unsigned int total = 0;
+    for (unsigned int i = 0; i < N; i++)
+    {
+        startSpike[i] = total;
+        total += endSpike[i];
+        endSpike[i] = startSpike[i];
+    }
+    std::copy_n(startSpike, N, nextSpike);
+    std::vector<int32_t> sorted_timebins(neuron_index.size());
+    for (size_t k = 0; k < neuron_index.size(); k++)
+    {
+        const int32_t i = neuron_index[k];
+        if ((int64_t)k < lastindex)
+            nextSpike[i]++;
+        sorted_timebins[endSpike[i]++] = timebins[k];
+    }
+    return sorted_timebins;
+}
+
+} // namespace b2g
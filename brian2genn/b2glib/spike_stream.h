@@ -0,0 +1,47 @@
+#pragma once
+
+// Writing the spikes recorded by a SpikeMonitor to disk during the simulation
+// (see the devices.genn.spike_monitor_streaming preference). The file stores
+// one packed record (int32_t index, double time) per spike.
+
+#include <cstring>
+#include <string>
+#include "brianlib/stdint_compat.h"
+#include "b2glib/buffered_writer.h"
+
+namespace b2g {
+
+class SpikeStream
+{
+public:
+    static const size_t RECORD_SIZE = sizeof(int32_t) + sizeof(double);
+
+    // Start a new file, with a buffer for the given number of spikes
+    bool open(const std::string &filename, size_t capacity)
+    {
+        return m_writer.open(filename, capacity * RECORD_SIZE);
+    }
+
+    void push(int32_t index, double time)
+    {
+        char record[RECORD_SIZE];
+        memcpy(record, &index, sizeof(int32_t));
+        memcpy(record + sizeof(int32_t), &time, sizeof(double));
+        m_writer.write(record, RECORD_SIZE);
+    }
+
+    void flush()
+    {
+        m_writer.flush();
+    }
+
+    void close()
+    {
+        m_writer.close();
+    }
+
+private:
+    BufferedWriter m_writer;
+};
+
+} // namespace b2g
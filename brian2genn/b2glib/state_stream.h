@@ -0,0 +1,52 @@
+#pragma once
+
+// Writing the values recorded by a StateMonitor to disk during the simulation
+// (see the devices.genn.state_monitor_streaming preference). Each recorded
+// variable (and the time) is written to its own file, which stores one row of
+// values (one value per recorded index) per recorded time step.
+
+#include <string>
+#include <vector>
+#include "b2glib/buffered_writer.h"
+
+namespace b2g {
+
+template<class T>
+class StateStream
+{
+public:
+    // Start a new file for rows of the given size, with a buffer for the
+    // given number of rows
+    bool open(const std::string &filename, size_t row_size, size_t buffer_rows)
+    {
+        m_row.assign(row_size, T());
+        return m_writer.open(filename, row_size * sizeof(T) * buffer_rows);
+    }
+
+    // The row that is written by the next call to push_row
+    T *row()
+    {
+        return m_row.data();
+    }
+
+    void push_row()
+    {
+        m_writer.write(m_row.data(), m_row.size() * sizeof(T));
+    }
+
+    void flush()
+    {
+        m_writer.flush();
+    }
+
+    void close()
+    {
+        m_writer.close();
+    }
+
+private:
+    std::vector<T> m_row;
+    BufferedWriter m_writer;
+};
+
+} // namespace b2g
@@ -0,0 +1,126 @@
+#pragma once
+
+// Storing the synapses created in the model definition, so that the
+// simulation can load them instead of creating them again. Each file stores
+// the synapses created by a single connect call: a header with the number of
+// new synapses and the number of pre- and postsynaptic neurons (as uint64_t),
+// followed by the new presynaptic and postsynaptic indices, the number of
+// outgoing and incoming synapses per neuron after the call (as int32_t), and
+// the state of the random number generator after the call. Restoring the
+// state makes the simulation use the same random numbers as the model
+// definition for everything that is executed after the connect call.
+
+#include <cstdio>
+#include <iostream>
+#include <string>
+#include <vector>
+#include "brianlib/stdint_compat.h"
+#include "brianlib/randomkit/randomkit.h"
+
+namespace b2g {
+
+inline bool write_random_state(const std::string &filename, const rk_state *state)
+{
+    FILE *f = fopen(filename.c_str(), "wb");
+    if (f == NULL)
+    {
+        std::cerr << "Error writing random state file " << filename << std::endl;
+        return false;
+    }
+    bool success = fwrite(state, sizeof(rk_state), 1, f) == 1;
+    success = (fclose(f) == 0) && success;
+    if (!success)
+        std::cerr << "Error writing random state file " << filename << std::endl;
+    return success;
+}
+
+inline bool read_random_state(const std::string &filename, rk_state *state)
+{
+    FILE *f = fopen(filename.c_str(), "rb");
+    if (f == NULL)
+    {
+        std::cerr << "Error opening random state file " << filename << std::endl;
+        return false;
+    }
+    const bool success = fread(state, sizeof(rk_state), 1, f) == 1;
+    fclose(f);
+    if (!success)
+        std::cerr << "Random state file " << filename << " is incomplete" << std::endl;
+    return success;
+}
+
+inline bool write_synapses(const std::string &filename,
+                           const std::vector<int32_t> &pre,
+                           const std::vector<int32_t> &post,
+                           size_t first,
+                           const std::vector<int32_t> &N_incoming,
+                           const std::vector<int32_t> &N_outgoing,
+                           const rk_state *state)
+{
+    FILE *f = fopen(filename.c_str(), "wb");
+    if (f == NULL)
+    {
+        std::cerr << "Error writing synapse file " << filename << std::endl;
+        return false;
+    }
+    const uint64_t header[3] = {pre.size() - first, N_outgoing.size(), N_incoming.size()};
+    bool success = fwrite(header, sizeof(uint64_t), 3, f) == 3;
+    if (header[0] > 0)
+    {
+        success = success &&
+                  fwrite(&pre[first], sizeof(int32_t), header[0], f) == header[0] &&
+                  fwrite(&post[first], sizeof(int32_t), header[0], f) == header[0];
+    }
+    if (header[1] > 0)
+        success = success && fwrite(&N_outgoing[0], sizeof(int32_t), header[1], f) == header[1];
+    if (header[2] > 0)
+        success = success && fwrite(&N_incoming[0], sizeof(int32_t), header[2], f) == header[2];
+    success = success && fwrite(state, sizeof(rk_state), 1, f) == 1;
+    success = (fclose(f) == 0) && success;
+    if (!success)
+        std::cerr << "Error writing synapse file " << filename << std::endl;
+    return success;
+}
+
+// Appends the stored synapses to pre and post, replaces N_incoming and
+// N_outgoing, and restores the state of the random number generator
+inline bool read_synapses(const std::string &filename,
+                          std::vector<int32_t> &pre,
+                          std::vector<int32_t> &post,
+                          std::vector<int32_t> &N_incoming,
+                          std::vector<int32_t> &N_outgoing,
+                          rk_state *state)
+{
+    FILE *f = fopen(filename.c_str(), "rb");
+    if (f == NULL)
+    {
+        std::cerr << "Error opening synapse file " << filename << std::endl;
+        return false;
+    }
+    uint64_t header[3];
+    bool success = fread(header, sizeof(uint64_t), 3, f) == 3;
+    if (success)
+    {
+        const size_t first = pre.size();
+        pre.resize(first + header[0]);
+        post.resize(first + header[0]);
+        N_outgoing.resize(header[1]);
+        N_incoming.resize(header[2]);
+        if (header[0] > 0)
+        {
+            success = fread(&pre[first], sizeof(int32_t), header[0], f) == header[0] &&
+                      fread(&post[first], sizeof(int32_t), header[0], f) == header[0];
+        }
+        if (header[1] > 0)
+            success = success && fread(&N_outgoing[0], sizeof(int32_t), header[1], f) == header[1];
+        if (header[2] > 0)
+            success = success && fread(&N_incoming[0], sizeof(int32_t), header[2], f) == header[2];
+        success = success && fread(state, sizeof(rk_state), 1, f) == 1;
+    }
+    fclose(f);
+    if (!success)
+        std::cerr << "Synapse file " << filename << " is incomplete" << std::endl;
+    return success;
+}
+
+} // namespace b2g
@@ -0,0 +1,42 @@
+#pragma once
+
+// Measuring the wall-clock time of the stages of a simulation run (reported
+// in GeNNDevice.build_timings)
+
+#include <chrono>
+#include <fstream>
+#include <iostream>
+#include <string>
+
+namespace b2g {
+
+typedef std::chrono::steady_clock::time_point time_point;
+
+inline time_point now()
+{
+    return std::chrono::steady_clock::now();
+}
+
+inline double elapsed_seconds(const time_point &start)
+{
+    return std::chrono::duration<double>(now() - start).count();
+}
+
+// Write the times (in seconds) as lines of "<stage> <time>"
+inline void write_stage_timings(const std::string &filename,
+                                double initialisation, double simulation,
+                                double writing_results)
+{
+    std::ofstream outfile(filename.c_str());
+    if (!outfile.is_open())
+    {
+        std::cerr << "Error writing output file " << filename << std::endl;
+        return;
+    }
+    outfile.precision(17);
+    outfile << "initialisation " << initialisation << std::endl;
+    outfile << "simulation " << simulation << std::endl;
+    outfile << "writing_results " << writing_results << std::endl;
+}
+
+} // namespace b2g
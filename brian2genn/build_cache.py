@@ -0,0 +1,231 @@
+'''
+Content-addressed cache for compiled GeNN projects.
+
+Compiling a GeNN project (running ``genn-buildmodel`` and ``make``) takes a
+long time, but its result only depends on the generated source files and on
+the build environment. We therefore compute a hash over all these inputs, and
+reuse the ``main`` executable and the ``magicnetwork_model_CODE`` runner
+library of a previous build with the same hash -- either directly in the
+project directory, or from a shared cache directory.
+'''
+import hashlib
+import os
+import shutil
+import tempfile
+
+from brian2.utils.logger import get_logger
+
+__all__ = ['get_build_hash', 'is_up_to_date', 'mark_as_built',
+           'clear_build_hash', 'restore_from_cache', 'store_in_cache']
+
+logger = get_logger('brian2.devices.genn')
+
+#: Name of the file in the project directory storing the hash of the last build
+BUILD_HASH_FILE = 'brian2genn_build_hash.txt'
+
+# Files and directories that are produced by (or independent of) the build,
+# and should therefore not be part of the hash
+_IGNORED = {'results', 'batch_results', 'server_input', 'test_output',
+            'magicnetwork_model_CODE', 'x64',
+            'main', 'main_Release.exe', 'generator', 'generator.exe',
+            'runtime_parameters.txt', 'synapse_connectivity.h', 'connectivity',
+            BUILD_HASH_FILE}
+_IGNORED_EXTENSIONS = ('.o', '.d', '.a', '.so', '.obj', '.pdb', '.ilk',
+                       '.json')
+
+
+def _build_products():
+    '''
+    The files/directories created by compiling a GeNN project, relative to
+    the project directory. GeNN stores the runner library (``librunner.so``,
+    or ``runner_Release.dll`` on Windows) in ``magicnetwork_model_CODE``, and
+    the model definition stores the synapses it creates in ``connectivity``.
+    '''
+    if os.sys.platform == 'win32':
+        return ['main_Release.exe', 'magicnetwork_model_CODE', 'connectivity']
+    else:
+        return ['main', 'magicnetwork_model_CODE', 'connectivity']
+
+
+def _project_files(directory):
+    '''
+    Return a sorted list of all files in the project directory that are used
+    as an input for the build (relative to ``directory``).
+    '''
+    files = []
+    for root, dirnames, filenames in os.walk(directory):
+        rel_root = os.path.relpath(root, directory)
+        if rel_root == os.curdir:
+            # Only ignore top-level directories
+            dirnames[:] = [d for d in dirnames if d not in _IGNORED]
+            filenames = [f for f in filenames if f not in _IGNORED]
+            rel_root = ''
+        for filename in filenames:
+            if not filename.endswith(_IGNORED_EXTENSIONS):
+                files.append(os.path.join(rel_root, filename))
+    return sorted(files)
+
+
+def get_build_hash(directory, build_info):
+    '''
+    Calculate a hash over all the inputs of a build.
+
+    Parameters
+    ----------
+    directory : str
+        The project directory. All source files, headers, the Makefile and the
+        static arrays (used in the model definition to create the synapses)
+        are taken into account.
+    build_info : list of str
+        Additional information that influences the build, e.g. the GeNN
+        version or the compiler flags.
+
+    Returns
+    -------
+    build_hash : str
+        The hexadecimal representation of the hash.
+    '''
+    hasher = hashlib.sha256()
+    for info in build_info:
+        hasher.update(str(info).encode('utf-8'))
+        hasher.update(b'\0')
+    for filename in _project_files(directory):
+        # Use the same separator on all platforms
+        hasher.update(filename.replace(os.sep, '/').encode('utf-8'))
+        hasher.update(b'\0')
+        with open(os.path.join(directory, filename), 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                hasher.update(chunk)
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
+def is_up_to_date(directory, build_hash):
+    '''
+    Whether the project directory contains the results of a build for the
+    given hash.
+    '''
+    hash_file = os.path.join(directory, BUILD_HASH_FILE)
+    if not all(os.path.exists(os.path.join(directory, product))
+               for product in _build_products()):
+        return False
+    try:
+        with open(hash_file) as f:
+            return f.read().strip() == build_hash
+    except OSError:
+        return False
+
+
+def mark_as_built(directory, build_hash):
+    '''
+    Store the hash of a successful build in the project directory.
+    '''
+    with open(os.path.join(directory, BUILD_HASH_FILE), 'w') as f:
+        f.write(build_hash)
+
+
+def clear_build_hash(directory):
+    '''
+    Remove the stored hash from the project directory (e.g. before starting a
+    new build that might leave the build products in an inconsistent state).
+    '''
+    hash_file = os.path.join(directory, BUILD_HASH_FILE)
+    if os.path.exists(hash_file):
+        os.remove(hash_file)
+
+
+def _copy_products(source_dir, target_dir):
+    for product in _build_products():
+        source = os.path.join(source_dir, product)
+        target = os.path.join(target_dir, product)
+        if os.path.isdir(source):
+            shutil.copytree(source, target, symlinks=True, dirs_exist_ok=True)
+        else:
+            shutil.copy2(source, target)
+
+
+def restore_from_cache(cache_directory, build_hash, directory):
+    '''
+    Copy the build products for the given hash from the shared cache into
+    the project directory.
+
+    Returns
+    -------
+    restored : bool
+        Whether the cache contained a matching build.
+    '''
+    entry = os.path.join(cache_directory, build_hash)
+    if not os.path.isdir(entry):
+        return False
+    # Make sure we do not end up with a mix of old and new files if copying
+    # fails midway
+    clear_build_hash(directory)
+    try:
+        _copy_products(entry, directory)
+    except OSError as ex:
+        logger.debug('Restoring build {} from cache failed: '
+                     '{}'.format(build_hash, str(ex)))
+        return False
+    # Update the access time used for the LRU eviction
+    os.utime(entry)
+    mark_as_built(directory, build_hash)
+    return True
+
+
+def _directory_size(directory):
+    size = 0
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            fname = os.path.join(root, filename)
+            if not os.path.islink(fname):
+                size += os.path.getsize(fname)
+    return size
+
+
+def _evict(cache_directory, max_size, keep):
+    '''
+    Remove the least recently used entries until the total size of the cache
+    is below ``max_size`` bytes. The entry ``keep`` is never removed.
+    '''
+    entries = []
+    for name in os.listdir(cache_directory):
+        entry = os.path.join(cache_directory, name)
+        # Ignore partially written entries
+        if not os.path.isdir(entry) or name.startswith('.'):
+            continue
+        entries.append((os.path.getmtime(entry), _directory_size(entry), entry))
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries):
+        if total_size <= max_size:
+            break
+        if os.path.basename(entry) == keep:
+            continue
+        logger.debug('Removing {} from the GeNN build cache'.format(entry))
+        shutil.rmtree(entry, ignore_errors=True)
+        total_size -= size
+
+
+def store_in_cache(cache_directory, build_hash, directory, max_size):
+    '''
+    Copy the build products from the project directory into the shared
+    cache, and remove old entries if the cache grew larger than ``max_size``
+    bytes.
+    '''
+    os.makedirs(cache_directory, exist_ok=True)
+    entry = os.path.join(cache_directory, build_hash)
+    if os.path.isdir(entry):
+        os.utime(entry)
+    else:
+        # Copy to a temporary directory first and rename it afterwards, so that
+        # concurrent builds never see a partially written entry
+        tmp_dir = tempfile.mkdtemp(prefix='.' + build_hash,
+                                   dir=cache_directory)
+        try:
+            _copy_products(directory, tmp_dir)
+            os.rename(tmp_dir, entry)
+        except OSError as ex:
+            # Most likely, another process stored the same build in the meantime
+            logger.debug('Storing build {} in cache failed: '
+                         '{}'.format(build_hash, str(ex)))
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    _evict(cache_directory, max_size, keep=build_hash)
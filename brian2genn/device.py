@@ -2,11 +2,13 @@
 Module implementing the bulk of the brian2genn interface by defining the "genn" device.
 '''
 
+import json
 import os
 import platform
 import re
 import shutil
 import sys
+import time
 
 from pkg_resources import parse_version
 from subprocess import call, check_call, CalledProcessError
@@ -16,7 +18,9 @@ import tempfile
 import itertools
 import numpy
 import numbers
+import sympy
 from collections import Counter
+from contextlib import contextmanager
 
 from brian2.codegen.cpp_prefs import get_msvc_env
 from brian2.codegen.translation import make_statements
@@ -24,16 +28,18 @@ from brian2.input.poissoninput import PoissonInput
 from brian2.spatialneuron.spatialneuron import (SpatialNeuron,
                                                 SpatialStateUpdater)
 from brian2.units import second
+from brian2.units.fundamentalunits import fail_for_dimension_mismatch
 from brian2.codegen.generators.cpp_generator import (c_data_type,
                                                      CPPCodeGenerator)
 from brian2.codegen.templates import MultiTemplate
-from brian2.core.clocks import defaultclock
+from brian2.core.clocks import Clock, defaultclock
 from brian2.core.variables import *
-from brian2.core.functions import Function
+from brian2.core.functions import Function, DEFAULT_FUNCTIONS
 from brian2.core.network import _get_all_objects
 from brian2.devices.device import all_devices
 from brian2.devices.cpp_standalone.device import CPPStandaloneDevice
 from brian2.parsing.rendering import CPPNodeRenderer
+from brian2.parsing.sympytools import str_to_sympy, sympy_to_str
 from brian2.synapses.synapses import Synapses, SynapticPathway
 from brian2.monitors.spikemonitor import SpikeMonitor
 from brian2.monitors.ratemonitor import PopulationRateMonitor
@@ -53,11 +59,68 @@ from brian2.devices.cpp_standalone.device import CPPWriter
 from brian2 import prefs
 from .codeobject import GeNNCodeObject, GeNNUserCodeObject
 from .genn_generator import get_var_ndim, GeNNCodeGenerator
+from . import build_cache
+from .server import SimulationServer, ACKNOWLEDGEMENT
 
 __all__ = ['GeNNDevice']
 
 logger = get_logger('brian2.devices.genn')
 
+#: Name of the file (in the project directory) storing the values of the
+#: runtime parameters
+RUNTIME_PARAMETERS_FILE = 'runtime_parameters.txt'
+
+#: Name of the directory (in the project directory) storing the results of the
+#: additional model instances in batched simulations
+BATCH_RESULTS_DIRECTORY = 'batch_results'
+
+#: Name of the directory (in the project directory) storing values that are
+#: sent to a persistent simulation
+SERVER_INPUT_DIRECTORY = 'server_input'
+
+#: Name of the file (in the project directory) storing `GeNNDevice.build_timings`
+BUILD_TIMINGS_FILE = 'build_timings.json'
+
+#: Name of the file (in the project directory) where the simulation stores the
+#: time spent in each stage of the run
+STAGE_TIMINGS_FILE = os.path.join('results', 'stage_timings.txt')
+
+#: Name of the file (in the results directory) storing the type and shape of
+#: all result arrays if `devices.genn.memory_mapped_results` is set
+ARRAY_INDEX_FILE = 'array_index.txt'
+
+#: Name of the file (in the ``static_arrays`` directory) storing all static
+#: arrays if `devices.genn.packed_static_arrays` is set
+PACKED_STATIC_ARRAYS_FILE = 'packed_static_arrays.bin'
+
+#: Alignment (in bytes) of the arrays in the packed static array file
+PACKED_STATIC_ARRAYS_ALIGNMENT = 64
+
+#: The connectivity formats for synapses (see `devices.genn.connectivity`)
+CONNECTIVITY_TYPES = ['DENSE', 'SPARSE', 'BITMASK', 'PROCEDURAL', 'AUTO']
+
+#: Name of the connectivity initialisation snippet defined in the model
+#: definition that creates a fixed number of synapses for each presynaptic
+#: neuron, sampling the postsynaptic neurons without replacement
+FIXED_NUMBER_POST_SNIPPET = 'FixedNumberPostWithoutReplacement'
+
+#: Name of the header file (in the project directory) storing the connectivity
+#: formats chosen for synapses with the connectivity 'AUTO'
+CONNECTIVITY_HEADER_FILE = 'synapse_connectivity.h'
+
+#: Name of the directory (in the project directory) storing the synapses that
+#: are created in the model definition, with one file for each ``connect`` call
+CONNECTIVITY_DIRECTORY = 'connectivity'
+#: Name of the file (in `CONNECTIVITY_DIRECTORY`) storing the initial state of
+#: the random number generator in the model definition
+RANDOM_STATE_FILE = 'random_state'
+
+#: The stages reported in `GeNNDevice.build_timings`, in the order in which
+#: they are executed
+BUILD_STAGES = ['code_generation', 'model_processing', 'writing_sources',
+                'genn_buildmodel', 'make', 'run_binary', 'initialisation',
+                'simulation', 'writing_results', 'loading_results']
+
 
 def stringify(code):
     '''
@@ -155,6 +218,25 @@ def extract_source_variables(variables, varname, smvariables):
                                                        smvariables)
     return smvariables
 
+
+def evaluate_constant(expr, variables):
+    '''
+    Evaluate an expression that only refers to constants (e.g. the connection
+    probability of a synapse generator expression). Returns ``None`` if the
+    expression refers to anything else (e.g. a function or a neuronal
+    variable).
+    '''
+    values = {}
+    for identifier in get_identifiers(expr):
+        var = variables.get(identifier, None)
+        if not isinstance(var, Constant):
+            return None
+        values[identifier] = var.value
+    try:
+        return float(eval(expr, {'__builtins__': {}}, values))
+    except Exception:
+        return None
+
 def find_executable(executable):
     """Tries to find 'executable' in the path
 
@@ -173,6 +255,23 @@ def find_executable(executable):
             return f
     return None
 
+def source_statistics(directory, exclude=()):
+    '''
+    Return the number and the total size (in bytes) of all C++/CUDA source
+    and header files in a directory (and its subdirectories), ignoring the
+    top-level subdirectories in ``exclude``.
+    '''
+    n_files = 0
+    total_size = 0
+    for root, dirnames, filenames in os.walk(directory):
+        if root == directory:
+            dirnames[:] = [d for d in dirnames if d not in exclude]
+        for filename in filenames:
+            if filename.endswith(('.cpp', '.cc', '.c', '.cu', '.h')):
+                n_files += 1
+                total_size += os.path.getsize(os.path.join(root, filename))
+    return {'files': n_files, 'bytes': total_size}
+
 class DelayedCodeObject:
     '''
     Dummy class used for delaying the CodeObject creation of stateupdater,
@@ -203,6 +302,9 @@ class neuronModel:
     def __init__(self):
         self.name = ''
         self.clock = None
+        # The number of GeNN time steps between two updates of the group (for
+        # groups on a clock with a larger dt than the defaultclock)
+        self.step = 1
         self.N = 0
         self.variables = []
         self.variabletypes = []
@@ -211,6 +313,20 @@ class neuronModel:
         self.shared_variabletypes = []
         self.parameters = []
         self.pvalue = []
+        self.runtime_parameters = []
+        self.runtime_parametertypes = []
+        # The GeNN variable initialisation snippets and their parameter
+        # values, for variables that are initialised by GeNN
+        self.variable_initialisers = dict()
+        # Extra global parameters for the StateMonitors that record on the
+        # device
+        self.recording_parameters = []
+        self.recording_parametertypes = []
+        # Extra global parameters that state whether a run_regularly
+        # operation executed on the device is due in the current time step
+        self.run_regularly_parameters = []
+        # Whether GeNN records the spikes of this group on the device
+        self.spike_recording = False
         self.code_lines = []
         self.thresh_cond_lines = []
         self.reset_code_lines = []
@@ -225,6 +341,13 @@ class spikegeneratorModel:
         self.name = ''
         self.codeobject_name = ''
         self.N = 0
+        # Whether GeNN emits the spikes on the device, and the names of the
+        # Brian arrays storing the spikes
+        self.on_device = False
+        self.neuron_index_array = ''
+        self.timebins_array = ''
+        self.period_array = ''
+        self.lastindex_array = ''
 
 
 class synapseModel:
@@ -246,12 +369,28 @@ class synapseModel:
         self.external_variables = []
         self.parameters = []
         self.pvalue = []
+        self.runtime_parameters = []
+        self.runtime_parametertypes = []
+        self.variable_initialisers = dict()
+        # Extra global parameters that state whether a run_regularly
+        # operation executed on the device is due in the current time step
+        self.run_regularly_parameters = []
         self.postSyntoCurrent = []
         # The following dictionaries contain keys "pre"/"post" for the pre-
         # and post-synaptic pathway and "dynamics" for the synaptic dynamics
         self.main_code_lines = defaultdict(str)
         self.support_code_lines = defaultdict(str)
         self.connectivity = ''
+        # For the connectivity 'AUTO': the formats that can be chosen during
+        # the model definition, the code for the DENSE format (the code
+        # above is used for the other formats), and the size of the
+        # variables of a synapse in bytes
+        self.connectivity_options = []
+        self.dense_main_code_lines = defaultdict(str)
+        self.synapse_bytes = 0
+        # For the connectivity 'PROCEDURAL': the name of the GeNN connectivity
+        # initialisation snippet and its parameter values
+        self.connectivity_initialiser = None
         self.delay = 0
         self.summed_variables= None
 
@@ -264,6 +403,16 @@ class spikeMonitorModel:
         self.codeobject_name = ''
         self.neuronGroup = ''
         self.notSpikeGeneratorGroup = True
+        # The number of time steps between two updates of the monitored group
+        self.step = 1
+        # Whether the monitor reads the spikes from GeNN's spike recording
+        self.spike_recording = False
+        # Arrays storing the results, which exist once per model instance in
+        # batched simulations
+        self.batch_arrays = []
+        # Pointers into GeNN's arrays that have to be shifted to the
+        # respective model instance in batched simulations, and their stride
+        self.batch_pointers = []
 
 
 class rateMonitorModel:
@@ -275,6 +424,14 @@ class rateMonitorModel:
         self.codeobject_name = ''
         self.neuronGroup = ''
         self.notSpikeGeneratorGroup = True
+        # The number of time steps between two updates of the monitored group
+        self.step = 1
+        # Whether the spikes are counted on the device, and the name of the
+        # extra global parameter storing the counts of each time step
+        self.on_device = False
+        self.counter = ''
+        self.batch_arrays = []
+        self.batch_pointers = []
 
 
 class stateMonitorModel:
@@ -294,6 +451,19 @@ class stateMonitorModel:
         self.when = ''
         self.step = 1
         self.connectivity = ''
+        # Files storing the recorded values (for batched simulations)
+        self.N_array = ''
+        self.t_array = ''
+        self.t_filename = ''
+        self.recorded_arrays = []
+        # Recording into a buffer on the device (see the
+        # devices.genn.state_monitor_on_device preference)
+        self.on_device = False
+        self.buffer_steps = 0
+        self.n_indices = 0
+        self.offset = 0
+        self.indices_array = ''
+        self.buffer_variables = []
 
 
 # ------------------------------------------------------------------------------
@@ -314,16 +484,88 @@ class GeNNDevice(CPPStandaloneDevice):
         self.neuron_models = []
         self.spikegenerator_models = []
         self.synapse_models = []
-        self.max_row_length_include= []
-        self.max_row_length_run_calls= []
+        #: Synapses whose maximum row length is determined by creating them
+        #: in the model definition
         self.max_row_length_synapses= set()
-        self.max_row_length_code_objects= {}
+        #: Synapses that are created by a single generator call without
+        #: multiple synapses between the same pair of neurons (and can
+        #: therefore use a dense connectivity format), mapping their name to
+        #: ``True``, or to ``False`` for Synapses created in other ways
+        self.unique_synapses = {}
+        #: The GeNN connectivity initialiser creating the same kind of
+        #: connectivity as the ``connect`` call of a Synapses object (see
+        #: `get_connectivity_initialiser`), or ``None`` if there is none
+        self.connectivity_initialisers = {}
+        #: The names of the synapse creation code objects of each Synapses
+        #: object
+        self.connect_code_objects = defaultdict(list)
+        #: Synapse creation code objects that are executed in the model
+        #: definition, mapped to the code object that loads their synapses in
+        #: the simulation
+        self.load_connect_code_objects = {}
+        #: Code objects that are not executed, since GeNN takes over their
+        #: task, mapped to the code object that is executed instead (or to
+        #: ``None``)
+        self.replaced_code_objects = {}
+        #: Names of the code objects executed on the host that draw random
+        #: numbers
+        self.random_code_objects = set()
+        #: Code objects executed on the host (or replaced by initialisations
+        #: on the device), mapped to the names of the external constants whose
+        #: values are compiled into them
+        self.host_constants = {}
+        #: For Synapses objects that can be created by GeNN, the code objects
+        #: copying GeNN's synapses into Brian's data structures
+        self.device_connect_code_objects = {}
+        #: Code objects setting a variable that GeNN can initialise, mapped to
+        #: the variable and the GeNN variable initialiser (see
+        #: `get_variable_initialiser`)
+        self.variable_initialisers = {}
+        #: The arrays of variables that are initialised by GeNN
+        self.device_initialised_arrays = set()
         self.delays = {}
         self.spike_monitor_models = []
         self.rate_monitor_models = []
         self.state_monitor_models = []
         self.run_regularly_read_write = {}
+        #: run_regularly operations that are executed on the device, mapping
+        #: their name to the extra global parameter that states whether they
+        #: are due in the current time step
+        self.device_run_regularly = {}
+        #: Parameters that are read from a file at runtime, mapping
+        #: ``(group name, parameter name)`` to the `Constant`
+        self.runtime_parameters = {}
+        #: Static arrays stored in a single memory-mapped file, as a list of
+        #: tuples of name, C++ type, size and offset
+        self.packed_static_array_specs = []
+        #: The parsed array index files (see `load_result_array`), mapping the
+        #: file name of the index to a dictionary mapping file names of arrays
+        #: to their type and shape
+        self._array_indices = {}
+        #: Spike monitors that write their spikes to disk during the simulation,
+        #: mapping their name to the name of the file
+        self.spike_streams = {}
+        #: State monitors that write their values to disk during the
+        #: simulation, mapping their name to a dictionary mapping the names of
+        #: the recorded variables (and ``'t'``) to a tuple of the name of the
+        #: file, the number of values per time step and the C++ type
+        self.state_streams = {}
+        #: Names of the spike monitors that read their spikes from GeNN's
+        #: spike recording
+        self.spike_recording_monitors = set()
+        #: Names of the rate monitors that count the spikes on the device
+        self.device_rate_monitors = set()
         self.run_duration = None
+        #: Number of model instances that are simulated in parallel
+        self.batch_size = 1
+        #: The model instance whose results are returned (see `batch_instance`)
+        self._batch_instance = 0
+        #: Wall-clock time (in seconds) of the stages of the last build and run
+        #: (see `BUILD_STAGES`), and the number and total size of the source
+        #: files generated by Brian2GeNN and by GeNN
+        self.build_timings = {}
+        self._code_generation_start = None
+        self._code_generation_time = None
         self.net = None
         self.net_objects = set()
         self.simple_code_objects = {}
@@ -348,6 +590,13 @@ class GeNNDevice(CPPStandaloneDevice):
         #: Use GeNN's kernel timings?
         self.kernel_timings = False
 
+        #: Keep the simulation running to allow for several runs?
+        self.persistent = False
+        #: The running simulation process (if built with ``persistent=True``)
+        self._server = None
+        #: Names of the arrays that can be changed in a persistent simulation
+        self.server_arrays = set()
+
     def insert_code(self, slot, code):
         '''
         Insert custom C++ code directly into ``main.cpp``. The available slots
@@ -441,7 +690,9 @@ class GeNNDevice(CPPStandaloneDevice):
             # We do not need to copy over constant values from the GPU
             read = {r for r in (read_sc | read_ve) if not variables[r].constant}
             self.run_regularly_read_write[codeobj.name] = {'read': read,
-                                                           'write': write_sc | write_ve}
+                                                           'write': write_sc | write_ve,
+                                                           'abstract_code': abstract_code[None]}
+            self.record_host_constants(codeobj.name, variables)
 
         elif ((template_name in ['stateupdate', 'threshold', 'reset'] and
                isinstance(owner, NeuronGroup)) or (template_name in ['summed_variable']
@@ -479,37 +730,72 @@ class GeNNDevice(CPPStandaloneDevice):
             self.simple_code_objects[codeobj.name] = codeobj
         else:
             codeobj_class = GeNNUserCodeObject
+            connect = False
             if ('_synapses_create_generator_' in name) or ('_synapses_create_array_' in name):
                 # Here we process max_row_length for synapses
-                # the strategy is to do a dry run of connection generationin in the model definition
-                # function that has the same random numbers and just counts synaptic connections
-                # rather than generating them for real
+                # the strategy is to create the synapses in the model definition
+                # function, where we need their maximum row length, and to store
+                # them in a file that the simulation loads instead of generating
+                # them again (see make_main_lines)
                 generator= '_synapses_create_generator_' in name
-                mrl_name= '%s_max_row_length' % owner.name
-                i= 1
-                while mrl_name in self.max_row_length_code_objects:
-                    mrl_name= '%s_max_row_length_%d' % (owner.name, i)
-                    i= i+1
-                if generator:
-                    mrl_template_name= 'max_row_length_generator'
-                else:
-                    mrl_template_name='max_row_length_array'
-                codeobj = super().code_object(owner, mrl_name,
-                                              abstract_code,
-                                              variables,
-                                              mrl_template_name,
-                                              variable_indices,
-                                              codeobj_class=codeobj_class,
-                                              template_kwds=template_kwds,
-                                              override_conditional_write=override_conditional_write,
-                )
-                #self.code_objects['%s_max_row_length' % owner.name] = codeobj
-                self.code_objects.pop(mrl_name, None)   # remove this from the normal list of code objects
-                self.max_row_length_code_objects[mrl_name]= codeobj # add to this dict instead
+                connect = True
                 self.max_row_length_synapses.add(owner.name)
-                self.max_row_length_include.append('#include "code_objects/%s.cpp"' % codeobj.name)
-                self.max_row_length_run_calls.append('_run_%s();' % mrl_name)
-
+                first_connect = owner.name not in self.unique_synapses
+                self.unique_synapses[owner.name] = (
+                    generator and first_connect and
+                    re.search(r'^_n = 1$', abstract_code.get('update', ''),
+                              re.MULTILINE) is not None)
+                if generator and first_connect:
+                    self.connectivity_initialisers[owner.name] = \
+                        self.get_connectivity_initialiser(variables,
+                                                          template_kwds,
+                                                          abstract_code)
+                else:
+                    self.connectivity_initialisers[owner.name] = None
+                if self.connectivity_initialisers[owner.name] is not None:
+                    # Copies the synapses if GeNN creates them (only used if
+                    # the devices.genn.connectivity_init_on_device preference
+                    # is set when the network is built)
+                    device_name = '%s_synapses_create_device_codeobject' % owner.name
+                    device_codeobj = super().code_object(owner, device_name,
+                                                         abstract_code,
+                                                         variables,
+                                                         'synapses_create_device',
+                                                         variable_indices,
+                                                         codeobj_class=codeobj_class,
+                                                         template_kwds=template_kwds,
+                                                         override_conditional_write=override_conditional_write,
+                                                         )
+                    self.code_objects.pop(device_codeobj.name, None)
+                    self.device_connect_code_objects[owner.name] = device_codeobj
+
+            if template_name == 'spikemonitor' and self.can_stream_spikes(owner):
+                stream_name = '_spike_stream_' + owner.name
+                template_kwds = dict(template_kwds or {})
+                template_kwds['spike_stream'] = stream_name
+                self.spike_streams[owner.name] = os.path.join('results',
+                                                              stream_name)
+            if template_name == 'spikemonitor' and self.can_record_spikes(owner):
+                template_kwds = dict(template_kwds or {})
+                template_kwds['spike_recording'] = True
+                self.spike_recording_monitors.add(owner.name)
+            if (template_name == 'ratemonitor' and
+                    self.can_count_spikes_on_device(owner)):
+                template_kwds = dict(template_kwds or {})
+                template_kwds['rate_counter'] = self.get_rate_counter(owner)
+                self.device_rate_monitors.add(owner.name)
+            if template_name == 'statemonitor' and self.can_stream_states(owner):
+                stream_name = '_state_stream_' + owner.name
+                template_kwds = dict(template_kwds or {})
+                template_kwds['state_stream'] = stream_name
+                streams = {'t': (os.path.join('results', stream_name + '_t'),
+                                 1, 'double')}
+                for varname in owner.record_variables:
+                    streams[varname] = (os.path.join('results',
+                                                     stream_name + '_' + varname),
+                                        owner.n_indices,
+                                        c_data_type(owner.variables[varname].dtype))
+                self.state_streams[owner.name] = streams
             codeobj = super().code_object(owner, name,
                                           abstract_code,
                                           variables,
@@ -521,8 +807,125 @@ class GeNNDevice(CPPStandaloneDevice):
                                           )
             # FIXME: is this actually necessary or is it already added by the super?
             self.code_objects[codeobj.name] = codeobj
+            if self.draws_random_numbers(abstract_code, variables,
+                                         template_kwds):
+                self.random_code_objects.add(codeobj.name)
+            self.record_host_constants(codeobj.name, variables)
+            if (template_name == 'group_variable_set_conditional' and
+                    isinstance(owner, (NeuronGroup, Synapses))):
+                initialiser = self.get_variable_initialiser(variables,
+                                                            abstract_code)
+                if initialiser is not None:
+                    self.variable_initialisers[codeobj.name] = initialiser
+            if connect:
+                # Loads the synapses created in the model definition
+                template_kwds = dict(template_kwds or {})
+                template_kwds['connectivity_file'] = '%s/%s' % (CONNECTIVITY_DIRECTORY,
+                                                                codeobj.name)
+                load_codeobj = super().code_object(owner, codeobj.name + '_load',
+                                                   abstract_code,
+                                                   variables,
+                                                   'synapses_create_load',
+                                                   variable_indices,
+                                                   codeobj_class=codeobj_class,
+                                                   template_kwds=template_kwds,
+                                                   override_conditional_write=override_conditional_write,
+                                                   )
+                self.load_connect_code_objects[codeobj.name] = load_codeobj
+                self.connect_code_objects[owner.name].append(codeobj.name)
         return codeobj
 
+    def record_host_constants(self, name, variables):
+        '''
+        Store the names of the external constants (e.g. from the namespace)
+        used by a code object that is executed on the host, or that is replaced
+        by an initialisation on the device. Their values are compiled into the
+        code, i.e. they cannot be changed with `run_with_parameters`.
+        '''
+        constants = {varname for varname, var in variables.items()
+                     if isinstance(var, Constant) and
+                     getattr(var, 'owner', None) is None}
+        if constants:
+            self.host_constants[name] = constants
+
+    def draws_random_numbers(self, abstract_code, variables, template_kwds):
+        '''
+        Whether a code object uses random numbers, i.e. calls a stateful
+        function such as ``rand()`` or creates synapses by sampling (e.g.
+        ``connect(p=0.1)``).
+        '''
+        if template_kwds and template_kwds.get('iterator_func') == 'sample':
+            return True
+        if isinstance(abstract_code, dict):
+            abstract_code = '\n'.join(abstract_code.values())
+        return any(isinstance(variables.get(identifier), Function) and
+                   not variables[identifier].stateless
+                   for identifier in get_identifiers(abstract_code))
+
+    def can_stream_spikes(self, monitor):
+        '''
+        Whether the spikes recorded by a `SpikeMonitor` should be written to
+        disk during the simulation (see `devices.genn.spike_monitor_streaming`).
+        This is only possible for monitors that record the indices and times of
+        spikes, but no other variables.
+        '''
+        return (prefs.devices.genn.spike_monitor_streaming and
+                monitor.record and monitor.event == 'spike' and
+                set(monitor.record_variables) == {'i', 't'} and
+                monitor.variables['i'].dtype == numpy.int32 and
+                monitor.variables['t'].dtype == numpy.float64)
+
+    def can_record_spikes(self, monitor):
+        '''
+        Whether a `SpikeMonitor` should read the spikes from GeNN's spike
+        recording (see `devices.genn.spike_recording`). This is only possible
+        for monitors that record the indices and times of spikes, but no other
+        variables, of groups simulated by GeNN (i.e. not of a
+        `SpikeGeneratorGroup`).
+        '''
+        source = monitor.source
+        if isinstance(source, Subgroup):
+            source = source.source
+        return (prefs.devices.genn.spike_recording and
+                monitor.event == 'spike' and
+                not isinstance(source, SpikeGeneratorGroup) and
+                set(monitor.record_variables) <= {'i', 't'})
+
+    def can_count_spikes_on_device(self, monitor):
+        '''
+        Whether a `PopulationRateMonitor` should count the spikes on the device
+        (see `devices.genn.rate_monitor_on_device`). This is only possible for
+        monitors of groups simulated by GeNN (i.e. not of a
+        `SpikeGeneratorGroup`) that are updated in every time step.
+        '''
+        source = monitor.source
+        if isinstance(source, Subgroup):
+            source = source.source
+        return (prefs.devices.genn.rate_monitor_on_device and
+                not isinstance(source, SpikeGeneratorGroup) and
+                self.get_clock_step(monitor) == 1)
+
+    def get_rate_counter(self, monitor):
+        '''
+        The name of GeNN's host variable for the extra global parameter that
+        stores the spike counts of a `PopulationRateMonitor` on the device.
+        '''
+        source = monitor.source
+        if isinstance(source, Subgroup):
+            source = source.source
+        return '_rate_count_' + monitor.name + source.name
+
+    def can_stream_states(self, monitor):
+        '''
+        Whether the values recorded by a `StateMonitor` should be written to
+        disk during the simulation (see `devices.genn.state_monitor_streaming`).
+        This is only possible for monitors that record at least one index.
+        '''
+        return (prefs.devices.genn.state_monitor_streaming and
+                monitor.n_indices > 0 and
+                len(monitor.record_variables) > 0 and
+                monitor.variables['t'].dtype == numpy.float64)
+
     # The following two methods are only overwritten to catch assignments to the
     # delay variable -- GeNN does not support heterogeneous delays
     def fill_with_array(self, var, arr):
@@ -539,6 +942,12 @@ class GeNNDevice(CPPStandaloneDevice):
             else:
                 # We store the delay so that we can later access it
                 self.delays[var.owner.name] = numpy.asarray(arr).item()
+        elif self.server_is_running() and not isinstance(var.owner, Clock):
+            # The simulation keeps track of time itself
+            values = numpy.empty(var.size, dtype=var.dtype)
+            values[:] = arr
+            self.set_on_server(var, values)
+            return
         elif isinstance(var.owner, NeuronGroup) and var.name == 'lastspike':
             # Workaround for versions of Brian 2 <= 2.1.3.1 which initialize
             # a NeuronGroup's lastspike variable to -inf, no longer supported
@@ -561,6 +970,17 @@ class GeNNDevice(CPPStandaloneDevice):
                                       'synapses (heterogeneous delays are not '
                                       'supported) as an argument to the '
                                       'Synapses initializer.')
+        if self.server_is_running():
+            if check_units:
+                fail_for_dimension_mismatch(var.dim, value,
+                                            'Incorrect unit for setting '
+                                            'variable {}'.format(var.name))
+            values = numpy.array(self.get_value(var))
+            indices = variableview.indexing(item,
+                                            index_var=variableview.index_var)
+            values[indices] = numpy.asarray(value)
+            self.set_on_server(var, values)
+            return
         super().variableview_set_with_index_array(variableview,
                                                                   item,
                                                                   value,
@@ -574,6 +994,10 @@ class GeNNDevice(CPPStandaloneDevice):
                                       'synapses (heterogeneous delays are not '
                                       'supported) as an argument to the '
                                       'Synapses initializer.')
+        if self.server_is_running():
+            raise NotImplementedError('Variables cannot be set with string '
+                                      'expressions between runs of a '
+                                      'persistent simulation.')
         variableview.set_with_expression.original_function(variableview,
                                                            item,
                                                            code,
@@ -590,6 +1014,10 @@ class GeNNDevice(CPPStandaloneDevice):
                                       'synapses (heterogeneous delays are not '
                                       'supported) as an argument to the '
                                       'Synapses initializer.')
+        if self.server_is_running():
+            raise NotImplementedError('Variables cannot be set with string '
+                                      'expressions between runs of a '
+                                      'persistent simulation.')
         variableview.set_with_expression_conditional.original_function(variableview,
                                                                        cond,
                                                                        code,
@@ -597,15 +1025,31 @@ class GeNNDevice(CPPStandaloneDevice):
                                                                        check_units)
 
     # --------------------------------------------------------------------------
-    def make_main_lines(self):
+    def make_main_lines(self, model_definition=False):
         '''
         Generates the code lines that handle initialisation of Brian 2
         cpp_standalone type arrays. These are then translated into the
         appropriate GeNN data structures in separately generated code.
+
+        Synapses are created in the model definition, where their maximum row
+        length is needed, and stored in `CONNECTIVITY_DIRECTORY`. The
+        simulation loads them from there instead of creating them again. It
+        starts with the same state of the random number generator as the model
+        definition, and restores the state after each loaded ``connect`` call,
+        so that all variables the synapse creation depends on have the same
+        values in both. After the last ``connect`` call, the random number
+        generator is seeded again.
+
+        Parameters
+        ----------
+        model_definition : bool, optional
+            Whether to generate the lines for the model definition (creating
+            and storing the synapses) instead of the simulation.
         '''
         main_lines = []
         procedures = [('', main_lines)]
         runfuncs = {}
+        last_load = None
         for func, args in self.main_queue:
             # explicitly exclude spike queue related code objects here:
             if (func.endswith('run_code_object') and
@@ -614,6 +1058,16 @@ class GeNNDevice(CPPStandaloneDevice):
                 continue
             if func == 'run_code_object':
                 codeobj, = args
+                if codeobj.name in self.load_connect_code_objects:
+                    if model_definition:
+                        main_lines.extend(self.make_connectivity_lines(codeobj))
+                        continue
+                    codeobj = self.load_connect_code_objects[codeobj.name]
+                    last_load = (main_lines, len(main_lines) + 1)
+                elif codeobj.name in self.replaced_code_objects:
+                    codeobj = self.replaced_code_objects[codeobj.name]
+                    if codeobj is None or model_definition:
+                        continue
                 if self.run_statement_used:
                     raise NotImplementedError('Cannot execute code after the '
                                               'run statement '
@@ -630,6 +1084,8 @@ class GeNNDevice(CPPStandaloneDevice):
                 # do nothing
             elif func == 'set_by_constant':
                 arrayname, value, is_dynamic = args
+                if arrayname in self.device_initialised_arrays:
+                    continue
                 size_str = arrayname + '.size()' if is_dynamic else '_num_' + arrayname
                 code = '''
                 for(int i=0; i<{size_str}; i++)
@@ -692,6 +1148,11 @@ class GeNNDevice(CPPStandaloneDevice):
             else:
                 raise TypeError("Unknown main queue function type " + func)
 
+        if last_load is not None:
+            lines, index = last_load
+            lines.insert(index,
+                         'rk_randomseed(brian::_mersenne_twister_states[0]);')
+
         # generate the finalisations
         for codeobj in self.code_objects.values():
             if hasattr(codeobj.code, 'main_finalise'):
@@ -722,8 +1183,9 @@ class GeNNDevice(CPPStandaloneDevice):
 
     # --------------------------------------------------------------------------
     def build(self, directory='GeNNworkspace', compile=True, run=True,
-              use_GPU=True,
-              debug=False, with_output=True, direct_call=True):
+              use_GPU=True, clean=False,
+              debug=False, with_output=True, direct_call=True, batch_size=1,
+              persistent=False):
         '''
         This function does the main post-translation work for the genn device.
         It uses the code generated during/before run() and extracts information
@@ -740,18 +1202,82 @@ class GeNNDevice(CPPStandaloneDevice):
         functions. This means that the GeNN specific cod only has to be
         concerned about executing the correct model and feeding back results
         into the appropriate cpp_standalone data structures.
+
+        Unless ``clean=True`` is used, the compilation reuses object files
+        from previous builds in the same directory (or skips the compilation
+        entirely if nothing changed, see `devices.genn.build_cache`).
+
+        With ``batch_size`` > 1, GeNN simulates several instances of the model
+        in parallel. All instances share the synaptic connectivity, but
+        variables are initialized separately for each instance (i.e. random
+        initial values differ between instances). Use `batch_instance` to
+        access the results of an instance other than the first.
+
+        With ``persistent=True``, the simulation process keeps running after
+        the simulation finished. Further ``run`` calls (for the same network)
+        continue the simulation without any code generation or compilation,
+        and variables can be set to new values in between (but not with
+        string expressions).
         '''
 
         print('building genn executable ...')
+        build_start = time.time()
+        if self._code_generation_start is not None:
+            self._code_generation_time = time.time() - self._code_generation_start
+            self._code_generation_start = None
+        self.build_timings = dict.fromkeys(BUILD_STAGES)
+        self.build_timings['code_generation'] = self._code_generation_time
+
+        if not isinstance(batch_size, numbers.Integral) or batch_size < 1:
+            raise ValueError('batch_size has to be a positive integer, '
+                             'got {!r}.'.format(batch_size))
+        if batch_size > 1 and not use_GPU:
+            raise NotImplementedError('Batched simulations are only supported '
+                                      'with use_GPU=True, GeNN\'s CPU '
+                                      'backend can only simulate a single '
+                                      'model instance.')
+        if batch_size > 1 and persistent:
+            raise NotImplementedError('Batched simulations cannot be run '
+                                      'with persistent=True.')
+        if batch_size > 1 and self.spike_streams:
+            raise NotImplementedError('Batched simulations do not support '
+                                      'the devices.genn.spike_monitor_streaming '
+                                      'preference.')
+        if batch_size > 1 and self.state_streams:
+            raise NotImplementedError('Batched simulations do not support '
+                                      'the devices.genn.state_monitor_streaming '
+                                      'preference.')
+        if batch_size > 1 and self.spike_recording_monitors:
+            raise NotImplementedError('Batched simulations do not support '
+                                      'the devices.genn.spike_recording '
+                                      'preference.')
+        if batch_size > 1 and self.device_rate_monitors:
+            raise NotImplementedError('Batched simulations do not support '
+                                      'the devices.genn.rate_monitor_on_device '
+                                      'preference.')
+        if (prefs.devices.genn.memory_mapped_results and
+                os.sys.platform == 'win32'):
+            raise NotImplementedError('Memory-mapped results are not '
+                                      'supported on Windows.')
+        self.batch_size = batch_size
+        self._batch_instance = 0
+        self.stop_server()
+        self.persistent = persistent
 
         if directory is None:  # used during testing
             directory = tempfile.mkdtemp()
 
         # Start building the project
         self.project_dir = directory
+        self.use_GPU = use_GPU
         ensure_directory(directory)
         for d in ['code_objects', 'results', 'static_arrays']:
             ensure_directory(os.path.join(directory, d))
+        if persistent:
+            ensure_directory(os.path.join(directory, SERVER_INPUT_DIRECTORY))
+        for batch in range(1, batch_size):
+            ensure_directory(os.path.join(directory, BATCH_RESULTS_DIRECTORY,
+                                          str(batch), 'results'))
 
         writer = CPPWriter(directory)
 
@@ -769,14 +1295,21 @@ class GeNNDevice(CPPStandaloneDevice):
 
         logger.debug("static arrays: " + str(sorted(self.static_arrays.keys())))
         static_array_specs = []
+        packed_static_arrays = {}
         for name, arr in sorted(self.static_arrays.items()):
+            if (prefs.devices.genn.packed_static_arrays and
+                    not self.is_array_name(name)):
+                packed_static_arrays[name] = arr
+                continue
             arr.tofile(os.path.join(directory, 'static_arrays', name))
             static_array_specs.append(
                 (name, c_data_type(arr.dtype), arr.size, name))
+        self.packed_static_array_specs = self.write_packed_static_arrays(
+            directory, packed_static_arrays)
 
-        net_objects = self.net_objects
-
-        main_lines = self.make_main_lines()
+        # Sort the objects by name, so that the generated code does not depend
+        # on the (arbitrary) iteration order of the set
+        net_objects = sorted(self.net_objects, key=lambda obj: obj.name)
 
         # assemble the model descriptions:
         objects = {obj.name: obj for obj in net_objects}
@@ -829,11 +1362,18 @@ class GeNNDevice(CPPStandaloneDevice):
         self.process_spike_monitors(spike_monitors)
         self.process_rate_monitors(rate_monitors)
         self.process_state_monitors(directory, state_monitors, writer)
+        self.resolve_variable_initialisers()
+        # Processing the synapses and variable initialisations determines
+        # which code objects are skipped
+        main_lines = self.make_main_lines()
+        if batch_size > 1:
+            self.check_batch_support(net_objects)
+        self.build_timings['model_processing'] = time.time() - build_start
+        writing_start = time.time()
 
         # Turn anonymous namespaces into named namespaces to avoid
         # issues when cpp files are included
-        for code_object in itertools.chain(self.code_objects.values(),
-                                           self.max_row_length_code_objects.values()):
+        for code_object in self.code_objects.values():
             cpp_code = getattr(code_object.code, 'cpp_file', code_object.code)
             if 'namespace {' in cpp_code:
                 cpp_code = cpp_code.replace('namespace {', f'namespace {code_object.name} {{')
@@ -845,8 +1385,11 @@ class GeNNDevice(CPPStandaloneDevice):
                 code_object.code = cpp_code
         # Write files from templates
         # Create an empty network.h file, this allows us to use Brian2's
-        # objects.cpp template unchanged
-        writer.write('network.*', GeNNUserCodeObject.templater.network(None, None))
+        # objects.cpp template unchanged (it also includes the declarations of
+        # the packed static arrays in objects.h)
+        writer.write('network.*', GeNNUserCodeObject.templater.network(
+            None, None,
+            packed_static_arrays=bool(self.packed_static_array_specs)))
         self.header_files.add('network.h')
 
         self.generate_objects_source(arange_arrays, self.net,
@@ -861,16 +1404,22 @@ class GeNNDevice(CPPStandaloneDevice):
         shutil.move(os.path.join(randomkit_dir, 'randomkit.c'),
                     os.path.join(randomkit_dir, 'randomkit.cc'))
         self.generate_code_objects(writer)
-        self.generate_max_row_length_code_objects(writer)
-        self.generate_model_source(writer, main_lines, use_GPU)
+        self.generate_model_source(writer, use_GPU)
         self.generate_main_source(writer, main_lines)
         self.generate_engine_source(writer, objects)
         self.generate_makefile(directory, use_GPU)
+        if self.runtime_parameters:
+            self.write_runtime_parameters(directory)
+        self.build_timings['writing_sources'] = time.time() - writing_start
+        self.build_timings['generated_sources'] = source_statistics(
+            directory, exclude=['magicnetwork_model_CODE', 'test_output',
+                                'results', BATCH_RESULTS_DIRECTORY,
+                                SERVER_INPUT_DIRECTORY])
 
         # Compile and run
         if compile:
             try:
-                self.compile_source(debug, directory, use_GPU)
+                self.compile_source(debug, directory, use_GPU, clean)
             except CalledProcessError as ex:
                 raise RuntimeError(('Project compilation failed (Command {cmd} '
                                     'failed with error code {returncode}).\n'
@@ -879,20 +1428,75 @@ class GeNNDevice(CPPStandaloneDevice):
                                                        returncode=ex.returncode)
                                    )
         if run:
-            try:
-                self.run(directory, use_GPU, with_output)
-            except CalledProcessError as ex:
-                if ex.returncode == 222:
-                    raise NotImplementedError('GeNN does not support multiple '
-                                              'synapses per neuron pair (use '
-                                              'multiple Synapses objects).')
-                else:
-                    raise RuntimeError(('Project run failed (Command {cmd} '
-                                        'failed with error code {returncode}).\n'
-                                        'See the output above (if any) for more '
-                                        'details.').format(cmd=ex.cmd,
-                                                           returncode=ex.returncode)
-                                       )
+            self.run_and_check(directory, use_GPU, with_output)
+        elif prefs.devices.genn.build_timings_file:
+            # Otherwise written after the run
+            self.write_build_timings(directory)
+
+    def is_array_name(self, name):
+        '''
+        Whether ``name`` is the name of a (dynamic) array, i.e. a static array
+        with this name is used to initialize an array of the same name.
+        '''
+        return any(name in names for names in (self.arrays.values(),
+                                               self.dynamic_arrays.values(),
+                                               self.dynamic_arrays_2d.values()))
+
+    def write_packed_static_arrays(self, directory, static_arrays):
+        '''
+        Write static arrays into a single file (see
+        `devices.genn.packed_static_arrays`) and generate the code that maps
+        this file into memory.
+
+        Parameters
+        ----------
+        directory : str
+            The project directory.
+        static_arrays : dict
+            Mapping from the names of the static arrays to their values.
+
+        Returns
+        -------
+        specs : list of tuple
+            A list of tuples of the name, the C++ type, the size and the offset
+            (in bytes) of each array in the file.
+        '''
+        filename = os.path.join(directory, 'static_arrays',
+                                PACKED_STATIC_ARRAYS_FILE)
+        specs = []
+        if not static_arrays:
+            if os.path.exists(filename):
+                os.remove(filename)
+            return specs
+        offset = 0
+        with open(filename, 'wb') as f:
+            for name, arr in sorted(static_arrays.items()):
+                padding = -offset % PACKED_STATIC_ARRAYS_ALIGNMENT
+                f.write(b'\0' * padding)
+                offset += padding
+                specs.append((name, c_data_type(arr.dtype), arr.size, offset))
+                arr.tofile(f)
+                offset += arr.nbytes
+        logger.debug('Packed {} static arrays into {} ({} bytes)'.format(len(specs),
+                                                                         filename,
+                                                                         offset))
+        static_arrays_tmp = GeNNUserCodeObject.templater.static_arrays(
+            None, None,
+            packed_static_array_specs=specs,
+            filename='static_arrays/' + PACKED_STATIC_ARRAYS_FILE,
+            size=offset)
+        writer = CPPWriter(directory)
+        writer.write('static_arrays.*', static_arrays_tmp)
+        self.header_files.add('static_arrays.h')
+        self.source_files.add('static_arrays.cpp')
+        return specs
+
+    def write_build_timings(self, directory):
+        '''
+        Write `build_timings` to a JSON file in the project directory.
+        '''
+        with open(os.path.join(directory, BUILD_TIMINGS_FILE), 'w') as f:
+            json.dump(self.build_timings, f, indent=2)
 
     def generate_code_objects(self, writer):
         # Generate data for non-constant values
@@ -934,7 +1538,7 @@ class GeNNDevice(CPPStandaloneDevice):
                 if isinstance(codeobj.code, MultiTemplate):
                     code = freeze(codeobj.code.cpp_file, ns)
                     code = code.replace('%CONSTANTS%', '\n'.join(
-                        code_object_defs[codeobj.name]))
+                        sorted(code_object_defs[codeobj.name])))
                     code = '#include "objects.h"\n' + code
 
                     writer.write('code_objects/' + codeobj.name + '.cpp', code)
@@ -945,46 +1549,24 @@ class GeNNDevice(CPPStandaloneDevice):
                     self.header_files.add(
                         'code_objects/' + codeobj.name + '.h')
 
-    def generate_max_row_length_code_objects(self, writer):
-        # Generate data for non-constant values
-        code_object_defs = defaultdict(set)
-        for codeobj in self.max_row_length_code_objects.values():
-            for k, v in codeobj.variables.items():
-                if isinstance(v, ArrayVariable):
-                    try:
-                        if isinstance(v, DynamicArrayVariable):
-                            if get_var_ndim(v) == 1:
-                                dyn_array_name = self.dynamic_arrays[v]
-                                array_name = self.arrays[v]
-                                # do the const stuff
-                                line = '{c_type}* const {array_name} = &{dyn_array_name}[0];'
-                                line = line.format(c_type=c_data_type(v.dtype),
-                                                   array_name=array_name,
-                                                   dyn_array_name=dyn_array_name)
-                                code_object_defs[codeobj.name].add(line)
-                                line = 'const int _num{k} = {dyn_array_name}.size();'
-                                line = line.format(k=k,
-                                                   dyn_array_name=dyn_array_name)
-                                code_object_defs[codeobj.name].add(line)
-                        else:
-                            array_name = self.arrays[v]
-                            line = '{c_type} {array_name}[{size}];'
-                            line = line.format(c_type=c_data_type(v.dtype),
-                                               array_name=array_name,
-                                               size=v.size)
-                            code_object_defs[codeobj.name].add(f'const int _num{k} = {v.size};')
-                    except TypeError:
-                        pass
-
-        for codeobj in self.max_row_length_code_objects.values():
-            ns = codeobj.variables
-            # TODO: fix these freeze/CONSTANTS hacks somehow - they work but not elegant.
-            code = freeze(codeobj.code, ns)
-            code = code.replace('%CONSTANTS%', '\n'.join(
-                        code_object_defs[codeobj.name]))
-            writer.write('code_objects/' + codeobj.name + '.cpp', code)
-
-
+    def run_and_check(self, directory, use_GPU, with_output):
+        '''
+        Run the compiled simulation, translating errors into exceptions.
+        '''
+        try:
+            self.run(directory, use_GPU, with_output)
+        except CalledProcessError as ex:
+            if ex.returncode == 222:
+                raise NotImplementedError('GeNN does not support multiple '
+                                          'synapses per neuron pair (use '
+                                          'multiple Synapses objects).')
+            else:
+                raise RuntimeError(('Project run failed (Command {cmd} '
+                                    'failed with error code {returncode}).\n'
+                                    'See the output above (if any) for more '
+                                    'details.').format(cmd=ex.cmd,
+                                                       returncode=ex.returncode)
+                                   )
 
     def run(self, directory, use_GPU, with_output):
         gpu_arg = "1" if use_GPU else "0"
@@ -1003,16 +1585,36 @@ class GeNNDevice(CPPStandaloneDevice):
                             name_suffix='overwritten_env_var', once=True)
             os.environ[key] = value
 
-        with std_silent(with_output):
-            if os.sys.platform == 'win32':
-                cmd = directory + "\\main_Release.exe test " + str(
-                    self.run_duration)
-                check_call(cmd, cwd=directory)
-            else:
-                # print ["./main", "test", str(self.run_duration), gpu_arg]
-                check_call(["./main", "test", str(self.run_duration)],
-                           cwd=directory)
+        run_start = time.time()
+        if self.persistent:
+            self.run_on_server(directory, self.run_duration, with_output)
+        else:
+            self.release_result_files(directory)
+            with std_silent(with_output):
+                if os.sys.platform == 'win32':
+                    cmd = directory + "\\main_Release.exe test " + str(
+                        self.run_duration)
+                    check_call(cmd, cwd=directory)
+                else:
+                    # print ["./main", "test", str(self.run_duration), gpu_arg]
+                    check_call(["./main", "test", str(self.run_duration)],
+                               cwd=directory)
+        self.build_timings['run_binary'] = time.time() - run_start
+        self.process_run_results(directory)
+
+    def process_run_results(self, directory):
+        '''
+        Read the information about the last run and check the results for
+        invalid values.
+        '''
+        loading_start = time.time()
         self.has_been_run = True
+        stage_timings_file = os.path.join(directory, STAGE_TIMINGS_FILE)
+        if os.path.exists(stage_timings_file):
+            with open(stage_timings_file) as f:
+                for line in f:
+                    stage, stage_time = line.split()
+                    self.build_timings[stage] = float(stage_time)
         with open(os.path.join(directory, 'results/last_run_info.txt')) as f:
             last_run_info = f.read()
         self._last_run_time, self._last_run_completed_fraction = map(float,
@@ -1041,8 +1643,103 @@ class GeNNDevice(CPPStandaloneDevice):
                     already_checked.add(owner.name)
             except ReferenceError:
                 pass
+        self.build_timings['loading_results'] = time.time() - loading_start
+        if prefs.devices.genn.build_timings_file:
+            self.write_build_timings(directory)
+
+    def run_on_server(self, directory, duration, with_output):
+        '''
+        Continue the persistent simulation (see the ``persistent`` argument of
+        `build`) for the given duration and write its results to disk. Starts
+        the simulation process if it is not running yet.
+        '''
+        if self._server is None or not self._server.is_running():
+            if os.sys.platform == 'win32':
+                cmd = directory + "\\main_Release.exe test 0"
+            else:
+                cmd = ["./main", "test", "0"]
+            self._server = SimulationServer(cmd, cwd=directory,
+                                            with_output=with_output)
+        self._server.command('run {!r}'.format(float(duration)), with_output)
+        self.release_result_files(directory, keep_streams=True)
+        self._server.command('write', with_output)
+
+    def stop_server(self):
+        '''
+        Stop the persistent simulation process (if any). Its results have
+        already been written to disk after the last run.
+        '''
+        if self._server is not None:
+            self._server.stop()
+            self._server = None
+
+    def reinit(self):
+        self.stop_server()
+        super().reinit()
+
+    def server_is_running(self):
+        '''
+        Whether a persistent simulation process is waiting for commands.
+        '''
+        return self._server is not None and self._server.is_running()
 
-    def compile_source(self, debug, directory, use_GPU):
+    def continue_run(self, net, duration):
+        '''
+        Continue the persistent simulation for another run of the same
+        network.
+        '''
+        if ({obj.name for obj in _get_all_objects(net.objects)} !=
+                {obj.name for obj in self.net_objects}):
+            raise NotImplementedError('The objects in the network cannot be '
+                                      'changed between runs of a persistent '
+                                      'simulation.')
+        t_end = net.t + duration
+        for clock in net._clocks:
+            clock.set_interval(net.t, t_end)
+        net.t_ = float(t_end)
+        with_output = self.build_options.get('with_output', True)
+        run_start = time.time()
+        try:
+            self.run_on_server(self.project_dir, duration, with_output)
+        except CalledProcessError as ex:
+            raise RuntimeError(('The persistent simulation terminated with '
+                                'error code {returncode}.\n'
+                                'See the output above (if any) for more '
+                                'details.').format(returncode=ex.returncode))
+        # No code generation, compilation or initialisation for this run
+        self.build_timings = dict.fromkeys(BUILD_STAGES)
+        self.build_timings['run_binary'] = time.time() - run_start
+        # The values of all variables might have changed
+        for var in self.array_cache:
+            if not var.constant:
+                self.array_cache[var] = None
+        # Recorded values are appended along the first dimension (see
+        # `CPPStandaloneDevice.get_value`)
+        for var in self.dynamic_arrays_2d:
+            var.size = (0, var.size[1])
+        for clock in net._clocks:
+            self.array_cache[clock.variables['timestep']] = numpy.array([clock._i_end])
+            self.array_cache[clock.variables['t']] = numpy.array([clock._i_end * clock.dt_])
+        self.process_run_results(self.project_dir)
+        net.after_run()
+
+    def set_on_server(self, var, values):
+        '''
+        Set the values of a variable in the persistent simulation.
+        '''
+        array_name = self.get_array_name(var, access_data=False)
+        if array_name not in self.server_arrays:
+            raise NotImplementedError("Variable '{}' of '{}' cannot be changed "
+                                      "between runs.".format(var.name,
+                                                             var.owner.name))
+        values = numpy.asarray(values, dtype=var.dtype)
+        filename = os.path.join(SERVER_INPUT_DIRECTORY, array_name)
+        values.tofile(os.path.join(self.project_dir, filename))
+        self._server.command('load {} {}'.format(array_name, filename),
+                             self.build_options.get('with_output', True))
+        self.array_cache[var] = values
+
+    def compile_source(self, debug, directory, use_GPU, clean=False):
         if prefs.devices.genn.path is not None:
             genn_path = prefs.devices.genn.path
             logger.debug('Using GeNN path from preference: '
@@ -1081,6 +1778,14 @@ class GeNNDevice(CPPStandaloneDevice):
         if genn_version is None or not genn_version >= parse_version('4.2.1'):
             raise RuntimeError('Brian2GeNN requires GeNN 4.2.1 or later. '
                                'Please upgrade your GeNN version.')
+        if self.batch_size > 1 and not genn_version >= parse_version('4.4.0'):
+            raise RuntimeError('Batched simulations require GeNN 4.4.0 or '
+                               'later. Please upgrade your GeNN version.')
+        if (self.spike_recording_monitors and
+                not genn_version >= parse_version('4.4.0')):
+            raise RuntimeError('The devices.genn.spike_recording preference '
+                               'requires GeNN 4.4.0 or later. Please upgrade '
+                               'your GeNN version.')
 
         env = os.environ.copy()
         if use_GPU:
@@ -1097,6 +1802,48 @@ class GeNNDevice(CPPStandaloneDevice):
                 raise RuntimeError('Set the CUDA_PATH environment variable or '
                                    'the devices.genn.cuda_backend.cuda_path preference.')
 
+        build_hash = None
+        cache_directory = prefs.devices.genn.build_cache_directory
+        use_build_cache = prefs.devices.genn.build_cache
+        if use_build_cache and self.model_definition_draws_random_numbers():
+            # The synapses (and the random numbers drawn before the last
+            # synapse creation) are stored by the model definition in the
+            # connectivity directory. Random synapses have to be created anew
+            # for every run, we therefore have to run the model definition.
+            logger.debug('Not reusing a previous build, the synapses are '
+                         'created with random numbers')
+            build_cache.clear_build_hash(directory)
+            use_build_cache = False
+        if use_build_cache:
+            build_info = [genn_path, genn_version, use_GPU, os.sys.platform,
+                          get_gcc_compile_args(),
+                          prefs['codegen.cpp.extra_link_args'],
+                          prefs['devices.genn.cuda_backend.extra_compile_args_nvcc'],
+                          env.get('CUDA_PATH', ''), env.get('CXX', '')]
+            build_hash = build_cache.get_build_hash(directory, build_info)
+            if not clean and build_cache.is_up_to_date(directory, build_hash):
+                logger.debug('Generated code has not changed since the last '
+                             'build (hash: {})'.format(build_hash))
+                print('reusing previously compiled genn executable ...')
+                return
+            if (not clean and cache_directory is not None and
+                    build_cache.restore_from_cache(cache_directory, build_hash,
+                                                   directory)):
+                logger.debug('Restored build {} from cache directory '
+                             '"{}"'.format(build_hash, cache_directory))
+                print('reusing cached genn executable ...')
+                return
+            build_cache.clear_build_hash(directory)
+
+        compile_jobs = prefs.devices.genn.compile_jobs
+        if compile_jobs is None:
+            compile_jobs = os.cpu_count() or 1
+
+        # The model definition stores the synapses it creates in this directory
+        connectivity_dir = os.path.join(directory, CONNECTIVITY_DIRECTORY)
+        shutil.rmtree(connectivity_dir, ignore_errors=True)
+        os.makedirs(connectivity_dir)
+
         with std_silent(debug):
             if os.sys.platform == 'win32':
                 # Make sure that all environment variables are upper case
@@ -1131,15 +1878,21 @@ class GeNNDevice(CPPStandaloneDevice):
                 cmd += ' magicnetwork_model.cpp'
 
                 # Add call to build generated code
-                cmd += ' && msbuild /m /verbosity:minimal /p:Configuration=Release "' + os.path.join(wdir, directory, 'magicnetwork_model_CODE', 'runner.vcxproj') + '"'
+                msbuild_cmd = ' && msbuild /m:{} /verbosity:minimal /p:Configuration=Release'.format(compile_jobs)
+                if clean:
+                    msbuild_cmd += ' /t:Rebuild'
+                cmd += msbuild_cmd + ' "' + os.path.join(wdir, directory, 'magicnetwork_model_CODE', 'runner.vcxproj') + '"'
 
                 # Add call to build executable
-                cmd += ' && msbuild /m /verbosity:minimal /p:Configuration=Release "' + os.path.join(wdir, directory, 'project.vcxproj') + '"'
+                cmd += msbuild_cmd + ' "' + os.path.join(wdir, directory, 'project.vcxproj') + '"'
 
                 # Run combined command
                 # **NOTE** because vcvars MODIFIED environment,
                 # making seperate check_calls doesn't work
+                # (the time is therefore reported for the "make" stage)
+                make_start = time.time()
                 check_call(cmd, cwd=directory, env=env)
+                self.build_timings['make'] = time.time() - make_start
             else:
                 if prefs['codegen.cpp.extra_link_args']:
                     # declare the link flags as an environment variable so that GeNN's
@@ -1157,13 +1910,341 @@ class GeNNDevice(CPPStandaloneDevice):
                 args += ['-i', inc_path]
                 args += ['magicnetwork_model.cpp']
                 print(args)
+                buildmodel_start = time.time()
                 check_call(args, cwd=directory, env=env)
-                call(["make", "clean"], cwd=directory, env=env)
-                check_call(["make"], cwd=directory, env=env)
+                self.build_timings['genn_buildmodel'] = time.time() - buildmodel_start
+                make_start = time.time()
+                if clean:
+                    call(["make", "clean"], cwd=directory, env=env)
+                # The Makefile tracks dependencies, only sources that changed
+                # since the last build will be recompiled
+                check_call(["make", "-j{}".format(compile_jobs)],
+                           cwd=directory, env=env)
+                self.build_timings['make'] = time.time() - make_start
+        self.build_timings['genn_sources'] = source_statistics(
+            os.path.join(directory, 'magicnetwork_model_CODE'))
+
+        if build_hash is not None:
+            build_cache.mark_as_built(directory, build_hash)
+            if cache_directory is not None:
+                max_size = prefs.devices.genn.build_cache_max_size * 1024**2
+                build_cache.store_in_cache(cache_directory, build_hash,
+                                           directory, max_size)
 
     def add_parameter(self, model, varname, variable):
-        model.parameters.append(varname)
-        model.pvalue.append(CPPNodeRenderer().render_expr(repr(variable.value)))
+        if (prefs.devices.genn.runtime_parameters and
+                getattr(variable, 'owner', None) is None):
+            # External constants (e.g. from the namespace) become extra global
+            # parameters that are set from a file when the simulation starts
+            if varname not in model.runtime_parameters:
+                model.runtime_parameters.append(varname)
+                model.runtime_parametertypes.append(c_data_type(variable.dtype))
+                self.runtime_parameters[(model.name, varname)] = variable
+        else:
+            model.parameters.append(varname)
+            model.pvalue.append(CPPNodeRenderer().render_expr(repr(variable.value)))
+
+    def write_runtime_parameters(self, directory, parameters=None):
+        '''
+        Write the values of the runtime parameters (see
+        `devices.genn.runtime_parameters`) to the file that is read by the
+        compiled simulation when it starts.
+
+        Parameters
+        ----------
+        directory : str
+            The project directory.
+        parameters : dict, optional
+            New values for the parameters, overwriting the values used during
+            the code generation. Keys are either the name of a parameter (e.g.
+            ``'tau'``), setting the value for all groups using the parameter,
+            or the name of a group and the name of the parameter joined by a
+            dot (e.g. ``'neurongroup.tau'``).
+
+        Raises
+        ------
+        ValueError
+            If a new value is given for a parameter whose value has also been
+            compiled into code executed on the host or into the initialisation
+            of variables or synapses.
+        '''
+        if parameters is None:
+            parameters = {}
+        values = {key: variable.value
+                  for key, variable in self.runtime_parameters.items()}
+        for key, value in parameters.items():
+            if '.' in key:
+                group_name, param_name = key.split('.', 1)
+                matching = [(group_name, param_name)]
+                if matching[0] not in values:
+                    matching = []
+            else:
+                matching = [k for k in values if k[1] == key]
+            if not len(matching):
+                raise KeyError("'{}' is not a runtime parameter of any "
+                               "group.".format(key))
+            for match in matching:
+                variable = self.runtime_parameters[match]
+                fail_for_dimension_mismatch(value, variable.dim,
+                                            "Value for parameter '{}' has "
+                                            "incorrect units".format(key))
+                values[match] = numpy.asarray(value)
+                if values[match] != variable.value:
+                    self.check_runtime_parameter(match[1])
+        with open(os.path.join(directory, RUNTIME_PARAMETERS_FILE), 'w') as f:
+            for (group_name, param_name), value in sorted(values.items()):
+                f.write('{} {} {}\n'.format(group_name, param_name,
+                                            repr(float(value))))
+
+    def check_runtime_parameter(self, name):
+        '''
+        Raise an error if the runtime parameter ``name`` is also used in code
+        that does not read it at runtime, i.e. a new value would only be used
+        for parts of the simulation.
+        '''
+        codeobj_names = sorted(codeobj_name for codeobj_name, constants
+                               in self.host_constants.items()
+                               if name in constants)
+        if codeobj_names:
+            raise ValueError("The value of parameter '{}' cannot be changed "
+                             "without compiling the simulation again, it is "
+                             "also used in code executed on the CPU or in the "
+                             "initialization of variables or synapses "
+                             "({}).".format(name, ', '.join(codeobj_names)))
+
+    def run_with_parameters(self, parameters=None, with_output=True):
+        '''
+        Run the previously compiled simulation again, using new values for the
+        runtime parameters (see `devices.genn.runtime_parameters`). This does
+        not need any code generation or compilation, the results of the
+        previous run are overwritten.
+
+        Parameters
+        ----------
+        parameters : dict, optional
+            New values for the parameters, see `write_runtime_parameters`.
+            Parameters that are not mentioned use the value from the code
+            generation.
+        with_output : bool, optional
+            Whether to show the output of the simulation. Defaults to
+            ``True``.
+        '''
+        if self.project_dir is None or self.run_duration is None:
+            raise RuntimeError('The simulation has to be built before it can '
+                               'be run with new parameters.')
+        if parameters and not self.runtime_parameters:
+            raise ValueError('The simulation does not use any runtime '
+                             'parameters, set the '
+                             'devices.genn.runtime_parameters preference to '
+                             'True before building it.')
+        self.write_runtime_parameters(self.project_dir, parameters)
+        self.run_and_check(self.project_dir, self.use_GPU, with_output)
+
+    def get_value(self, var, access_data=True):
+        if self.array_cache.get(var, None) is None and self.has_been_run:
+            if (getattr(var.owner, 'name', None) in self.spike_streams and
+                    var.name in ('i', 't')):
+                return self.load_spike_stream(var)
+            if (var.name in self.state_streams.get(getattr(var.owner, 'name', None), {})
+                    and isinstance(var, DynamicArrayVariable)):
+                return self.load_state_stream(var)
+            if prefs.devices.genn.memory_mapped_results:
+                values = self.load_result_array(var)
+                if values is not None:
+                    return values
+        return super().get_value(var, access_data)
+
+    def load_spike_stream(self, var):
+        '''
+        Return the indices or times of the spikes that a `SpikeMonitor` wrote
+        to disk during the simulation (see
+        `devices.genn.spike_monitor_streaming`). The file is memory-mapped, i.e.
+        the values are only loaded when they are accessed.
+        '''
+        fname = os.path.join(self.project_dir,
+                             self.spike_streams[var.owner.name])
+        record_dtype = numpy.dtype([('i', numpy.int32), ('t', numpy.float64)])
+        n_spikes = os.path.getsize(fname) // record_dtype.itemsize
+        if n_spikes == 0:
+            records = numpy.zeros(0, dtype=record_dtype)
+        elif os.sys.platform == 'win32':
+            # A memory-mapped file could not be replaced by the next run
+            records = numpy.fromfile(fname, dtype=record_dtype)
+        else:
+            records = numpy.memmap(fname, dtype=record_dtype, mode='r',
+                                   shape=(n_spikes,))
+        var.size = n_spikes
+        return records[var.name]
+
+    def load_state_stream(self, var):
+        '''
+        Return the times or the values of a variable that a `StateMonitor`
+        wrote to disk during the simulation (see
+        `devices.genn.state_monitor_streaming`), as an array with one row per
+        recorded time step. The file is memory-mapped, i.e. the values are only
+        loaded when they are accessed.
+        '''
+        filename, row_size, _ = self.state_streams[var.owner.name][var.name]
+        fname = os.path.join(self.project_dir, filename)
+        dtype = numpy.dtype(var.dtype)
+        n_steps = os.path.getsize(fname) // (row_size * dtype.itemsize)
+        shape = (n_steps, ) if var.ndim == 1 else (n_steps, row_size)
+        if n_steps == 0:
+            values = numpy.zeros(shape, dtype=dtype)
+        elif os.sys.platform == 'win32':
+            # A memory-mapped file could not be replaced by the next run
+            values = numpy.fromfile(fname, dtype=dtype,
+                                    count=int(numpy.prod(shape))).reshape(shape)
+        else:
+            values = numpy.memmap(fname, dtype=dtype, mode='r', shape=shape)
+        var.size = shape[0] if var.ndim == 1 else shape
+        return values
+
+    def load_result_array(self, var):
+        '''
+        Return the values of a variable after a run as a read-only
+        `numpy.memmap` of its result file, using the type and shape stored by
+        the simulation in the array index file (see
+        `devices.genn.memory_mapped_results`). Returns ``None`` if the file is
+        not described correctly by the index.
+        '''
+        fname = os.path.join(self.project_dir, self.get_array_filename(var))
+        index_fname = os.path.join(os.path.dirname(fname), ARRAY_INDEX_FILE)
+        if index_fname not in self._array_indices:
+            index = {}
+            if os.path.exists(index_fname):
+                with open(index_fname) as f:
+                    for line in f:
+                        filename, dtype, *shape = line.split()
+                        index[filename] = (numpy.dtype(dtype),
+                                           tuple(int(dim) for dim in shape))
+            self._array_indices[index_fname] = index
+        index = self._array_indices[index_fname]
+        if os.path.basename(fname) not in index:
+            return None
+        dtype, shape = index[os.path.basename(fname)]
+        size = int(numpy.prod(shape))
+        # The file might have been changed after the index has been written
+        # (e.g. monitors in batched simulations)
+        if (dtype != numpy.dtype(var.dtype) or not os.path.exists(fname) or
+                os.path.getsize(fname) != size * dtype.itemsize):
+            return None
+        if size == 0:
+            values = numpy.zeros(shape, dtype=dtype)
+        else:
+            values = numpy.memmap(fname, dtype=dtype, mode='r', shape=shape)
+        if isinstance(var, DynamicArrayVariable):
+            var.size = shape if len(shape) == 2 else shape[0]
+        return values
+
+    def release_result_files(self, directory, keep_streams=False):
+        '''
+        Remove the result files of the previous run, so that memory-mapped
+        results of that run stay valid while the simulation writes new files.
+
+        Parameters
+        ----------
+        directory : str
+            The project directory.
+        keep_streams : bool, optional
+            Whether to only remove the files listed in the array index of the
+            previous run. The files of spike and state streams (see
+            `devices.genn.spike_monitor_streaming` and
+            `devices.genn.state_monitor_streaming`) have to be kept while the
+            simulation server is running, since it keeps writing to them.
+        '''
+        self._array_indices = {}
+        if not prefs.devices.genn.memory_mapped_results:
+            return
+        result_dirs = [os.path.join(directory, 'results')]
+        for batch in range(1, self.batch_size):
+            result_dirs.append(os.path.join(directory, BATCH_RESULTS_DIRECTORY,
+                                            str(batch), 'results'))
+        for result_dir in result_dirs:
+            if not os.path.isdir(result_dir):
+                continue
+            if keep_streams:
+                index_fname = os.path.join(result_dir, ARRAY_INDEX_FILE)
+                if not os.path.exists(index_fname):
+                    continue
+                with open(index_fname) as f:
+                    filenames = [line.split()[0] for line in f if line.strip()]
+                filenames.append(ARRAY_INDEX_FILE)
+            else:
+                filenames = os.listdir(result_dir)
+            for filename in filenames:
+                fname = os.path.join(result_dir, filename)
+                if os.path.isfile(fname):
+                    os.remove(fname)
+
+    def get_array_filename(self, var, basedir='results'):
+        filename = super().get_array_filename(var, basedir)
+        if self._batch_instance > 0:
+            filename = os.path.join(BATCH_RESULTS_DIRECTORY,
+                                    str(self._batch_instance), filename)
+        return filename
+
+    @contextmanager
+    def batch_instance(self, index):
+        '''
+        Context manager to access the results of a model instance in a batched
+        simulation (see the ``batch_size`` argument of `build`). Outside of
+        this context, the results of the first instance are returned. Example::
+
+            with device.batch_instance(3):
+                v_values = state_mon.v[:]
+
+        Parameters
+        ----------
+        index : int
+            The index of the model instance (between 0 and ``batch_size-1``).
+        '''
+        if not 0 <= index < self.batch_size:
+            raise IndexError('Model instance {} does not exist, the '
+                             'simulation used a batch size of '
+                             '{}.'.format(index, self.batch_size))
+        previous_instance = self._batch_instance
+        self._batch_instance = index
+        try:
+            yield
+        finally:
+            self._batch_instance = previous_instance
+
+    def check_batch_support(self, net_objects):
+        '''
+        Raise a `NotImplementedError` if the network uses a feature that is
+        not supported in batched simulations.
+        '''
+        for synapse_model in self.synapse_models:
+            if synapse_model.delay != 0:
+                raise NotImplementedError('Batched simulations do not '
+                                          'support synaptic delays (used by '
+                                          '{}).'.format(synapse_model.name))
+        for state_monitor_model in self.state_monitor_models:
+            if state_monitor_model.isSynaptic:
+                raise NotImplementedError('Batched simulations do not '
+                                          'support recording synaptic '
+                                          'variables (recorded by '
+                                          '{}).'.format(state_monitor_model.name))
+        for obj in net_objects:
+            if '_run_regularly' in obj.name:
+                raise NotImplementedError('Batched simulations do not '
+                                          'support run_regularly operations '
+                                          '(used by {}).'.format(obj.group.name))
+
+    def get_monitor_arrays(self, monitor):
+        '''
+        The arrays storing the results of a monitor, as a list of tuples of
+        the array name, its C++ type, and whether it is a dynamic array.
+        '''
+        arrays = []
+        for var in monitor.variables.values():
+            if (isinstance(var, ArrayVariable) and
+                    var.owner.name == monitor.name):
+                arrays.append((self.get_array_name(var, access_data=False),
+                               c_data_type(var.dtype),
+                               isinstance(var, DynamicArrayVariable)))
+        return sorted(set(arrays))
 
     def add_array_variable(self, model, varname, variable):
         if variable.scalar:
@@ -1209,7 +2290,8 @@ class GeNNDevice(CPPStandaloneDevice):
 
             code = self.fix_random_generators(neuron_model, code)
             code = decorate(code, neuron_model.variables,
-                            neuron_model.shared_variables,
+                            neuron_model.shared_variables +
+                            neuron_model.runtime_parameters,
                             neuron_model.parameters).strip()
             lines.append(code)
             code = stringify(codeobj.code.h_file)
@@ -1218,6 +2300,119 @@ class GeNNDevice(CPPStandaloneDevice):
             self.neuron_models.append(neuron_model)
             self.groupDict[neuron_model.name] = neuron_model
 
+    def get_clock_step(self, obj):
+        '''
+        The number of time steps of the ``defaultclock`` (which determines
+        GeNN's time step) between two time steps of the clock of an object.
+        Only clocks with a dt that is a multiple of the ``defaultclock``'s dt
+        are supported.
+        '''
+        dt = obj.clock.dt_
+        base_dt = defaultclock.dt_
+        step = int(dt / base_dt + 0.5)
+        if step < 1 or abs(dt - step * base_dt) > 1e-4 * base_dt:
+            raise NotImplementedError(
+                'Brian2GeNN only supports clocks with a dt that is a multiple '
+                'of the dt of the defaultclock, but {} uses a dt of '
+                '{}.'.format(obj.name, obj.clock.dt))
+        return step
+
+    def device_run_regularly_operations(self, group, objects):
+        '''
+        The run_regularly operations of a `NeuronGroup` or `Synapses` object
+        that GeNN executes as part of the neuron or synapse code (see
+        `devices.genn.run_regularly_on_device`), in their order of execution.
+        '''
+        if (not prefs.devices.genn.run_regularly_on_device or
+                self.batch_size > 1):
+            return []
+        run_regularly_objects = [o for name, o in objects.items()
+                                 if '_run_regularly' in name and
+                                 o.group.name == group.name]
+        return [run_reg for run_reg in sorted(run_regularly_objects,
+                                              key=lambda o: (o.order, o.name))
+                if self.can_run_regularly_on_device(run_reg, objects)]
+
+    def can_run_regularly_on_device(self, run_reg, objects):
+        '''
+        Whether a run_regularly operation can be executed as part of the
+        neuron or synapse code. This is only possible for operations that only
+        change variables of the individual neurons or synapses, that only use
+        functions that are available on the device, and whose changes are not
+        recorded by a `StateMonitor` in the "start" slot (which would record
+        the values before the operation) or, for a `NeuronGroup`, read by any
+        `Synapses` (which GeNN updates before the neurons).
+        '''
+        if run_reg.when != 'start' or run_reg.override_conditional_write:
+            return False
+        group = run_reg.group
+        codeobj = run_reg.codeobj
+        variables = codeobj.variables
+        indices = codeobj.variable_indices
+        read_write = self.run_regularly_read_write[codeobj.name]
+        identifiers = (get_identifiers(read_write['abstract_code']) |
+                       read_write['read'] | read_write['write'])
+        for varname in identifiers:
+            variable = variables.get(varname, None)
+            if isinstance(variable, Function):
+                try:
+                    variable.implementations[GeNNCodeObject]
+                except KeyError:
+                    return False
+            elif (isinstance(variable, ArrayVariable) and
+                  varname not in ['t', 'dt']):
+                index = indices[varname]
+                if index in ['_idx', '0']:
+                    if variable.owner.name != group.name:
+                        return False
+                elif (not isinstance(group, Synapses) or
+                      index not in ['_presynaptic_idx', '_postsynaptic_idx'] or
+                      variable.owner.name == group.name):
+                    return False
+        written = []
+        for varname in read_write['write']:
+            if variables[varname].scalar or indices[varname] != '_idx':
+                return False
+            written.append(variables[varname])
+        for obj in objects.values():
+            if isinstance(obj, StateMonitor) and obj.when == 'start':
+                source_variables = obj.source.variables
+                used = []
+                for varname in obj.record_variables:
+                    if isinstance(source_variables[varname], Subexpression):
+                        used += [source_variables[name] for name in
+                                 extract_source_variables(source_variables,
+                                                          varname, [])]
+                    else:
+                        used.append(source_variables[varname])
+            elif (isinstance(group, NeuronGroup) and
+                  isinstance(obj, CodeRunner) and
+                  isinstance(obj.group, Synapses)):
+                used = obj.codeobj.variables.values()
+            else:
+                continue
+            if any(variable is other for variable in written
+                   for other in used):
+                return False
+        return True
+
+    def add_run_regularly_parameters(self, model, run_regularly_operations):
+        '''
+        Add an extra global parameter for each run_regularly operation that is
+        executed on the device to the model, which is set by the host in the
+        time steps where the operation is executed. Returns a list of tuples of
+        the name of the operation and of the parameter.
+        '''
+        blocks = []
+        for run_reg in run_regularly_operations:
+            parameter = '_active_' + run_reg.name
+            model.run_regularly_parameters.append(parameter)
+            self.device_run_regularly[run_reg.name] = parameter
+            # The operation uses the runtime parameters of the model
+            self.host_constants.pop(run_reg.codeobj.name, None)
+            blocks.append((run_reg.name, parameter))
+        return blocks
+
     def process_neuron_groups(self, neuron_groups, objects):
         for obj in neuron_groups:
             # throw error if events other than spikes are used
@@ -1229,6 +2424,7 @@ class GeNNDevice(CPPStandaloneDevice):
             neuron_model = neuronModel()
             neuron_model.name = obj.name
             neuron_model.clock = obj.clock
+            neuron_model.step = self.get_clock_step(obj)
             neuron_model.N = obj.N
             self.add_array_variables(neuron_model, obj)
 
@@ -1312,6 +2508,23 @@ class GeNNDevice(CPPStandaloneDevice):
                 combined_variables.update(codeobj.variables)
                 combined_variable_indices.update(codeobj.variable_indices)
 
+            # run_regularly operations executed on the device (in separate
+            # code blocks, executed after the update of "constant over dt"
+            # subexpressions if the host set their extra global parameter)
+            run_regularly_operations = self.device_run_regularly_operations(obj, objects)
+            for run_reg in run_regularly_operations:
+                codeobj = run_reg.codeobj
+                abstract_code = self.run_regularly_read_write[codeobj.name]['abstract_code']
+                combined_abstract_code[run_reg.name] = [abstract_code]
+                # Do not pass on the number of neurons that was only added
+                # for the code executed on the host (see code_object)
+                identifiers = get_identifiers(abstract_code)
+                combined_variables.update({k: v for k, v in codeobj.variables.items()
+                                           if k != 'N' or k in identifiers})
+                combined_variable_indices.update(codeobj.variable_indices)
+            run_regularly_blocks = self.add_run_regularly_parameters(neuron_model,
+                                                                     run_regularly_operations)
+
             for code_block in combined_abstract_code.keys():
                 combined_abstract_code[code_block] = '\n'.join(combined_abstract_code[code_block])
 
@@ -1323,6 +2536,7 @@ class GeNNDevice(CPPStandaloneDevice):
                                                               'neuron_code',
                                                               combined_variable_indices,
                                                               codeobj_class=GeNNCodeObject,
+                                                              template_kwds={'run_regularly_blocks': run_regularly_blocks},
                                                               override_conditional_write=combined_override_conditional_write,
                                                               )
 
@@ -1338,26 +2552,74 @@ class GeNNDevice(CPPStandaloneDevice):
 
                 update_code = codeobj.code.stateupdate_code
                 reset_code = codeobj.code.reset_code
+                if neuron_model.step > 1:
+                    update_code, reset_code = self.fix_clock_step(neuron_model,
+                                                                  update_code,
+                                                                  reset_code,
+                                                                  has_thresholder)
                 for code, lines in [(update_code, neuron_model.code_lines),
                                     (reset_code, neuron_model.reset_code_lines)]:
                     code = self.fix_random_generators(neuron_model, code)
                     code = decorate(code, neuron_model.variables,
-                                    neuron_model.shared_variables,
+                                    neuron_model.shared_variables +
+                                    neuron_model.runtime_parameters,
                                     neuron_model.parameters).strip()
                     lines.append(code)
                 support_code = stringify(codeobj.code.h_file)
-                neuron_model.support_code_lines = support_code
+                neuron_model.support_code_lines.append(support_code)
             self.neuron_models.append(neuron_model)
             self.groupDict[neuron_model.name] = neuron_model
 
+    def fix_clock_step(self, neuron_model, update_code, reset_code,
+                       has_thresholder):
+        '''
+        Adapt the code of a group on a clock with a larger dt than the
+        ``defaultclock`` (i.e. GeNN's time step): the state update (and the
+        threshold condition) are only executed if the host set the extra
+        global parameter ``_clock_tick``, i.e. in the time steps of the
+        group's clock, and use the group's dt.
+        '''
+        dt_code = {'dt': '(%d * dt)' % neuron_model.step}
+        update_code, reset_code = ['\n'.join(line if line.lstrip().startswith('//')
+                                             else word_substitute(line, dt_code)
+                                             for line in code.split('\n'))
+                                   for code in (update_code, reset_code)]
+        lines = []
+        if has_thresholder:
+            # The threshold condition is evaluated by GeNN after the state
+            # update, it therefore has to be declared outside of the block
+            update_code = re.sub(r'\b(const\s+)?char\s+_cond\s*=', '_cond =',
+                                 update_code)
+            lines.append('char _cond = 0;')
+        lines += ['if ($(_clock_tick))', '{', update_code, '}']
+        return '\n'.join(lines), reset_code
+
     def process_spikegenerators(self, spikegenerator_groups):
         for obj in spikegenerator_groups:
             spikegenerator_model = spikegeneratorModel()
             spikegenerator_model.name = obj.name
             spikegenerator_model.codeobject_name = obj.codeobj.name
             spikegenerator_model.N = obj.N
+            if self.generates_spikes_on_device(obj):
+                spikegenerator_model.on_device = True
+                for attribute, varname in [('neuron_index_array', 'neuron_index'),
+                                           ('timebins_array', '_timebins'),
+                                           ('period_array', '_period_bins'),
+                                           ('lastindex_array', '_lastindex')]:
+                    setattr(spikegenerator_model, attribute,
+                            self.get_array_name(obj.variables[varname],
+                                                access_data=False))
             self.spikegenerator_models.append(spikegenerator_model)
 
+    def generates_spikes_on_device(self, group):
+        '''
+        Whether GeNN emits the spikes of a `SpikeGeneratorGroup` on the device
+        (see `devices.genn.spike_generator_on_device`). This is not possible
+        for batched simulations.
+        '''
+        return (prefs.devices.genn.spike_generator_on_device and
+                self.batch_size == 1)
+
     def process_synapses(self, synapse_groups, objects):
         for obj in synapse_groups:
             synapse_model = synapseModel()
@@ -1378,8 +2640,13 @@ class GeNNDevice(CPPStandaloneDevice):
             else:
                 synapse_model.trgname = obj.target.name
                 synapse_model.trgN = obj.target.variables['N'].get_value()
-            synapse_model.connectivity = prefs.devices.genn.connectivity
-            self.connectivityDict[obj.name] = synapse_model.connectivity
+            synapse_model.connectivity = getattr(obj, 'genn_connectivity',
+                                                 prefs.devices.genn.connectivity)
+            if synapse_model.connectivity not in CONNECTIVITY_TYPES:
+                raise ValueError("Invalid connectivity '{}' for {}, has to be "
+                                 "one of {}.".format(synapse_model.connectivity,
+                                                     obj.name,
+                                                     ', '.join(CONNECTIVITY_TYPES)))
 
             for pathway in obj._synaptic_updaters:
                 if pathway not in ['pre', 'post']:
@@ -1404,29 +2671,26 @@ class GeNNDevice(CPPStandaloneDevice):
                     self.collect_synapses_variables(synapse_model, pathway,
                                                     codeobj)
                     if pathway == 'pre':
-                        # Use the stored scalar delay (if any) for these synapses
-                        synapse_model.delay = int(
-                            self.delays.get(obj.name,
-                                            0.0) / defaultclock.dt_ + 0.5)
+                        # Use the stored scalar delay (if any) for these
+                        # synapses, Brian rounds it to time steps of the
+                        # pathway's clock (i.e. of the presynaptic group)
+                        delay_steps = int(self.delays.get(obj.name, 0.0) /
+                                          obj.pre.clock.dt_ + 0.5)
+                        synapse_model.delay = (delay_steps *
+                                               self.get_clock_step(obj.pre))
                     code = codeobj.code.cpp_file
-                    code_lines = [line.strip() for line in code.split('\n')]
-                    new_code_lines = []
-                    if pathway == 'pre':
-                        for line in code_lines:
-                            if line.startswith('addtoinSyn'):
-                                if synapse_model.connectivity == 'SPARSE':
-                                    line = line.replace('_hidden_weightmatrix*',
-                                                        '')
-                                    line = line.replace(
-                                        '_hidden_weightmatrix *', '')
-                            new_code_lines.append(line)
-                        code = '\n'.join(new_code_lines)
-
                     self.fix_synapses_code(synapse_model, pathway, codeobj,
                                            code)
 
-            if obj.state_updater is not None:
+            run_regularly_operations = self.device_run_regularly_operations(obj, objects)
+            if run_regularly_operations:
+                codeobj = self.synapses_dynamics_code_object(obj, synapse_model,
+                                                             run_regularly_operations)
+            elif obj.state_updater is not None:
                 codeobj = obj.state_updater.codeobj
+            else:
+                codeobj = None
+            if codeobj is not None:
                 code = codeobj.code.cpp_file
                 self.collect_synapses_variables(synapse_model, 'dynamics',
                                                 codeobj)
@@ -1476,15 +2740,57 @@ class GeNNDevice(CPPStandaloneDevice):
                             addVar= addVar.replace(k,'$('+k+')')
                     code= '\\n\\\n $(addToInSyn,'+addVar+');\\n'
                     synapse_model.main_code_lines['dynamics'] += code
+                    synapse_model.dense_main_code_lines['dynamics'] += code
                     #quick and dirty test to avoid adding the same support code twice
                     support_code = stringify('\n'.join(kwds['support_code_lines']))
                     if support_code not in synapse_model.support_code_lines['dynamics']:
                         synapse_model.support_code_lines['dynamics'] += support_code
                 else:
                     synapse_model.postSyntoCurrent = '0'
+            self.resolve_connectivity(obj, synapse_model)
+            self.connectivityDict[obj.name] = synapse_model.connectivity
             self.synapse_models.append(synapse_model)
             self.groupDict[synapse_model.name] = synapse_model
 
+    def synapses_dynamics_code_object(self, synapses, synapse_model,
+                                      run_regularly_operations):
+        '''
+        Generate a single code object for the synaptic dynamics and the
+        run_regularly operations of a `Synapses` object that are executed on
+        the device (see `devices.genn.run_regularly_on_device`). The
+        operations are executed before the synaptic dynamics (as in Brian's
+        "start" slot), if the host set their extra global parameter.
+        '''
+        abstract_code = {'stateupdate': ''}
+        variables = {}
+        variable_indices = defaultdict(lambda: '_idx')
+        override_conditional_write = set()
+        code_runners = list(run_regularly_operations)
+        if synapses.state_updater is not None:
+            code_runners.append(synapses.state_updater)
+            abstract_code['stateupdate'] = synapses.state_updater.abstract_code
+            override_conditional_write.update(
+                synapses.state_updater.override_conditional_write or [])
+        for code_runner in code_runners:
+            variables.update(code_runner.codeobj.variables)
+            variable_indices.update(code_runner.codeobj.variable_indices)
+        for run_reg in run_regularly_operations:
+            abstract_code[run_reg.name] = self.run_regularly_read_write[run_reg.codeobj.name]['abstract_code']
+        blocks = self.add_run_regularly_parameters(synapse_model,
+                                                   run_regularly_operations)
+        codeobj = super().code_object(synapses,
+                                      synapses.name + '_dynamics_codeobject',
+                                      abstract_code,
+                                      variables,
+                                      'synapses_dynamics',
+                                      variable_indices,
+                                      codeobj_class=GeNNCodeObject,
+                                      template_kwds={'run_regularly_blocks': blocks},
+                                      override_conditional_write=override_conditional_write)
+        # As for the neuron code, we take care of the code object manually
+        del self.code_objects[codeobj.name]
+        return codeobj
+
     def collect_synapses_variables(self, synapse_model, pathway, codeobj):
         identifiers = set()
         for code in codeobj.code.values():
@@ -1521,17 +2827,347 @@ class GeNNDevice(CPPStandaloneDevice):
                     'subexpressions in synaptic statements')
 
     def fix_synapses_code(self, synapse_model, pathway, codeobj, code):
-        if synapse_model.connectivity == 'DENSE':
+        if synapse_model.connectivity == 'AUTO':
+            synapse_model.dense_main_code_lines[pathway] = \
+                self.decorate_synapses_code(synapse_model, pathway, code,
+                                            'DENSE')
+        synapse_model.main_code_lines[pathway] = \
+            self.decorate_synapses_code(synapse_model, pathway, code,
+                                        synapse_model.connectivity)
+        code = stringify(codeobj.code.h_file)
+        synapse_model.support_code_lines[pathway] = code
+
+    def decorate_synapses_code(self, synapse_model, pathway, code,
+                               connectivity):
+        '''
+        Translate the code of a synaptic pathway (or of the synaptic dynamics)
+        into GeNN code for the given connectivity format. Only the DENSE
+        format stores non-existing synapses, which have to be skipped.
+        '''
+        if connectivity == 'DENSE':
             code = 'if (_hidden_weightmatrix != 0.0) {' + code + '}'
+        elif pathway == 'pre':
+            code_lines = [line.strip() for line in code.split('\n')]
+            new_code_lines = []
+            for line in code_lines:
+                if line.startswith('addtoinSyn'):
+                    line = line.replace('_hidden_weightmatrix*', '')
+                    line = line.replace('_hidden_weightmatrix *', '')
+                new_code_lines.append(line)
+            code = '\n'.join(new_code_lines)
         code = self.fix_random_generators(synapse_model, code)
         thecode = decorate(code, synapse_model.variables,
-                           synapse_model.shared_variables,
+                           synapse_model.shared_variables +
+                           synapse_model.runtime_parameters,
                            synapse_model.parameters, False).strip()
         thecode = decorate(thecode, synapse_model.external_variables, [],
                            [], True).strip()
-        synapse_model.main_code_lines[pathway] = thecode
-        code = stringify(codeobj.code.h_file)
-        synapse_model.support_code_lines[pathway] = code
+        return thecode
+
+    def resolve_connectivity(self, synapses, synapse_model):
+        '''
+        Check whether the connectivity format of a `Synapses` object can be
+        used, and determine the formats that can be chosen for the
+        connectivity 'AUTO'.
+
+        GeNN's BITMASK format only stores whether two neurons are connected,
+        it can therefore only be used for synapses without individual
+        variables, and without postsynaptic or continuous updates. The dense
+        formats (DENSE and BITMASK) cannot represent multiple synapses between
+        the same pair of neurons. With the connectivity 'AUTO', they are
+        therefore only considered if the synapses are created by a single
+        ``connect`` call with a condition or a probability (and ``n=1``).
+
+        The PROCEDURAL format does not store the synapses at all, GeNN
+        regenerates them for each presynaptic spike with a connectivity
+        initialisation snippet. It has the same restrictions as the BITMASK
+        format, and the synapses have to be created with a single ``connect``
+        call that can be expressed as a snippet (see
+        `get_connectivity_initialiser`). The synapse creation on the host is
+        skipped, Brian's synaptic indices therefore remain empty.
+        '''
+        stateless = not (synapse_model.variables or
+                         synapse_model.main_code_lines['post'] or
+                         synapse_model.main_code_lines['dynamics'])
+        if synapse_model.connectivity == 'BITMASK' and not stateless:
+            raise NotImplementedError('The BITMASK connectivity can only be '
+                                      'used for synapses without individual '
+                                      'variables and without postsynaptic '
+                                      'or continuous updates, use DENSE or '
+                                      'SPARSE for {}.'.format(synapses.name))
+        if synapse_model.connectivity == 'PROCEDURAL':
+            initialiser = self.connectivity_initialisers.get(synapses.name)
+            if (not stateless or initialiser is None or
+                    isinstance(synapses.source, Subgroup) or
+                    isinstance(synapses.target, Subgroup)):
+                raise NotImplementedError('The PROCEDURAL connectivity can '
+                                          'only be used for synapses without '
+                                          'individual variables and without '
+                                          'postsynaptic or continuous '
+                                          'updates, created with a single '
+                                          'connect call with a fixed '
+                                          'probability (e.g. '
+                                          'connect(p=0.1)) between two '
+                                          'groups, use another connectivity '
+                                          'for {}.'.format(synapses.name))
+            synapse_model.connectivity_initialiser = initialiser
+            self.replace_synapse_creation(synapses)
+        if (synapse_model.connectivity == 'SPARSE' and
+                prefs.devices.genn.connectivity_init_on_device and
+                self.connectivity_initialisers.get(synapses.name) is not None and
+                not isinstance(synapses.source, Subgroup) and
+                not isinstance(synapses.target, Subgroup)):
+            synapse_model.connectivity_initialiser = \
+                self.connectivity_initialisers[synapses.name]
+            self.replace_synapse_creation(
+                synapses, self.device_connect_code_objects[synapses.name])
+        if synapse_model.connectivity == 'AUTO':
+            if self.unique_synapses.get(synapses.name, False):
+                options = ['DENSE', 'SPARSE']
+                if stateless:
+                    options.append('BITMASK')
+                synapse_model.connectivity_options = options
+                # The only variable that is not a Brian variable is the
+                # uint64_t seed for random number generation
+                synapse_model.synapse_bytes = sum(
+                    numpy.dtype(synapses.variables[var].dtype
+                                if var in synapses.variables
+                                else numpy.uint64).itemsize
+                    for var in synapse_model.variables)
+            else:
+                # The code of the synapses has been generated for SPARSE
+                synapse_model.connectivity = 'SPARSE'
+        if synapse_model.connectivity != 'AUTO':
+            synapse_model.connectivity_options = [synapse_model.connectivity]
+
+    def get_connectivity_initialiser(self, variables, template_kwds,
+                                     abstract_code):
+        '''
+        Determine the GeNN connectivity initialisation snippet that creates
+        the same kind of connectivity as a synapse generator expression.
+
+        Parameters
+        ----------
+        variables : dict
+            The variables of the synapse creation code object.
+        template_kwds : dict
+            The keywords of the synapse creation template, including the
+            parsed generator expression.
+        abstract_code : dict
+            The abstract code of the synapse creation code object.
+
+        Returns
+        -------
+        initialiser : tuple or None
+            The name of the snippet class and the list of its parameter values,
+            or ``None`` if the generator expression cannot be expressed as a
+            snippet. Apart from GeNN's built-in snippets, this can be the
+            snippet `FIXED_NUMBER_POST_SNIPPET` defined in the model
+            definition, which samples postsynaptic neurons without replacement
+            (GeNN's ``FixedNumberPostWithReplacement`` can create several
+            synapses between the same pair of neurons).
+
+        Notes
+        -----
+        The supported generator expressions are a fixed probability
+        (``connect(p=...)``, optionally with ``condition='i != j'``), a fixed
+        number of synapses for each presynaptic neuron
+        (``connect(j='k for k in sample(N_post, size=...)')``), and one-to-one
+        connections (``connect(j='i')``). In contrast to Brian, GeNN's
+        snippets do not check that the postsynaptic indices are valid.
+        '''
+        if (template_kwds.get('outer_index') != 'i' or
+                re.search(r'^_n = 1$', abstract_code.get('update', ''),
+                          re.MULTILINE) is None):
+            return None
+        inner = template_kwds['inner_variable']
+        iterator_kwds = template_kwds['iterator_kwds']
+        condition = template_kwds['if_expression'].replace(' ', '')
+        iterator_range = (iterator_kwds['low'], iterator_kwds['high'],
+                          iterator_kwds['step'])
+        N_pre = evaluate_constant('N_pre', variables)
+        N_post = evaluate_constant('N_post', variables)
+        if (template_kwds['iterator_func'] == 'sample' and
+                template_kwds['element'] == inner and
+                iterator_range == ('0', 'N_post', '1')):
+            if iterator_kwds['sample_size'] == 'random':
+                p = evaluate_constant(iterator_kwds['p'], variables)
+                if p is None:
+                    return None
+                if condition == 'True':
+                    return 'InitSparseConnectivitySnippet::FixedProbability', [p]
+                if condition in ['i!=' + inner, inner + '!=i']:
+                    return 'InitSparseConnectivitySnippet::FixedProbabilityNoAutapse', [p]
+            else:
+                size = evaluate_constant(iterator_kwds['size'], variables)
+                if (condition == 'True' and size is not None and
+                        size == int(size) and 0 <= size <= N_post):
+                    return FIXED_NUMBER_POST_SNIPPET, [int(size)]
+        elif (template_kwds['iterator_func'] == 'range' and
+                template_kwds['element'] == 'i' and
+                iterator_range == ('0', '1', '1') and condition == 'True' and
+                N_pre is not None and N_post is not None and N_pre <= N_post):
+            return 'InitSparseConnectivitySnippet::OneToOne', []
+        return None
+
+    def replace_synapse_creation(self, synapses, codeobj=None):
+        '''
+        Do not create the synapses of a `Synapses` object on the host, neither
+        in the model definition nor in the simulation (for synapses that are
+        created by GeNN).
+
+        Parameters
+        ----------
+        synapses : `Synapses`
+            The synapses created by GeNN.
+        codeobj : `CodeObject`, optional
+            The code object that is executed instead of the synapse creation,
+            copying the synapses created by GeNN into Brian's data structures.
+            If not specified, Brian's synaptic indices remain empty.
+        '''
+        for codeobj_name in self.connect_code_objects[synapses.name]:
+            self.replaced_code_objects[codeobj_name] = codeobj
+            load_codeobj = self.load_connect_code_objects.pop(codeobj_name)
+            self.code_objects.pop(load_codeobj.name, None)
+        self.max_row_length_synapses.discard(synapses.name)
+        if codeobj is not None:
+            self.code_objects[codeobj.name] = codeobj
+
+    def get_variable_initialiser(self, variables, abstract_code):
+        '''
+        Determine the GeNN variable initialisation snippet that sets a variable
+        to the same kind of values as a string expression.
+
+        Parameters
+        ----------
+        variables : dict
+            The variables of the code object setting the variable.
+        abstract_code : dict
+            The abstract code of the code object, with the condition (which
+            has to be ``True``) and the statement setting the variable.
+
+        Returns
+        -------
+        initialiser : tuple or None
+            The variable, the name of the snippet class and the list of its
+            parameter values, or ``None`` if the expression cannot be
+            expressed as a snippet.
+
+        Notes
+        -----
+        The supported expressions only refer to constants and to at most one
+        call of ``rand()`` or ``randn()``, which has to be used linearly (e.g.
+        ``'v_min + rand()*(v_max - v_min)'``). They are translated into GeNN's
+        ``Constant``, ``Uniform`` and ``Normal`` snippets.
+        '''
+        if abstract_code.get('condition', '').replace(' ', '') != '_cond=True':
+            return None
+        match = re.fullmatch(r'(\w+) = (.+)',
+                             abstract_code.get('statement', '').strip())
+        if match is None:
+            return None
+        varname, expr = match.groups()
+        var = variables.get(varname, None)
+        if not isinstance(var, ArrayVariable) or var.scalar:
+            return None
+        calls = re.findall(r'\b(randn?)\(\s*\)', expr)
+        if not calls:
+            value = evaluate_constant(expr, variables)
+            if value is None:
+                return None
+            return var, 'InitVarSnippet::Constant', [value]
+        func = calls[0]
+        if (len(calls) > 1 or numpy.dtype(var.dtype).kind != 'f' or
+                variables.get(func, None) is not DEFAULT_FUNCTIONS[func]):
+            return None
+        try:
+            sympy_expr = str_to_sympy(re.sub(r'\brandn?\(\s*\)',
+                                             '_random_number', expr))
+            random_number, = [symbol for symbol in sympy_expr.free_symbols
+                              if symbol.name == '_random_number']
+            scale = sympy.diff(sympy_expr, random_number)
+            if random_number in scale.free_symbols:
+                return None
+            offset = sympy_expr.subs(random_number, 0)
+        except Exception:
+            return None
+        offset = evaluate_constant(sympy_to_str(offset), variables)
+        scale = evaluate_constant(sympy_to_str(scale), variables)
+        if offset is None or scale is None:
+            return None
+        if func == 'randn':
+            return var, 'InitVarSnippet::Normal', [offset, abs(scale)]
+        return var, 'InitVarSnippet::Uniform', [min(offset, offset + scale),
+                                                 max(offset, offset + scale)]
+
+    def resolve_variable_initialisers(self):
+        '''
+        Determine the variables that are initialised by GeNN (see
+        `devices.genn.variable_init_on_device`), and remove their
+        initialisation from the code executed on the host.
+
+        A variable is initialised by GeNN if it is only set for the whole
+        group, to a constant value or with expressions that can be translated
+        into a snippet (see `get_variable_initialiser`), and if no other code
+        refers to it before the run. For synapses, it also has to be set after
+        all synapses have been created. If the variable is set several times,
+        the last value is used.
+        '''
+        if not prefs.devices.genn.variable_init_on_device:
+            return
+        # The arrays of all variables stored in GeNN
+        candidates = {}
+        for var in self.arrays:
+            model = self.groupDict.get(getattr(var.owner, 'name', None), None)
+            if (model is not None and var.name in model.variables and
+                    model.variablescope[var.name] == 'brian'):
+                candidates[var] = self.get_array_name(var, access_data=False)
+        owners = {arrayname: var.owner.name
+                  for var, arrayname in candidates.items()}
+        creating_synapses = {codeobj_name: synapses_name
+                             for synapses_name, names in self.connect_code_objects.items()
+                             for codeobj_name in names}
+        initialisers = {}
+        excluded = set()
+        for func, args in self.main_queue:
+            if func == 'set_by_constant':
+                arrayname, value, _ = args
+                if arrayname in owners:
+                    initialisers[arrayname] = ('InitVarSnippet::Constant',
+                                               [float(value)])
+            elif func in ['set_by_array', 'set_by_single_value',
+                          'set_array_by_array']:
+                excluded.add(args[0])
+            elif func == 'run_code_object':
+                codeobj, = args
+                if codeobj.name in creating_synapses:
+                    # Values set before creating (more) synapses do not apply
+                    # to all synapses
+                    excluded.update(arrayname for arrayname in initialisers
+                                    if owners[arrayname] == creating_synapses[codeobj.name])
+                initialiser = self.variable_initialisers.get(codeobj.name, None)
+                for var in codeobj.variables.values():
+                    if not isinstance(var, ArrayVariable) or var not in candidates:
+                        continue
+                    if initialiser is not None and var is initialiser[0]:
+                        initialisers[candidates[var]] = initialiser[1:]
+                    else:
+                        excluded.add(candidates[var])
+        for var, arrayname in candidates.items():
+            if arrayname not in initialisers or arrayname in excluded:
+                continue
+            snippet, params = initialisers[arrayname]
+            # The parameters are written as C++ literals
+            if not numpy.all(numpy.isfinite(params)):
+                continue
+            self.groupDict[var.owner.name].variable_initialisers[var.name] = (snippet, params)
+            self.device_initialised_arrays.add(arrayname)
+            logger.debug('Variable {} of {} is initialised by GeNN with '
+                         '{}{}'.format(var.name, var.owner.name, snippet,
+                                       tuple(params)))
+        for codeobj_name, (var, _, _) in self.variable_initialisers.items():
+            if candidates.get(var, None) in self.device_initialised_arrays:
+                self.replaced_code_objects[codeobj_name] = None
 
     def process_spike_monitors(self, spike_monitors):
         for obj in spike_monitors:
@@ -1557,8 +3193,19 @@ class GeNNDevice(CPPStandaloneDevice):
             if isinstance(src, Subgroup):
                 src = src.source
             sm.neuronGroup = src.name
-            if isinstance(src, SpikeGeneratorGroup):
+            sm.step = self.get_clock_step(obj)
+            if (isinstance(src, SpikeGeneratorGroup) and
+                    not self.generates_spikes_on_device(src)):
                 sm.notSpikeGeneratorGroup = False
+            if obj.name in self.spike_recording_monitors:
+                sm.spike_recording = True
+                self.groupDict[src.name].spike_recording = True
+            sm.batch_arrays = self.get_monitor_arrays(obj)
+            sm.batch_pointers = [('glbSpkCnt' + src.name, 1),
+                                 ('glbSpk' + src.name, src.N)]
+            for varname in sorted(obj.record_variables):
+                if varname not in ['i', 't']:
+                    sm.batch_pointers.append((varname + src.name, src.N))
             self.spike_monitor_models.append(sm)
 
             # ------------------------------------------------------------------------------
@@ -1577,10 +3224,54 @@ class GeNNDevice(CPPStandaloneDevice):
             if isinstance(src, Subgroup):
                 src = src.source
             sm.neuronGroup = src.name
-            if isinstance(src, SpikeGeneratorGroup):
+            sm.step = self.get_clock_step(obj)
+            if (isinstance(src, SpikeGeneratorGroup) and
+                    not self.generates_spikes_on_device(src)):
                 sm.notSpikeGeneratorGroup = False
+            if obj.name in self.device_rate_monitors:
+                self.add_spike_counting_code(obj, sm)
+            sm.batch_arrays = self.get_monitor_arrays(obj)
+            sm.batch_pointers = [('glbSpkCnt' + src.name, 1),
+                                 ('glbSpk' + src.name, src.N)]
             self.rate_monitor_models.append(sm)
 
+    def add_spike_counting_code(self, monitor, sm):
+        '''
+        Add the code that counts the spikes for a `PopulationRateMonitor` on
+        the device to the reset code of the monitored group. The spikes are
+        counted in the element of the extra global parameter
+        ``_rate_count_<monitor>`` given by the extra global parameter
+        ``_rate_slot``, which is set by the host in every time step.
+        '''
+        neuron_model = self.groupDict[sm.neuronGroup]
+        sm.on_device = True
+        sm.counter = self.get_rate_counter(monitor)
+        counter = '_rate_count_' + sm.name
+        if '_rate_slot' not in neuron_model.recording_parameters:
+            neuron_model.recording_parameters.append('_rate_slot')
+            neuron_model.recording_parametertypes.append('unsigned int')
+            # The reset code runs in parallel for all neurons that spiked
+            neuron_model.support_code_lines.append(stringify('''
+SUPPORT_CODE_FUNC void _count_spike(unsigned int *counter)
+{
+#ifdef __CUDA_ARCH__
+    atomicAdd(counter, 1u);
+#else
+    (*counter)++;
+#endif
+}
+'''))
+        neuron_model.recording_parameters.append(counter)
+        neuron_model.recording_parametertypes.append('unsigned int*')
+        lines = ['// count the spikes for %s' % sm.name]
+        count_line = '_count_spike(&$(%s)[$(_rate_slot)]);' % counter
+        if isinstance(monitor.source, Subgroup):
+            lines.append('if ($(id) >= %d && $(id) < %d)' % (monitor.source.start,
+                                                            monitor.source.stop))
+            count_line = '    ' + count_line
+        lines.append(count_line)
+        neuron_model.reset_code_lines.append(stringify('\n' + '\n'.join(lines)))
+
     def process_state_monitors(self, directory, state_monitors, writer):
         for obj in state_monitors:
             sm = stateMonitorModel()
@@ -1658,14 +3349,88 @@ class GeNNDevice(CPPStandaloneDevice):
                         'Brian2GeNN does not support StateMonitors '
                         'with a dt that is not a multiple of the dt of the '
                         'monitored object.')
-                sm.step = int(obj_dt / source_dt + 0.5)
-
+                sm.step = self.get_clock_step(obj)
+            sm.N_array = self.get_array_name(obj.variables['N'])
+            sm.t_array = self.get_array_name(obj.variables['t'],
+                                             access_data=False)
+            sm.t_filename = self.get_array_filename(obj.variables['t'])
+            sm.recorded_arrays = [(self.get_array_name(var, access_data=False),
+                                   self.get_array_filename(var))
+                                  for _, var in sorted(obj.recorded_variables.items())]
+
+            if self.can_record_states_on_device(obj, sm):
+                self.add_state_recording_code(obj, sm)
             self.state_monitor_models.append(sm)
 
+    def can_record_states_on_device(self, monitor, sm):
+        '''
+        Whether the neuron kernel should write the values recorded by a
+        `StateMonitor` into a buffer on the device (see
+        `devices.genn.state_monitor_on_device`). This is only possible for
+        monitors of a `NeuronGroup` that record at least one index, and only
+        variables that are updated on the device and not changed by a
+        run_regularly operation.
+        '''
+        if (not prefs.devices.genn.state_monitor_on_device or
+                self.batch_size > 1 or
+                not isinstance(sm.src, NeuronGroup) or
+                monitor.n_indices == 0 or not sm.variables):
+            return False
+        neuron_model = self.groupDict[sm.monitored]
+        if not all(varname in neuron_model.variables
+                   for varname in sm.variables):
+            return False
+        for codeobj_name, read_write in self.run_regularly_read_write.items():
+            if (self.code_objects[codeobj_name].owner.name == sm.monitored and
+                    any(varname in read_write['write']
+                        for varname in sm.variables)):
+                return False
+        return True
+
+    def add_state_recording_code(self, monitor, sm):
+        '''
+        Add the code that writes the values recorded by a `StateMonitor` into
+        a buffer on the device to the neuron model of the monitored group. The
+        values are written at the end of the state update (and again after a
+        reset), into the row of the buffer given by the extra global parameter
+        ``_rec_slot_<monitor>``, which is set by the host (and negative if
+        nothing should be recorded in the current time step).
+        '''
+        neuron_model = self.groupDict[sm.monitored]
+        sm.on_device = True
+        sm.buffer_steps = prefs.devices.genn.state_monitor_device_buffer_steps
+        sm.n_indices = monitor.n_indices
+        if isinstance(monitor.source, Subgroup):
+            sm.offset = monitor.source.start
+        sm.indices_array = self.get_array_name(monitor.variables['_indices'])
+        slot = '_rec_slot_' + sm.name
+        index = '_rec_index_' + sm.name
+        neuron_model.recording_parameters += [slot, index]
+        neuron_model.recording_parametertypes += ['int', 'int*']
+        lines = ['// record the values for %s' % sm.name,
+                 'if ($(%s) >= 0 && $(%s)[$(id)] >= 0)' % (slot, index),
+                 '{',
+                 '    const int _rec_idx = $(%s) * %d + $(%s)[$(id)];' % (slot, sm.n_indices, index)]
+        # Subexpressions can refer to the same variable several times
+        for varname in dict.fromkeys(sm.variables):
+            buffer_name = '_rec_%s_%s' % (varname, sm.name)
+            var_type = neuron_model.variabletypes[neuron_model.variables.index(varname)]
+            neuron_model.recording_parameters.append(buffer_name)
+            neuron_model.recording_parametertypes.append(var_type + '*')
+            sm.buffer_variables.append((varname, buffer_name, var_type))
+            lines.append('    $(%s)[_rec_idx] = $(%s);' % (buffer_name, varname))
+        lines.append('}')
+        code = stringify('\n' + '\n'.join(lines))
+        neuron_model.code_lines.append(code)
+        neuron_model.reset_code_lines.append(code)
+
     def consolidate_pull_operations(self, run_regularly_operations):
         models_start = defaultdict(list)
         models_end = defaultdict(list)
         for sm in self.state_monitor_models:
+            if sm.on_device:
+                # The recorded values are copied from the buffer on the device
+                continue
             if sm.when == 'start':
                 for varname in sm.variables:
                     # Do not pull variables that are only updated in run_regularly
@@ -1692,7 +3457,73 @@ class GeNNDevice(CPPStandaloneDevice):
                 models_start[key] = [1]
         return models_start, models_end
 
-    def generate_model_source(self, writer, main_lines, use_GPU):
+    def get_initialisation_lines(self, main_lines):
+        '''
+        The lines of the main code that initialize variables, i.e. without
+        creating synapses or resetting monitors.
+        '''
+        return [line for line in main_lines
+                if ('_synapses_create_' not in line) and ('monitor' not in line)]
+
+    def model_definition_draws_random_numbers(self):
+        '''
+        Whether the code executed in the model definition up to the last
+        synapse creation that is loaded by the simulation draws random numbers
+        (and the stored synapses and random state therefore have to change for
+        every run).
+        '''
+        uses_random_numbers = False
+        for func, args in self.main_queue:
+            if func != 'run_code_object':
+                continue
+            codeobj, = args
+            if codeobj.name in self.load_connect_code_objects:
+                if (uses_random_numbers or
+                        codeobj.name in self.random_code_objects):
+                    return True
+            elif (codeobj.name not in self.replaced_code_objects and
+                    codeobj.name in self.random_code_objects):
+                uses_random_numbers = True
+        return False
+
+    def get_random_state_file(self):
+        '''
+        The file storing the initial state of the random number generator in
+        the model definition, or ``None`` if the simulation does not load any
+        synapses created in the model definition.
+        '''
+        if not self.load_connect_code_objects:
+            return None
+        return '%s/%s' % (CONNECTIVITY_DIRECTORY, RANDOM_STATE_FILE)
+
+    def make_connectivity_lines(self, codeobj):
+        '''
+        The lines of the model definition that execute a synapse creation code
+        object, and store the created synapses (together with the resulting
+        number of synapses per neuron and the state of the random number
+        generator) in a file that is loaded by the simulation.
+        '''
+        owner = codeobj.owner
+        array_names = [self.get_array_name(owner.variables[varname],
+                                           access_data=False)
+                       for varname in ['_synaptic_pre', '_synaptic_post',
+                                       'N_incoming', 'N_outgoing']]
+        code = '''
+        {{
+            const size_t _first_synapse = {pre}.size();
+            _run_{codeobj_name}();
+            if (!b2g::write_synapses("{filename}", {pre}, {post}, _first_synapse,
+                                     {incoming}, {outgoing},
+                                     brian::_mersenne_twister_states[0]))
+                exit(1);
+        }}
+        '''.format(codeobj_name=codeobj.name,
+                   filename='%s/%s' % (CONNECTIVITY_DIRECTORY, codeobj.name),
+                   pre=array_names[0], post=array_names[1],
+                   incoming=array_names[2], outgoing=array_names[3])
+        return code.split('\n')
+
+    def generate_model_source(self, writer, use_GPU):
         synapses_classes_tmp = CPPStandaloneCodeObject.templater.synapses_classes(None, None)
         writer.write('synapses_classes.*', synapses_classes_tmp)
         default_dtype = prefs.core.default_float_dtype
@@ -1703,13 +3534,18 @@ class GeNNDevice(CPPStandaloneDevice):
         else:
             raise NotImplementedError("GeNN does not support default dtype "
                                       "'{}'".format(default_dtype.__name__))
-        dry_main_lines= []
-        for line in main_lines:
-            if ('_synapses_create_' not in line) and ('monitor' not in line):
-                dry_main_lines.append(line)
+        model_main_lines = [line for line in self.make_main_lines(model_definition=True)
+                            if 'monitor' not in line]
+        if any(synapse_model.connectivity_initialiser is not None and
+               synapse_model.connectivity_initialiser[0] == FIXED_NUMBER_POST_SNIPPET
+               for synapse_model in self.synapse_models):
+            fixed_number_post_snippet = FIXED_NUMBER_POST_SNIPPET
+        else:
+            fixed_number_post_snippet = None
         codeobj_inc= []
         for codeobj in self.code_objects.values():
-            if ('group_variable' in codeobj.name):
+            if ('group_variable' in codeobj.name or
+                    codeobj.name in self.load_connect_code_objects):
                 codeobj_inc.append('#include "code_objects/'+codeobj.name+'.cpp"')
         model_tmp = GeNNCodeObject.templater.model(None, None,
                                                    use_GPU=use_GPU,
@@ -1717,29 +3553,121 @@ class GeNNDevice(CPPStandaloneDevice):
                                                    neuron_models=self.neuron_models,
                                                    spikegenerator_models=self.spikegenerator_models,
                                                    synapse_models=self.synapse_models,
-                                                   main_lines=dry_main_lines,
-                                                   max_row_length_include= self.max_row_length_include,
-                                                   max_row_length_run_calls=self.max_row_length_run_calls,
+                                                   main_lines=model_main_lines,
                                                    max_row_length_synapses=self.max_row_length_synapses,
+                                                   random_state_file=self.get_random_state_file(),
                                                    codeobj_inc=codeobj_inc,
                                                    dtDef=self.dtDef,
                                                    profiled=self.kernel_timings,
                                                    prefs=prefs,
                                                    precision=precision,
+                                                   batch_size=self.batch_size,
+                                                   packed_static_arrays=bool(self.packed_static_array_specs),
+                                                   auto_connectivity=self.has_auto_connectivity(),
+                                                   connectivity_header_file=CONNECTIVITY_HEADER_FILE,
+                                                   fixed_number_post_snippet=fixed_number_post_snippet,
                                                    header_files=prefs['codegen.cpp.headers']
                                                    )
         writer.write('magicnetwork_model.cpp', model_tmp)
 
+    def has_auto_connectivity(self):
+        '''
+        Whether the connectivity format of any synapses is chosen during the
+        model definition (see `resolve_connectivity`).
+        '''
+        return any(synapse_model.connectivity == 'AUTO'
+                   for synapse_model in self.synapse_models)
+
+    def get_array_index(self):
+        '''
+        The arrays written by ``_write_arrays``, as a list of tuples of the
+        file name (in the results directory), the numpy type string, and the
+        C++ expressions for the size of each dimension.
+        '''
+        def filename(var):
+            return os.path.basename(CPPStandaloneDevice.get_array_filename(self, var))
+        array_index = []
+        for var, varname in sorted(self.arrays.items(), key=lambda item: item[1]):
+            if var in self.dynamic_arrays or var in self.dynamic_arrays_2d:
+                continue
+            array_index.append((filename(var), numpy.dtype(var.dtype).str,
+                                [str(var.size)]))
+        for var, varname in sorted(self.dynamic_arrays.items(),
+                                   key=lambda item: item[1]):
+            array_index.append((filename(var), numpy.dtype(var.dtype).str,
+                                ['brian::{}.size()'.format(varname)]))
+        for var, varname in sorted(self.dynamic_arrays_2d.items(),
+                                   key=lambda item: item[1]):
+            array_index.append((filename(var), numpy.dtype(var.dtype).str,
+                                ['brian::{}.n'.format(varname),
+                                 'brian::{}.m'.format(varname)]))
+        return array_index
+
+    def get_server_arrays(self):
+        '''
+        The arrays that can be set between runs of a persistent simulation,
+        as a list of tuples of the array name, the model, the variable name,
+        and the kind of variable ('neuron', 'synapse', or 'shared').
+        '''
+        server_arrays = []
+        for model in self.neuron_models + self.synapse_models:
+            if isinstance(model, neuronModel):
+                array_prefix = '_array_'
+                kind = 'neuron'
+            else:
+                array_prefix = '_dynamic_array_'
+                kind = 'synapse'
+            for var in model.variables:
+                if model.variablescope[var] == 'brian':
+                    server_arrays.append(('{}{}_{}'.format(array_prefix,
+                                                           model.name, var),
+                                          model, var, kind))
+            for var in model.shared_variables:
+                server_arrays.append(('_array_{}_{}'.format(model.name, var),
+                                      model, var, 'shared'))
+        return server_arrays
+
     def generate_main_source(self, writer, main_lines):
         header_files = sorted(self.header_files) + prefs['codegen.cpp.headers']
+        server_arrays = self.get_server_arrays() if self.persistent else []
+        if prefs.devices.genn.memory_mapped_results:
+            array_index = self.get_array_index()
+        else:
+            array_index = []
+        self.server_arrays = {array_name
+                              for array_name, _, _, _ in server_arrays}
         runner_tmp = GeNNCodeObject.templater.main(None, None,
                                                    code_lines=self.code_lines,
                                                    neuron_models=self.neuron_models,
                                                    synapse_models=self.synapse_models,
+                                                   spikegenerator_models=self.spikegenerator_models,
                                                    main_lines=main_lines,
+                                                   batch_main_lines=self.get_initialisation_lines(main_lines),
+                                                   batch_size=self.batch_size,
+                                                   batch_results_directory=BATCH_RESULTS_DIRECTORY,
+                                                   random_state_file=self.get_random_state_file(),
+                                                   state_monitor_models=self.state_monitor_models,
+                                                   persistent=self.persistent,
+                                                   server_arrays=server_arrays,
+                                                   server_acknowledgement=ACKNOWLEDGEMENT,
+                                                   packed_static_arrays=bool(self.packed_static_array_specs),
+                                                   array_index=array_index,
+                                                   array_index_file=ARRAY_INDEX_FILE,
+                                                   spike_streams=[('_spike_stream_' + name, filename.replace('\\', '/'))
+                                                                  for name, filename in sorted(self.spike_streams.items())],
+                                                   spike_stream_buffer_size=prefs.devices.genn.spike_monitor_buffer_size,
+                                                   state_streams=[('_state_stream_{}_{}'.format(name, varname), c_type,
+                                                                   filename.replace('\\', '/'), row_size)
+                                                                  for name, streams in sorted(self.state_streams.items())
+                                                                  for varname, (filename, row_size, c_type) in sorted(streams.items())],
+                                                   state_stream_buffer_steps=prefs.devices.genn.state_monitor_buffer_steps,
+                                                   auto_connectivity=self.has_auto_connectivity(),
+                                                   connectivity_header_file=CONNECTIVITY_HEADER_FILE,
                                                    header_files=header_files,
                                                    source_files=sorted(self.source_files),
                                                    profiled=self.kernel_timings,
+                                                   runtime_parameters=sorted(self.runtime_parameters),
+                                                   runtime_parameters_file=RUNTIME_PARAMETERS_FILE,
                                                    )
         writer.write('main.*', runner_tmp)
 
@@ -1750,6 +3678,7 @@ class GeNNDevice(CPPStandaloneDevice):
         run_regularly_objects = [o for name, o in objects.items()
                                  if '_run_regularly' in name]
         run_regularly_operations = []
+        device_run_regularly_operations = []
         for run_reg in run_regularly_objects:
             # Figure out after how many steps the operation should be executed
             if run_reg.when != 'start':
@@ -1770,7 +3699,7 @@ class GeNNDevice(CPPStandaloneDevice):
                     'Brian2GeNN does not support run_regularly '
                     'operations where the dt is not a multiple of '
                     'the dt used by the group.')
-            step_value = int(run_regularly_dt / group_dt + 0.5)
+            step_value = self.get_clock_step(run_reg)
             codeobj_read_write = self.run_regularly_read_write[run_reg.codeobj.name]
             op = {'name': run_reg.name,
                   'order': run_reg.order,
@@ -1785,7 +3714,13 @@ class GeNNDevice(CPPStandaloneDevice):
                 op['srcN'] = run_reg.group.source.variables['N'].get_value()
                 op['trgN'] = run_reg.group.target.variables['N'].get_value()
                 op['connectivity'] = self.connectivityDict[run_reg.group.name]
-            run_regularly_operations.append(op)
+            if run_reg.name in self.device_run_regularly:
+                # Executed by GeNN, the host only sets the extra global
+                # parameter stating whether the operation is due
+                op['parameter'] = self.device_run_regularly[run_reg.name]
+                device_run_regularly_operations.append(op)
+            else:
+                run_regularly_operations.append(op)
 
         # StateMonitors and run_regularly operations are both executed in the "start"
         # slot. Their order of execution can matter, so we provide a list which sorts
@@ -1809,28 +3744,44 @@ class GeNNDevice(CPPStandaloneDevice):
                                                      rate_monitor_models=self.rate_monitor_models,
                                                      state_monitor_models=self.state_monitor_models,
                                                      run_regularly_operations=run_regularly_operations,
+                                                     device_run_regularly_operations=device_run_regularly_operations,
                                                      maximum_run_time=maximum_run_time,
                                                      run_reg_state_monitor_operations=run_reg_state_monitor_operations,
                                                      vars_to_pull_for_start=vars_to_pull_for_start,
                                                      vars_to_pull_for_end=vars_to_pull_for_end,
-                                                     groupDict=self.groupDict
+                                                     groupDict=self.groupDict,
+                                                     batch_size=self.batch_size,
+                                                     spike_recording_buffer_steps=prefs.devices.genn.spike_recording_buffer_steps,
+                                                     rate_monitor_buffer_steps=prefs.devices.genn.rate_monitor_device_buffer_steps
                                                      )
         writer.write('engine.*', engine_tmp)
 
     def generate_makefile(self, directory, use_GPU):
         if os.sys.platform == 'win32':
             project_tmp = GeNNCodeObject.templater.project_vcxproj(None, None,
-                                                                   source_files=self.source_files)
+                                                                   source_files=sorted(self.source_files))
             with open(os.path.join(directory, 'project.vcxproj'), 'w') as f:
                 f.write(project_tmp)
         else:
             compile_args_gcc = get_gcc_compile_args()
             linker_flags = ' '.join(prefs.codegen.cpp.extra_link_args)
+            if self.spike_streams or self.state_streams:
+                # The recorded values are written by background threads
+                compile_args_gcc += ' -pthread'
+                linker_flags += ' -pthread'
             makefile_tmp = GeNNCodeObject.templater.Makefile(None, None,
-                                                             source_files=self.source_files,
+                                                             source_files=sorted(self.source_files),
                                                              compiler_flags=compile_args_gcc,
-                                                             linker_flags=linker_flags)
-            with open(os.path.join(directory, 'Makefile'), 'w') as f:
+                                                             linker_flags=linker_flags,
+                                                             compiler_launcher=prefs.devices.genn.compiler_launcher)
+            # Object files depend on the Makefile, only overwrite it if it
+            # changed to not trigger an unnecessary recompilation
+            makefile_name = os.path.join(directory, 'Makefile')
+            if os.path.exists(makefile_name):
+                with open(makefile_name) as f:
+                    if f.read() == makefile_tmp:
+                        return
+            with open(makefile_name, 'w') as f:
                 f.write(makefile_tmp)
 
     def generate_objects_source(self, arange_arrays, net, static_array_specs,
@@ -1875,6 +3826,9 @@ class GeNNDevice(CPPStandaloneDevice):
 
     def network_run(self, net, duration, report=None, report_period=10 * second,
                     namespace=None, profile=None, level=0, **kwds):
+        if self.run_duration is not None and self.server_is_running():
+            self.continue_run(net, duration)
+            return
         self.kernel_timings = profile
         # Allow setting `profile` in the `set_device` call (used e.g. in brian2cuda
         # SpeedTest configurations)
@@ -1891,12 +3845,27 @@ class GeNNDevice(CPPStandaloneDevice):
 
         if self.run_duration is not None:
             raise NotImplementedError(
-                'Only a single run statement is supported for the genn device.')
+                'Only a single run statement is supported for the genn device '
+                '(unless the simulation is built with persistent=True).')
         self.run_duration = float(duration)
         for obj in net.objects:
-            if (obj.clock.name != 'defaultclock') and (obj.__class__ not in (CodeRunner, StateMonitor)):
+            # The objects of a NeuronGroup (state updater, thresholder, ...)
+            # and PoissonInputs use the clock of the group, synaptic pathways
+            # use the clock of the group emitting the spikes
+            owner = getattr(obj, 'group', obj)
+            if isinstance(obj, SynapticPathway):
+                owner = obj.source
+            if isinstance(owner, Subgroup):
+                owner = owner.source
+            if (obj.clock.name != 'defaultclock' and
+                    obj.__class__ not in (CodeRunner, StateMonitor, SpikeMonitor,
+                                          PopulationRateMonitor) and
+                    owner.__class__ is not NeuronGroup):
                 raise NotImplementedError(
-                    'Multiple clocks are not supported for the genn device')
+                    'Multiple clocks are only supported for NeuronGroups (and '
+                    'the synaptic pathways of their spikes), monitors, and '
+                    'run_regularly operations for the genn device, {} has to '
+                    'use the defaultclock.'.format(obj.name))
 
         for obj in net.objects:
             if hasattr(obj, '_linked_variables'):
@@ -1905,6 +3874,8 @@ class GeNNDevice(CPPStandaloneDevice):
                         'The genn device does not support linked variables')
 
         print('running brian code generation ...')
+        self._code_generation_start = time.time()
+        self._code_generation_time = None
 
         self.net = net
         # We need to store all objects, since MagicNetwork.after_run will clear
@@ -1916,6 +3887,10 @@ class GeNNDevice(CPPStandaloneDevice):
                             namespace=namespace,
                             level=level + 1,
                             profile=False)
+        if self._code_generation_start is not None:
+            # The project has not been built yet (build_on_run=False)
+            self._code_generation_time = time.time() - self._code_generation_start
+            self._code_generation_start = None
 
         self.run_statement_used = True
 
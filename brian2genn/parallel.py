@@ -0,0 +1,104 @@
+'''
+Building and running several independent networks in parallel.
+
+The "genn" device is a global object that builds a single project at a time,
+so independent networks (e.g. for a parameter exploration) would normally have
+to be built and run one after another. `run_networks` instead builds and runs
+each network in a separate process, with its own instance of the device and
+its own project directory.
+'''
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from brian2.core.preferences import prefs
+from brian2.utils.logger import get_logger
+
+__all__ = ['run_networks']
+
+logger = get_logger('brian2.devices.genn')
+
+
+def _build_and_run(network_function, directory, device_options, preferences,
+                   compile_jobs):
+    '''
+    Build and run a network in a worker process.
+    '''
+    from brian2.devices.device import set_device
+    from brian2genn.device import genn_device
+    # Worker processes are reused for several networks, start with a fresh
+    # device and the preferences of the parent process
+    genn_device.reinit()
+    for name, value in preferences.items():
+        prefs[name] = value
+    if prefs.devices.genn.compile_jobs is None:
+        prefs.devices.genn.compile_jobs = compile_jobs
+    set_device('genn', directory=directory, **device_options)
+    return network_function()
+
+
+def run_networks(network_functions, directory='GeNNworkspace', processes=None,
+                 **device_options):
+    '''
+    Build and run several independent networks in parallel.
+
+    Each network is generated into its own project directory, and compiled and
+    run in a separate process. At most ``processes`` networks are built at the
+    same time.
+
+    Parameters
+    ----------
+    network_functions : list of callable
+        Functions that each create a network, run it (using ``run`` or
+        ``Network.run``) and return its results (e.g. the spike times recorded
+        by a monitor). The functions should not call ``set_device``. Since
+        they are executed in other processes, they have to be defined at the
+        top level of a module, and their return values have to be picklable.
+    directory : str, optional
+        The directory where the projects are created. The project for the
+        network function with index ``i`` is stored in the subdirectory
+        ``i``. Defaults to ``'GeNNworkspace'``.
+    processes : int, optional
+        The maximum number of networks that are built and run at the same time.
+        Defaults to the number of CPU cores.
+    device_options
+        Additional options for the device (e.g. ``use_GPU=False``), passed on
+        to ``set_device``.
+
+    Returns
+    -------
+    results : list
+        The values returned by the network functions, in the same order as
+        ``network_functions``.
+
+    Notes
+    -----
+    The processes use the preferences that are set when calling this function.
+    Unless `devices.genn.compile_jobs` is set, the CPU cores are shared evenly
+    between the processes for compiling the projects.
+    '''
+    network_functions = list(network_functions)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if not isinstance(processes, int) or processes < 1:
+        raise ValueError('processes has to be a positive integer, '
+                         'got {!r}.'.format(processes))
+    if 'directory' in device_options:
+        raise TypeError("Use the 'directory' argument of run_networks to set "
+                        "the directory.")
+    processes = min(processes, max(len(network_functions), 1))
+    compile_jobs = max((os.cpu_count() or 1) // processes, 1)
+    directory = os.path.abspath(directory)
+    preferences = dict(prefs)
+    logger.debug('Running {} networks in {} processes'.format(len(network_functions),
+                                                              processes))
+    # Start new interpreters instead of forking this process with its global
+    # device state
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processes,
+                             mp_context=context) as executor:
+        futures = [executor.submit(_build_and_run, network_function,
+                                   os.path.join(directory, str(index)),
+                                   device_options, preferences, compile_jobs)
+                   for index, network_function in enumerate(network_functions)]
+        return [future.result() for future in futures]
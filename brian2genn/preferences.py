@@ -23,9 +23,9 @@ prefs.register_preferences(
     'devices.genn',
     'Preferences that relate to the brian2genn interface',
     connectivity=BrianPreference(
-        validator=lambda value: value in ['DENSE', 'SPARSE'],
+        validator=lambda value: value in ['DENSE', 'SPARSE', 'BITMASK', 'PROCEDURAL', 'AUTO'],
         docs='''
-        This preference determines which connectivity scheme is to be employed within GeNN. The valid alternatives are 'DENSE' and 'SPARSE'. For 'DENSE' the GeNN dense matrix methods are used for all connectivity matrices. When 'SPARSE' is chosen, the GeNN sparse matrix representations are used.''',
+        This preference determines which connectivity scheme is to be employed within GeNN. The valid alternatives are 'DENSE', 'SPARSE', 'BITMASK', 'PROCEDURAL' and 'AUTO'. For 'DENSE' the GeNN dense matrix methods are used for all connectivity matrices. When 'SPARSE' is chosen, the GeNN sparse matrix representations are used. 'BITMASK' stores a single bit for each pair of neurons, and can only be used for synapses without individual variables and without postsynaptic or continuous updates. 'PROCEDURAL' does not store the synapses at all, but regenerates them whenever a presynaptic neuron spikes; it has the same restrictions as 'BITMASK', and can only be used for synapses created by a single connect call with a fixed probability. With 'AUTO', the scheme that needs the least memory is chosen for each Synapses object based on the number of synapses (the dense schemes are only considered if the synapses are created with a single connect call using a condition or a probability). The preference can be overwritten for individual Synapses objects with their genn_connectivity attribute.''',
         default='SPARSE'
     ),
     extra_compile_args_nvcc=BrianPreference(
@@ -93,6 +93,121 @@ prefs.register_preferences(
         default=None,
         validator=lambda value: value is None or os.path.isdir(value)
     ),
+    build_cache=BrianPreference(
+        docs='''Whether to skip the compilation of the GeNN project (genn-buildmodel and make) if the generated code, the GeNN version and the compiler flags did not change since the last build in the same directory (or since a build stored in devices.genn.build_cache_directory).''',
+        default=True,
+        validator=lambda value: isinstance(value, bool)
+    ),
+    build_cache_directory=BrianPreference(
+        docs='''A directory where compiled GeNN projects are stored, so that they can be reused by builds in other project directories (if not set, compiled projects are only reused within the same project directory).''',
+        default=None,
+        validator=lambda value: value is None or isinstance(value, str)
+    ),
+    build_cache_max_size=BrianPreference(
+        docs='''The maximum size (in megabytes) of the devices.genn.build_cache_directory. If the cache grows larger, the least recently used builds are removed.''',
+        default=2048,
+        validator=lambda value: value >= 0
+    ),
+    compile_jobs=BrianPreference(
+        docs='''The number of parallel jobs used to compile the GeNN project (passed as -j to make, or as /m to msbuild on Windows). If not set, the number of CPU cores is used.''',
+        default=None,
+        validator=lambda value: value is None or (isinstance(value, int) and value > 0)
+    ),
+    compiler_launcher=BrianPreference(
+        docs='''A command used to launch the C++ compiler for the files compiled by the Makefile of the GeNN project, e.g. 'ccache' to cache compilation results between projects (Linux/Mac only).''',
+        default=None,
+        validator=lambda value: value is None or isinstance(value, str)
+    ),
+    runtime_parameters=BrianPreference(
+        docs='''Whether external constants used in the equations of neurons and synapses (e.g. time constants) should be set at runtime from a parameter file instead of being compiled into the model. This allows to run the compiled simulation again with different values without recompiling it, see GeNNDevice.run_with_parameters.''',
+        default=False,
+        validator=lambda value: isinstance(value, bool)
+    ),
+    packed_static_arrays=BrianPreference(
+        docs='''Whether to store all static arrays (e.g. the values of TimedArrays or the spikes of SpikeGeneratorGroups) in a single file that is memory-mapped by the simulation, instead of writing and reading one file for each array.''',
+        default=False,
+        validator=lambda value: isinstance(value, bool)
+    ),
+    memory_mapped_results=BrianPreference(
+        docs='''Whether the results of a simulation (e.g. the values recorded by monitors) should be returned as read-only memory-mapped arrays, which are only loaded from disk when their values are accessed, instead of reading each result file completely into memory. Not supported on Windows.''',
+        default=False,
+        validator=lambda value: isinstance(value, bool)
+    ),
+    spike_monitor_streaming=BrianPreference(
+        docs='''Whether SpikeMonitors that only record spike indices and times should write the spikes to disk during the simulation (using a buffer of fixed size and a background thread), instead of storing all spikes in memory until the end of the simulation.''',
+        default=False,
+        validator=lambda value: isinstance(value, bool)
+    ),
+    spike_monitor_buffer_size=BrianPreference(
+        docs='''The number of spikes that a SpikeMonitor buffers before writing them to disk, if devices.genn.spike_monitor_streaming is set. Each monitor uses two buffers of 12 bytes per spike.''',
+        default=65536,
+        validator=lambda value: isinstance(value, int) and value > 0
+    ),
+    spike_recording=BrianPreference(
+        docs='''Whether SpikeMonitors that only record spike indices and times should use GeNN's spike recording, which stores the spikes of each time step in a bitfield on the device. The bitfields are only copied to the host every devices.genn.spike_recording_buffer_steps time steps (or at the end of a run), instead of copying the spikes from the device at every time step. Requires GeNN 4.4.0 or later and is not supported for batched simulations.''',
+        default=False,
+        validator=lambda value: isinstance(value, bool)
+    ),
+    spike_recording_buffer_steps=BrianPreference(
+        docs='''The number of time steps for which GeNN records spikes on the device, if devices.genn.spike_recording is set. Each recorded neuron group uses one bit per neuron and time step.''',
+        default=1024,
+        validator=lambda value: isinstance(value, int) and value > 0
+    ),
+    state_monitor_streaming=BrianPreference(
+        docs='''Whether StateMonitors should write the recorded values to disk during the simulation (using a buffer of fixed size and a background thread), instead of storing all values in memory until the end of the simulation. Each recorded variable is stored in a separate file, which is memory-mapped when the values are accessed.''',
+        default=False,
+        validator=lambda value: isinstance(value, bool)
+    ),
+    state_monitor_buffer_steps=BrianPreference(
+        docs='''The number of time steps that a StateMonitor buffers before writing the recorded values to disk, if devices.genn.state_monitor_streaming is set. Each recorded variable uses two buffers with one value per recorded index and time step.''',
+        default=1024,
+        validator=lambda value: isinstance(value, int) and value > 0
+    ),
+    state_monitor_on_device=BrianPreference(
+        docs='''Whether StateMonitors recording variables of a NeuronGroup should let the neuron kernel write the recorded values into a buffer on the device, which is only copied to the host every devices.genn.state_monitor_device_buffer_steps recording steps, instead of copying the monitored variables from the device at every recording step. This is not supported for batched simulations, and for monitors of variables that are changed by run_regularly operations.''',
+        default=False,
+        validator=lambda value: isinstance(value, bool)
+    ),
+    state_monitor_device_buffer_steps=BrianPreference(
+        docs='''The number of recording steps that a StateMonitor buffers on the device, if devices.genn.state_monitor_on_device is set. Each recorded variable uses a buffer with one value per recorded index and recording step.''',
+        default=1024,
+        validator=lambda value: isinstance(value, int) and value > 0
+    ),
+    rate_monitor_on_device=BrianPreference(
+        docs='''Whether PopulationRateMonitors should let the neuron kernel count the spikes of each time step in a buffer on the device, which is only copied to the host every devices.genn.rate_monitor_device_buffer_steps time steps, instead of copying the spikes of the monitored group from the device at every time step. This is not supported for batched simulations, and for monitors of SpikeGeneratorGroups.''',
+        default=False,
+        validator=lambda value: isinstance(value, bool)
+    ),
+    rate_monitor_device_buffer_steps=BrianPreference(
+        docs='''The number of time steps for which a PopulationRateMonitor counts the spikes on the device, if devices.genn.rate_monitor_on_device is set. Each monitor uses a buffer with one integer per time step.''',
+        default=1024,
+        validator=lambda value: isinstance(value, int) and value > 0
+    ),
+    spike_generator_on_device=BrianPreference(
+        docs='''Whether SpikeGeneratorGroups should be simulated by GeNN as neurons that emit the spikes of a schedule that is copied to the device once before the run, instead of determining the spikes of each time step on the host and copying them to the device. This is not supported for batched simulations.''',
+        default=False,
+        validator=lambda value: isinstance(value, bool)
+    ),
+    run_regularly_on_device=BrianPreference(
+        docs='''Whether run_regularly operations of NeuronGroups and Synapses should be executed by GeNN as part of the neuron or synapse code (under a condition set by the host in the time steps where the operation is executed), instead of copying the variables they read from the device, executing them on the host, and copying the variables they write back to the device. This is only done for operations that only change variables of the individual neurons or synapses, that only use functions that are available on the device, and whose changes are not recorded by a StateMonitor in the "start" slot or (for NeuronGroups) read by Synapses.''',
+        default=False,
+        validator=lambda value: isinstance(value, bool)
+    ),
+    connectivity_init_on_device=BrianPreference(
+        docs='''Whether Synapses with the SPARSE connectivity should be created by GeNN's connectivity initialisation snippets (in parallel, on the GPU if it is used), instead of creating them on the host and copying them to GeNN. This is only possible for synapses created by a single connect call with a fixed probability (connect(p=...), optionally with condition='i != j'), a fixed number of synapses for each presynaptic neuron (connect(j='k for k in sample(N_post, size=...)')) or one-to-one connections (connect(j='i')) between two groups. The synapses are copied into Brian's data structures afterwards, but the random connectivity differs from the one Brian would create.''',
+        default=False,
+        validator=lambda value: isinstance(value, bool)
+    ),
+    variable_init_on_device=BrianPreference(
+        docs='''Whether variables of neurons and synapses that are set to a constant value (e.g. G.v = -70*mV), or to uniformly or normally distributed random values (e.g. S.w = 'rand()*w_max' or G.v = 'v_rest + sigma*randn()', with constants v_rest and sigma) should be initialised by GeNN's variable initialisation snippets (in parallel, on the GPU if it is used), instead of initialising them on the host and copying them to GeNN. This is only done for variables that are set for the whole group and are not used by any other code before the run. The random values differ from the ones Brian would generate.''',
+        default=False,
+        validator=lambda value: isinstance(value, bool)
+    ),
+    build_timings_file=BrianPreference(
+        docs='''Whether to write the wall-clock time of each stage of the build and run, as well as the number and size of the generated source files (see GeNNDevice.build_timings), to the file build_timings.json in the project directory.''',
+        default=False,
+        validator=lambda value: isinstance(value, bool)
+    ),
     kernel_timing=BrianPreference(
         docs='''This preference determines whether GeNN should record kernel runtimes; note that this can affect performance.
         This preference is deprecated, use profile=True in the set_device or run call instead.''',
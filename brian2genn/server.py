@@ -0,0 +1,113 @@
+'''
+Communication with a persistent simulation process.
+
+When a project is built with ``persistent=True``, the compiled simulation does
+not run for a fixed duration and exit, but keeps its state in memory and
+executes commands that it reads line by line from its standard input:
+
+``run <duration>``
+    Simulate for the given duration (in seconds).
+``write``
+    Copy the current state back from GeNN and write all results to disk.
+``load <array name> <file name>``
+    Set the values of a variable from a binary file, and copy them to GeNN.
+``quit``
+    Write the results and exit.
+
+After each command, the simulation prints `ACKNOWLEDGEMENT` on a separate line.
+'''
+import subprocess
+import sys
+from subprocess import CalledProcessError
+
+from brian2.utils.logger import get_logger
+
+__all__ = ['SimulationServer']
+
+logger = get_logger('brian2.devices.genn')
+
+#: Line printed by the simulation after executing a command
+ACKNOWLEDGEMENT = '__brian2genn_command_finished__'
+
+
+class SimulationServer:
+    '''
+    A running simulation process, waiting for commands.
+
+    Parameters
+    ----------
+    cmd : list of str or str
+        The command to start the simulation.
+    cwd : str
+        The project directory.
+    with_output : bool, optional
+        Whether to show the error output of the simulation. Defaults to
+        ``True``.
+    '''
+    def __init__(self, cmd, cwd, with_output=True):
+        self.cmd = cmd
+        logger.debug('Starting persistent simulation process in '
+                     '"{}"'.format(cwd))
+        self.process = subprocess.Popen(cmd, cwd=cwd, stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        stderr=None if with_output else subprocess.DEVNULL,
+                                        universal_newlines=True, bufsize=1)
+
+    def is_running(self):
+        '''
+        Whether the simulation process is still alive.
+        '''
+        return self.process.poll() is None
+
+    def command(self, command, with_output=True):
+        '''
+        Send a command to the simulation and wait until it has been executed.
+
+        Parameters
+        ----------
+        command : str
+            The command (see module documentation).
+        with_output : bool, optional
+            Whether to show the output of the simulation while executing the
+            command. Defaults to ``True``.
+
+        Raises
+        ------
+        CalledProcessError
+            If the simulation process terminated.
+        '''
+        logger.debug('Sending command to simulation: {}'.format(command))
+        try:
+            self.process.stdin.write(command + '\n')
+            self.process.stdin.flush()
+        except OSError:
+            self._raise_terminated()
+        for line in self.process.stdout:
+            if line.rstrip('\n') == ACKNOWLEDGEMENT:
+                return
+            if with_output:
+                sys.stdout.write(line)
+        self._raise_terminated()
+
+    def _raise_terminated(self):
+        returncode = self.process.wait()
+        raise CalledProcessError(returncode, self.cmd)
+
+    def stop(self):
+        '''
+        Ask the simulation to write its results and exit, and wait for it.
+        '''
+        if self.is_running():
+            try:
+                self.process.stdin.write('quit\n')
+                self.process.stdin.flush()
+            except OSError:
+                pass
+            # Discard any remaining output
+            self.process.stdout.read()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        self.process.wait()
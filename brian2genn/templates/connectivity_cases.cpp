@@ -0,0 +1,18 @@
+{# The code of the caller block for the connectivity format of a synapse
+   model. The connectivity 'AUTO' is resolved during the model definition, the
+   code for all formats that can be chosen is therefore emitted, selected by
+   the preprocessor according to the definitions in the connectivity header
+   file written by the model definition. Templates have to import the macro
+   under a name starting with an underscore, all other macros of a template
+   are rendered as code blocks by Brian's templater. #}
+{% macro connectivity_cases(synapses) %}
+{% if synapses.connectivity == 'AUTO' %}
+{% for connectivity in synapses.connectivity_options %}
+#{{ 'if' if loop.first else 'elif' }} B2G_CONNECTIVITY_{{synapses.name}} == B2G_{{connectivity}}
+{{ caller(connectivity) }}
+{% endfor %}
+#endif
+{% else %}
+{{ caller(synapses.connectivity) }}
+{% endif %}
+{% endmacro %}
@@ -33,12 +33,18 @@ class engine
   void run(double);
   void getStateFromGPU();
   void getSpikesFromGPU();
+  void initRecording();
+  {% if batch_size > 1 %}
+  void initBatches();
+  void swapBatch(unsigned int);
+  {% endif %}
 };
 
 #endif
 {% endmacro %}
 
 
+{% from 'connectivity_cases.cpp' import connectivity_cases as _connectivity_cases %}
 {% macro cpp_file() %}
 #ifndef _ENGINE_CC_
 #define _ENGINE_CC_
@@ -52,6 +58,96 @@ class engine
 #include "engine.h"
 #include "network.h"
 
+{% if batch_size > 1 %}
+// Results of the monitors for all model instances except the first one. While
+// the results of an instance are recorded, they are swapped into the brian
+// arrays
+{% for monitor in spike_monitor_models + rate_monitor_models %}
+{% for array_name, c_type, is_dynamic in monitor.batch_arrays %}
+{% if is_dynamic %}
+std::vector<{{c_type}}> _batch{{array_name}}[{{batch_size}}];
+{% else %}
+{{c_type}} *_batch{{array_name}}[{{batch_size}}];
+{% endif %}
+{% endfor %}
+{% endfor %}
+{% endif %}
+
+{% set device_state_monitors = state_monitor_models | selectattr('on_device') | list %}
+{% for sm in device_state_monitors %}
+// Recording steps of {{sm.name}} that are stored in the buffers on the device
+int _rec_count_{{sm.name}} = 0;
+double _rec_t_{{sm.name}}[{{sm.buffer_steps}}];
+
+// Copy the recorded values from the device and let {{sm.name}} record them
+static void _flush_{{sm.name}}()
+{
+  if (_rec_count_{{sm.name}} == 0)
+    return;
+  {% for var, buffer_name, var_type in sm.buffer_variables %}
+  pull{{buffer_name}}{{sm.monitored}}FromDevice(_rec_count_{{sm.name}} * {{sm.n_indices}});
+  {% endfor %}
+  // The monitor records the values at the time t
+  const double _t = t;
+  for (int _k = 0; _k < _rec_count_{{sm.name}}; _k++)
+  {
+    for (int _j = 0; _j < {{sm.n_indices}}; _j++)
+    {
+      const int _idx = {{sm.offset}} + brian::{{sm.indices_array}}[_j];
+      {% for var, buffer_name, var_type in sm.buffer_variables %}
+      brian::_array_{{sm.monitored}}_{{var}}[_idx] = {{buffer_name}}{{sm.monitored}}[_k * {{sm.n_indices}} + _j];
+      {% endfor %}
+    }
+    t = _rec_t_{{sm.name}}[_k];
+    _run_{{sm.codeobject_name}}();
+  }
+  t = _t;
+  _rec_count_{{sm.name}} = 0;
+}
+{% endfor %}
+
+{% set recorded_spike_monitors = spike_monitor_models | selectattr('spike_recording') | list %}
+{% if recorded_spike_monitors %}
+// The time steps in GeNN's spike recording buffers that have not been
+// processed by the SpikeMonitors yet
+unsigned long long _spike_recording_start = 0;
+unsigned int _spike_recording_row = 0, _spike_recording_steps = 0;
+
+// Copy the recorded spikes from the device and let the monitors decode them
+static void _flush_spike_recording()
+{
+  if (_spike_recording_steps == 0)
+    return;
+  pullRecordingBuffersFromDevice();
+  {% for spkMon in recorded_spike_monitors %}
+  _run_{{spkMon.codeobject_name}}();
+  {% endfor %}
+  _spike_recording_steps = 0;
+}
+{% endif %}
+
+{% set device_rate_monitors = rate_monitor_models | selectattr('on_device') | list %}
+{% if device_rate_monitors %}
+// The time steps for which the spikes have been counted on the device, but not
+// processed by the PopulationRateMonitors yet
+unsigned long long _rate_counting_start = 0;
+unsigned int _rate_counting_steps = 0;
+
+// Copy the spike counts from the device and let the monitors process them
+static void _flush_rate_monitors()
+{
+  if (_rate_counting_steps == 0)
+    return;
+  {% for rateMon in device_rate_monitors %}
+  pull{{rateMon.counter}}FromDevice(_rate_counting_steps);
+  _run_{{rateMon.codeobject_name}}();
+  std::fill_n({{rateMon.counter}}, _rate_counting_steps, 0);
+  push{{rateMon.counter}}ToDevice(_rate_counting_steps);
+  {% endfor %}
+  _rate_counting_steps = 0;
+}
+{% endif %}
+
 engine::engine()
 {
   allocateMem();
@@ -65,7 +161,60 @@ engine::engine()
 
 engine::~engine()
 {
+  {% if batch_size > 1 %}
+  for (unsigned int _batch = 1; _batch < {{batch_size}}; _batch++)
+  {
+    {% for monitor in spike_monitor_models + rate_monitor_models %}
+    {% for array_name, c_type, is_dynamic in monitor.batch_arrays %}
+    {% if not is_dynamic %}
+    delete [] _batch{{array_name}}[_batch];
+    {% endif %}
+    {% endfor %}
+    {% endfor %}
+  }
+  {% endif %}
+}
+
+{% if batch_size > 1 %}
+//--------------------------------------------------------------------------
+/*! \brief Method for initialising the monitor results of all model instances with the initial values of the brian arrays
+ */
+//--------------------------------------------------------------------------
+
+void engine::initBatches()
+{
+  for (unsigned int _batch = 1; _batch < {{batch_size}}; _batch++)
+  {
+    {% for monitor in spike_monitor_models + rate_monitor_models %}
+    {% for array_name, c_type, is_dynamic in monitor.batch_arrays %}
+    {% if is_dynamic %}
+    _batch{{array_name}}[_batch] = brian::{{array_name}};
+    {% else %}
+    _batch{{array_name}}[_batch] = new {{c_type}}[brian::_num_{{array_name}}];
+    std::copy_n(brian::{{array_name}}, brian::_num_{{array_name}}, _batch{{array_name}}[_batch]);
+    {% endif %}
+    {% endfor %}
+    {% endfor %}
+  }
+}
+
+//--------------------------------------------------------------------------
+/*! \brief Method for swapping the monitor results of a model instance into the brian arrays (or back again)
+ */
+//--------------------------------------------------------------------------
+
+void engine::swapBatch(unsigned int batch)
+{
+  // The first instance always uses the brian arrays
+  if (batch == 0)
+    return;
+  {% for monitor in spike_monitor_models + rate_monitor_models %}
+  {% for array_name, c_type, is_dynamic in monitor.batch_arrays %}
+  std::swap(brian::{{array_name}}, _batch{{array_name}}[batch]);
+  {% endfor %}
+  {% endfor %}
 }
+{% endif %}
 
 
 //--------------------------------------------------------------------------
@@ -85,42 +234,58 @@ void engine::run(double duration)  //!< Duration of time to run the model for
   for (int i= 0; i < riT; i++) {
     // The StateMonitor and run_regularly operations are ordered by their "order" value
         {% for is_state_monitor, obj in run_reg_state_monitor_operations %}
-    if (i % {{obj['step']}} == 0)
+    if (iT % {{obj['step']}} == 0)
     {
-          {% if is_state_monitor %}
+          {% if is_state_monitor and obj.on_device %}
+            {% if obj.when == 'start' %}
+      // Execute state monitor operation: {{obj['name']}}
+      // Later steps are recorded on the device at the end of the previous step
+      if (i == 0)
+      {
+              {% for var in obj.variables %}
+        pull{{var}}{{obj.monitored}}FromDevice();
+        std::copy_n({{var}}{{obj.monitored}}, {{obj.N}}, brian::_array_{{obj.monitored}}_{{var}});
+              {% endfor %}
+        _run_{{obj.codeobject_name}}();
+      }
+            {% endif %}
+          {% elif is_state_monitor %}
       // Execute state monitor operation: {{obj['name']}}
             {% if obj.when == 'start' %}
+              {% if batch_size > 1 %}
+      // Record the values of each model instance in a separate row
+      for (unsigned int _batch = 0; _batch < {{batch_size}}; _batch++)
+      {
+              {% endif %}
               {% for var in obj.variables %}
                 {# No need to convert/copy for variables only changed on the host #}
                 {% if var + obj.monitored in vars_to_pull_for_start %}
                   {% if obj.isSynaptic %}
-                    {% if obj.connectivity == 'DENSE' %}
+                    {% call(connectivity) _connectivity_cases(groupDict[obj.monitored]) %}
+                    {% if connectivity == 'DENSE' %}
         convert_dense_matrix_2_dynamic_arrays({{var}}{{obj.monitored}},
                                               {{obj.srcN}}, {{obj.trgN}},
                                               brian::_dynamic_array_{{obj.monitored}}__synaptic_pre,
                                               brian::_dynamic_array_{{obj.monitored}}__synaptic_post,
                                               brian::_dynamic_array_{{obj.monitored}}_{{var}});
                     {% else %}
-        convert_sparse_synapses_2_dynamic_arrays(rowLength{{obj.monitored}},
-                                                ind{{obj.monitored}},
-                                                maxRowLength{{obj.monitored}},
-                                                {{var}}{{obj.monitored}},
-                                                {{obj.srcN}}, {{obj.trgN}},
-                                                brian::_dynamic_array_{{obj.monitored}}__synaptic_pre,
-                                                brian::_dynamic_array_{{obj.monitored}}__synaptic_post,
-                                                brian::_dynamic_array_{{obj.monitored}}_{{var}},
-                                                b2g::FULL_MONTY);
+        convert_sparse_synapses_2_dynamic_arrays({{var}}{{obj.monitored}}, sparseSynapseIndices{{obj.monitored}},
+                                                 brian::_dynamic_array_{{obj.monitored}}_{{var}});
                     {% endif %}
+                    {% endcall %}
                   {% else %}
                     {% if obj.src.variables[var].scalar %}
         *brian::_array_{{obj.monitored}}_{{var}} = {{var}}{{obj.monitored}};
                     {% else %}
-        std::copy_n({{var}}{{obj.monitored}}, {{obj.N}}, brian::_array_{{obj.monitored}}_{{var}});
+        std::copy_n({{var}}{{obj.monitored}}{% if batch_size > 1 %} + _batch * {{obj.N}}{% endif %}, {{obj.N}}, brian::_array_{{obj.monitored}}_{{var}});
                     {% endif %}
                   {% endif %}
                 {% endif %}
               {% endfor %}
       _run_{{obj.codeobject_name}}();
+              {% if batch_size > 1 %}
+      }
+              {% endif %}
             {% endif %}
           {% else %}
       // Execute run_regularly operation: {{obj['name']}}
@@ -131,22 +296,18 @@ void engine::run(double duration)  //!< Duration of time to run the model for
                 {# nothing to do #}
               {% else %}
                 {% if obj['isSynaptic'] %}
-                  {% if obj['connectivity'] == 'DENSE' %}
+                  {% call(connectivity) _connectivity_cases(groupDict[obj['owner'].name]) %}
+                  {% if connectivity == 'DENSE' %}
       convert_dense_matrix_2_dynamic_arrays({{var}}{{obj['owner'].name}},
                                             {{obj['srcN']}}, {{obj['trgN']}},
                                             brian::_dynamic_array_{{obj['owner'].name}}__synaptic_pre,
                                             brian::_dynamic_array_{{obj['owner'].name}}__synaptic_post,
                                             brian::_dynamic_array_{{obj['owner'].name}}_{{var}});
                   {% else %}
-      convert_sparse_synapses_2_dynamic_arrays(rowLength{{obj['owner'].name}},
-                                               ind{{obj['owner'].name}},
-                                               maxRowLength{{obj['owner'].name}},
-                                               {{var}}{{obj['owner'].name}},
-                                               {{obj['srcN']}}, {{obj['trgN']}},
-                                               brian::_dynamic_array_{{obj['owner'].name}}__synaptic_pre,
-                                               brian::_dynamic_array_{{obj['owner'].name}}__synaptic_post,
-                                               brian::_dynamic_array_{{obj['owner'].name}}_{{var}}, b2g::FULL_MONTY);
+      convert_sparse_synapses_2_dynamic_arrays({{var}}{{obj['owner'].name}}, sparseSynapseIndices{{obj['owner'].name}},
+                                               brian::_dynamic_array_{{obj['owner'].name}}_{{var}});
                   {% endif %}
+                  {% endcall %}
                 {% else %}
                   {% if obj['owner'].variables[var].scalar %}
       *brian::_array_{{obj['owner'].name}}_{{var}} = {{var}}{{obj['owner'].name}};
@@ -162,18 +323,20 @@ void engine::run(double duration)  //!< Duration of time to run the model for
 
             {% for var in obj['write'] %}
               {% if obj['isSynaptic'] %}
-                {% if obj['connectivity'] == 'DENSE' %}
+                {% call(connectivity) _connectivity_cases(groupDict[obj['owner'].name]) %}
+                {% if connectivity == 'DENSE' %}
       convert_dynamic_arrays_2_dense_matrix(brian::_dynamic_array_{{obj['owner'].name}}__synaptic_pre,
                                             brian::_dynamic_array_{{obj['owner'].name}}__synaptic_post,
                                             brian::_dynamic_array_{{obj['owner'].name}}_{{var}},
                                             {{var}}{{obj['owner'].name}},
-                                            {{obj['srcN']}}, {{obj['trgN']}});
+                                            {{obj['srcN']}}, {{obj['trgN']}}, false);
                 {% else %}
       convert_dynamic_arrays_2_sparse_synapses(brian::_dynamic_array_{{obj['owner'].name}}_{{var}},
                                                sparseSynapseIndices{{obj['owner'].name}},
                                                {{var}}{{obj['owner'].name}},
                                                {{obj['srcN']}}, {{obj['trgN']}});
                 {% endif %}
+                {% endcall %}
               {% else %}
                 {% if obj['owner'].variables[var].scalar %}
       {{var}}{{obj['owner'].name}} = *brian::_array_{{obj['owner'].name}}_{{var}};
@@ -187,7 +350,7 @@ void engine::run(double duration)  //!< Duration of time to run the model for
         {% endfor %}
         {% set states_pushed = [] %}
         {% for run_reg in run_regularly_operations %}
-    if (i % {{run_reg['step']}} == 0)  // only push state if we executed the operation
+    if (iT % {{run_reg['step']}} == 0)  // only push state if we executed the operation
     {
           {% for var in run_reg['write'] %}
             {# Don't push variables that are not used on the device #}
@@ -206,18 +369,65 @@ void engine::run(double duration)  //!< Duration of time to run the model for
           {% endfor %}
     }
         {% endfor %}
+        {% for run_reg in device_run_regularly_operations %}
+    // The run_regularly operation {{run_reg['name']}} is executed on the device
+    {{run_reg['parameter']}}{{run_reg['owner'].name}} = (iT % {{run_reg['step']}} == 0);
+        {% endfor %}
+        {% for sm in device_state_monitors %}
+    if (_rec_count_{{sm.name}} == {{sm.buffer_steps}})
+      _flush_{{sm.name}}();
+          {% if sm.when == 'start' %}
+    // Record the values at the start of the next step
+    if ((iT + 1) % {{sm.step}} == 0 && i + 1 < riT)
+          {% else %}
+    if (iT % {{sm.step}} == 0)
+          {% endif %}
+    {
+      _rec_slot_{{sm.name}}{{sm.monitored}} = _rec_count_{{sm.name}};
+      _rec_t_{{sm.name}}[_rec_count_{{sm.name}}++] = {% if sm.when == 'start' %}(iT + 1)*DT{% else %}t{% endif %};
+    }
+    else
+    {
+      _rec_slot_{{sm.name}}{{sm.monitored}} = -1;
+    }
+        {% endfor %}
+        {% if device_rate_monitors %}
+    if (_rate_counting_steps == {{rate_monitor_buffer_steps}})
+      _flush_rate_monitors();
+    if (_rate_counting_steps == 0)
+      _rate_counting_start = iT;
+          {% for group in device_rate_monitors | map(attribute='neuronGroup') | unique %}
+    _rate_slot{{group}} = _rate_counting_steps;
+          {% endfor %}
+    _rate_counting_steps++;
+        {% endif %}
+        {% for neuron_model in neuron_models if neuron_model.step > 1 %}
+    // {{neuron_model.name}} is only updated in the time steps of its own clock
+    _clock_tick{{neuron_model.name}} = (iT % {{neuron_model.step}} == 0);
+        {% endfor %}
     stepTime();
     // The stepTimeGPU function already updated everything for the next time step
     iT--;
     t = iT*DT;
-        {% for spkGen in spikegenerator_models %}
+        {% for spkGen in spikegenerator_models if not spkGen.on_device %}
     _run_{{spkGen.codeobject_name}}();
+          {% if batch_size > 1 %}
+    // All model instances receive the same input spikes
+    for (unsigned int _batch = 1; _batch < {{batch_size}}; _batch++)
+    {
+      glbSpkCnt{{spkGen.name}}[_batch] = glbSpkCnt{{spkGen.name}}[0];
+      std::copy_n(glbSpk{{spkGen.name}}, glbSpkCnt{{spkGen.name}}[0], glbSpk{{spkGen.name}} + _batch * {{spkGen.N}});
+    }
+          {% endif %}
     push{{spkGen.name}}SpikesToDevice();
         {% endfor %}
         {% set spikes_pulled = [] %}
         {% for spkMon in spike_monitor_models %}
-          {% if (spkMon.notSpikeGeneratorGroup) %}
+          {% if spkMon.notSpikeGeneratorGroup and not spkMon.spike_recording %}
             {% if not spkMon.neuronGroup in spikes_pulled %}
+              {% if spkMon.step > 1 %}
+    if (iT % {{spkMon.step}} == 0)
+              {% endif %}
     pull{{spkMon.neuronGroup}}CurrentSpikesFromDevice();
               {% if spikes_pulled.append(spkMon.neuronGroup) %}
               {% endif %}
@@ -225,8 +435,11 @@ void engine::run(double duration)  //!< Duration of time to run the model for
           {% endif %}
         {% endfor %}
         {% for rateMon in rate_monitor_models %}
-          {% if (rateMon.notSpikeGeneratorGroup) %}
+          {% if rateMon.notSpikeGeneratorGroup and not rateMon.on_device %}
             {% if not rateMon.neuronGroup in spikes_pulled %}
+              {% if rateMon.step > 1 %}
+    if (iT % {{rateMon.step}} == 0)
+              {% endif %}
     pull{{rateMon.neuronGroup}}CurrentSpikesFromDevice();
               {% if spikes_pulled.append(rateMon.neuronGroup) %}
               {% endif %}
@@ -240,7 +453,7 @@ void engine::run(double duration)  //!< Duration of time to run the model for
     if (
             {%- for step in steps %}
               {% if loop.index > 1 %} || {% endif -%}
-      ((i+1) % {{step}} == 0)
+      ((iT+1) % {{step}} == 0)
             {%- endfor -%}
     ) {
       pull{{key}}FromDevice();
@@ -254,7 +467,7 @@ void engine::run(double duration)  //!< Duration of time to run the model for
     if (
             {%- for step in steps %}
               {% if loop.index > 1 %} || {% endif -%}
-      ((i+1) % {{step}} == 0)
+      (iT % {{step}} == 0)
             {%- endfor -%}
     ) {
       pull{{key}}FromDevice();
@@ -263,51 +476,97 @@ void engine::run(double duration)  //!< Duration of time to run the model for
         {% endfor %}
     // report state
         {% for sm in state_monitor_models %}
-          {% if sm.when != 'start' %}
-    if (i % {{sm['step']}} == 0)
+          {% if sm.when != 'start' and not sm.on_device %}
+    if (iT % {{sm['step']}} == 0)
     {
       // Execute state monitor operation: {{sm['name']}}
+            {% if batch_size > 1 %}
+      // Record the values of each model instance in a separate row
+      for (unsigned int _batch = 0; _batch < {{batch_size}}; _batch++)
+      {
+            {% endif %}
             {% for var in sm.variables %}
               {# No need to convert/copy for variables only changed on the host #}
               {% if var + sm.monitored in vars_to_pull_for_end %}
                 {% if sm.isSynaptic %}
-                  {% if sm.connectivity == 'DENSE' %}
+                  {% call(connectivity) _connectivity_cases(groupDict[sm.monitored]) %}
+                  {% if connectivity == 'DENSE' %}
         convert_dense_matrix_2_dynamic_arrays({{var}}{{sm.monitored}},
                                               {{sm.srcN}}, {{sm.trgN}},
                                               brian::_dynamic_array_{{sm.monitored}}__synaptic_pre,
                                               brian::_dynamic_array_{{sm.monitored}}__synaptic_post,
                                               brian::_dynamic_array_{{sm.monitored}}_{{var}});
                   {% else %}
-        convert_sparse_synapses_2_dynamic_arrays(rowLength{{sm.monitored}},
-                                                ind{{sm.monitored}},
-                                                maxRowLength{{sm.monitored}},
-                                                {{var}}{{sm.monitored}},
-                                                {{sm.srcN}}, {{sm.trgN}},
-                                                brian::_dynamic_array_{{sm.monitored}}__synaptic_pre,
-                                                brian::_dynamic_array_{{sm.monitored}}__synaptic_post,
-                                                brian::_dynamic_array_{{sm.monitored}}_{{var}},
-                                                b2g::FULL_MONTY);
+        convert_sparse_synapses_2_dynamic_arrays({{var}}{{sm.monitored}}, sparseSynapseIndices{{sm.monitored}},
+                                                 brian::_dynamic_array_{{sm.monitored}}_{{var}});
                   {% endif %}
+                  {% endcall %}
                 {% else %}
                   {% if sm.src.variables[var].scalar %}
         *brian::_array_{{sm.monitored}}_{{var}} = {{var}}{{sm.monitored}};
                   {% else %}
-        std::copy_n({{var}}{{sm.monitored}}, {{sm.N}}, brian::_array_{{sm.monitored}}_{{var}});
+        std::copy_n({{var}}{{sm.monitored}}{% if batch_size > 1 %} + _batch * {{sm.N}}{% endif %}, {{sm.N}}, brian::_array_{{sm.monitored}}_{{var}});
                   {% endif %}
                 {% endif %}
               {% endif %}
             {% endfor %}
       _run_{{sm.codeobject_name}}();
+            {% if batch_size > 1 %}
+      }
+            {% endif %}
     }
           {% endif %}
         {% endfor %}
     // report spikes
+        {% if batch_size > 1 %}
+    for (unsigned int _batch = 0; _batch < {{batch_size}}; _batch++)
+    {
+      swapBatch(_batch);
+      // Let the monitors see the spikes of this model instance
+          {% for monitor in spike_monitor_models + rate_monitor_models %}
+            {% for pointer, stride in monitor.batch_pointers %}
+      {{pointer}} += _batch * {{stride}};
+            {% endfor %}
+            {% if monitor.step > 1 %}
+      if (iT % {{monitor.step}} == 0)
+            {% endif %}
+      _run_{{monitor.codeobject_name}}();
+            {% for pointer, stride in monitor.batch_pointers %}
+      {{pointer}} -= _batch * {{stride}};
+            {% endfor %}
+          {% endfor %}
+      swapBatch(_batch);
+    }
+        {% else %}
         {% for spkMon in spike_monitor_models %}
+          {% if not spkMon.spike_recording %}
+            {% if spkMon.step > 1 %}
+    if (iT % {{spkMon.step}} == 0)
+            {% endif %}
     _run_{{spkMon.codeobject_name}}();
+          {% endif %}
         {% endfor %}
         {% for rateMon in rate_monitor_models %}
+          {% if not rateMon.on_device %}
+            {% if rateMon.step > 1 %}
+    if (iT % {{rateMon.step}} == 0)
+            {% endif %}
     _run_{{rateMon.codeobject_name}}();
+          {% endif %}
         {% endfor %}
+        {% endif %}
+        {% if recorded_spike_monitors %}
+    // GeNN recorded the spikes of this step in the row iT % {{spike_recording_buffer_steps}}
+    if (_spike_recording_steps == 0)
+    {
+      _spike_recording_start = iT;
+      _spike_recording_row = iT % {{spike_recording_buffer_steps}};
+    }
+    _spike_recording_steps++;
+    // The next step is recorded in the first row again
+    if ((iT + 1) % {{spike_recording_buffer_steps}} == 0)
+      _flush_spike_recording();
+        {% endif %}
     // Bring the time step back to the value for the next loop iteration
     iT++;
     t = iT*DT;
@@ -315,10 +574,26 @@ void engine::run(double duration)  //!< Duration of time to run the model for
     current= std::clock();
     elapsed_realtime= (double) (current - start)/CLOCKS_PER_SEC;
     if (elapsed_realtime > {{maximum_run_time}}) {
+          {% for sm in device_state_monitors %}
+            {% if sm.when == 'start' %}
+      // The next step is not executed
+      if (iT % {{sm.step}} == 0 && i + 1 < riT)
+        _rec_count_{{sm.name}}--;
+            {% endif %}
+          {% endfor %}
       break;
     }
         {% endif %}
   }
+        {% for sm in device_state_monitors %}
+  _flush_{{sm.name}}();
+        {% endfor %}
+        {% if recorded_spike_monitors %}
+  _flush_spike_recording();
+        {% endif %}
+        {% if device_rate_monitors %}
+  _flush_rate_monitors();
+        {% endif %}
         {% if maximum_run_time is none %}
   current= std::clock();
   elapsed_realtime= (double) (current - start)/CLOCKS_PER_SEC;
@@ -356,6 +631,38 @@ void engine::getSpikesFromGPU()
   copyCurrentSpikesFromDevice();
 }
 
+//--------------------------------------------------------------------------
+/*! \brief Method for allocating the buffers of the monitors that record on the device and of GeNN's spike recording
+
+  Has to be called after the indices recorded by the monitors have been set.
+*/
+//--------------------------------------------------------------------------
+
+void engine::initRecording()
+{
+  {% if recorded_spike_monitors %}
+  allocateRecordingBuffers({{spike_recording_buffer_steps}});
+  {% endif %}
+  {% for rateMon in device_rate_monitors %}
+  // {{rateMon.name}}: the number of spikes in each time step
+  allocate{{rateMon.counter}}({{rate_monitor_buffer_steps}});
+  std::fill_n({{rateMon.counter}}, {{rate_monitor_buffer_steps}}, 0);
+  push{{rateMon.counter}}ToDevice({{rate_monitor_buffer_steps}});
+  {% endfor %}
+  {% for sm in device_state_monitors %}
+  // {{sm.name}}: the row of each recorded neuron in the buffers (or -1)
+  allocate_rec_index_{{sm.name}}{{sm.monitored}}({{groupDict[sm.monitored].N}});
+  std::fill_n(_rec_index_{{sm.name}}{{sm.monitored}}, {{groupDict[sm.monitored].N}}, -1);
+  for (int _j = 0; _j < {{sm.n_indices}}; _j++)
+    _rec_index_{{sm.name}}{{sm.monitored}}[{{sm.offset}} + brian::{{sm.indices_array}}[_j]] = _j;
+  push_rec_index_{{sm.name}}{{sm.monitored}}ToDevice({{groupDict[sm.monitored].N}});
+  {% for var, buffer_name, var_type in sm.buffer_variables %}
+  allocate{{buffer_name}}{{sm.monitored}}({{sm.buffer_steps * sm.n_indices}});
+  {% endfor %}
+  _rec_slot_{{sm.name}}{{sm.monitored}} = -1;
+  {% endfor %}
+}
+
 
 
 #endif
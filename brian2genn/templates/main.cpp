@@ -1,3 +1,4 @@
+{% from 'connectivity_cases.cpp' import connectivity_cases as _connectivity_cases %}
 {% macro cpp_file() %}
 //--------------------------------------------------------------------------
 /*! \file main.cu
@@ -8,6 +9,9 @@
 
 #include "main.h"
 #include "magicnetwork_model_CODE/definitions.h"
+{% if random_state_file %}
+#include "b2glib/synapse_file.h"
+{% endif %}
 
 {% for header in header_files %}
 {% if header.startswith('"') or header.startswith('<') %}
@@ -16,9 +20,42 @@
 #include "{{header}}"
 {% endif %}
 {% endfor %}
+{% if auto_connectivity %}
+// the connectivity formats chosen during the model definition
+#include "{{connectivity_header_file}}"
+{% endif %}
 
 #include "engine.cpp"
 
+{% if spike_streams %}
+// spike monitors that write their spikes to disk during the simulation
+{% for stream_name, filename in spike_streams %}
+b2g::SpikeStream {{stream_name}};
+{% endfor %}
+{% endif %}
+{% if state_streams %}
+// state monitors that write their values to disk during the simulation
+{% for stream_name, c_type, filename, row_size in state_streams %}
+b2g::StateStream<{{c_type}}> {{stream_name}};
+{% endfor %}
+{% endif %}
+
+{% if array_index %}
+// Store the type and shape of the arrays written by _write_arrays, so that
+// brian2genn can memory-map the result files without reading them
+void _write_array_index()
+{
+  std::ofstream _index("results/{{array_index_file}}");
+  if (!_index.is_open())
+  {
+      std::cerr << "Error writing output file results/{{array_index_file}}" << std::endl;
+      return;
+  }
+  {% for filename, dtype, shape in array_index %}
+  _index << "{{filename}} {{dtype}}"{% for dim in shape %} << " " << {{dim}}{% endfor %} << std::endl;
+  {% endfor %}
+}
+{% endif %}
 
 
 //--------------------------------------------------------------------------
@@ -46,6 +83,10 @@ int main(int argc, char *argv[])
 
   {{'\n'.join(code_lines['before_start'])|autoindent}}
 
+  // wall-clock times of the stages of the run
+  double _initialisation_time = 0.0, _simulation_time = 0.0, _results_time = 0.0;
+  const b2g::time_point _initialisation_start = b2g::now();
+
   //-----------------------------------------------------------------
   // build the neuronal circuitery (calls initialize and allocateMem)
   engine eng;
@@ -54,7 +95,26 @@ int main(int argc, char *argv[])
   // load variables and parameters and translate them from Brian to Genn
   _init_arrays();
   _load_arrays();
+  {% if packed_static_arrays %}
+  if (!_load_static_arrays())
+      return 1;
+  {% endif %}
+  {% for stream_name, filename in spike_streams %}
+  if (!{{stream_name}}.open("{{filename}}", {{spike_stream_buffer_size}}))
+      return 1;
+  {% endfor %}
+  {% for stream_name, c_type, filename, row_size in state_streams %}
+  if (!{{stream_name}}.open("{{filename}}", {{row_size}}, {{state_stream_buffer_steps}}))
+      return 1;
+  {% endfor %}
+  {% if random_state_file %}
+  // use the same random numbers as the model definition, which created the
+  // synapses that are loaded below
+  if (!b2g::read_random_state("{{random_state_file}}", brian::_mersenne_twister_states[0]))
+      return 1;
+  {% else %}
   rk_randomseed(brian::_mersenne_twister_states[0]);
+  {% endif %}
   {{'\n'.join(code_lines['after_start'])|autoindent}}
   {
 	  using namespace brian;
@@ -63,59 +123,132 @@ int main(int argc, char *argv[])
 
   // translate to GeNN synaptic arrays
   {% for synapses in synapse_models %}
-  {% if synapses.connectivity == 'DENSE' %}
-  {% for var in synapses.variables %}
-  {% if synapses.variablescope[var] == 'brian' %}
-  convert_dynamic_arrays_2_dense_matrix(brian::_dynamic_array_{{synapses.name}}__synaptic_pre, brian::_dynamic_array_{{synapses.name}}__synaptic_post, brian::_dynamic_array_{{synapses.name}}_{{var}}, {{var}}{{synapses.name}}, {{synapses.srcN}}, {{synapses.trgN}});
-  {% endif %}
-  {% endfor %} {# all synapse variables #}
-  create_hidden_weightmatrix(brian::_dynamic_array_{{synapses.name}}__synaptic_pre, brian::_dynamic_array_{{synapses.name}}__synaptic_post, _hidden_weightmatrix{{synapses.name}},{{synapses.srcN}}, {{synapses.trgN}});
-  {% else %} {# for sparse matrix representations #}
+  {% call(connectivity) _connectivity_cases(synapses) %}
+  {% if connectivity == 'SPARSE' and synapses.connectivity_initialiser %}
+  // the synapses have been created by GeNN
+  initialize_sparse_synapse_indices(rowLength{{synapses.name}}, maxRowLength{{synapses.name}}, {{synapses.srcN}},
+                                    sparseSynapseIndices{{synapses.name}});
+  {% elif connectivity == 'SPARSE' %}
   initialize_sparse_synapses(brian::_dynamic_array_{{synapses.name}}__synaptic_pre, brian::_dynamic_array_{{synapses.name}}__synaptic_post,
                              rowLength{{synapses.name}}, ind{{synapses.name}}, maxRowLength{{synapses.name}},
                              {{synapses.srcN}}, {{synapses.trgN}},
                              sparseSynapseIndices{{synapses.name}});
+  {% elif connectivity == 'BITMASK' %}
+  create_bitmask(brian::_dynamic_array_{{synapses.name}}__synaptic_pre, brian::_dynamic_array_{{synapses.name}}__synaptic_post,
+                 gp{{synapses.name}}, {{synapses.srcN}}, {{synapses.trgN}});
+  {% endif %}
+  {% endcall %}
+  {% for var in synapses.shared_variables %}
+  std::copy_n(brian::_array_{{synapses.name}}_{{var}}, 1, &{{var}}{{synapses.name}});
+  {% endfor %} {# shared variables #}
+  {% endfor %} {# all synapse_models #}
+
+  // copy scalar variables
+  {% for neuron in neuron_models %}
+  {% for var in neuron.shared_variables %}
+  std::copy_n(brian::_array_{{neuron.name}}_{{var}}, 1, &{{var}}{{neuron.name}});
+  {% endfor %}
+  {% endfor %}
+
+  {% if batch_size > 1 %}
+  // all model instances share the connectivity and scalar variables, but
+  // other variables are initialised separately for each instance
+  for (unsigned int _batch = 0; _batch < {{batch_size}}; _batch++)
+  {
+  if (_batch > 0)
+  {
+	  using namespace brian;
+	  {{ batch_main_lines | autoindent }}
+  }
+  {% endif %}
+  {% for synapses in synapse_models %}
+  {% call(connectivity) _connectivity_cases(synapses) %}
+  {% if connectivity == 'DENSE' %}
+  {% set _offset = ' + _batch * ' ~ synapses.srcN * synapses.trgN if batch_size > 1 else '' %}
+  check_unique_synapses(brian::_dynamic_array_{{synapses.name}}__synaptic_pre, brian::_dynamic_array_{{synapses.name}}__synaptic_post, {{synapses.srcN}}, {{synapses.trgN}});
   {% for var in synapses.variables %}
-  {% if synapses.variablescope[var] == 'brian' %}
+  {% if synapses.variablescope[var] == 'brian' and var not in synapses.variable_initialisers %}
+  convert_dynamic_arrays_2_dense_matrix(brian::_dynamic_array_{{synapses.name}}__synaptic_pre, brian::_dynamic_array_{{synapses.name}}__synaptic_post, brian::_dynamic_array_{{synapses.name}}_{{var}}, {{var}}{{synapses.name}}{{_offset}}, {{synapses.srcN}}, {{synapses.trgN}}, false);
+  {% endif %}
+  {% endfor %} {# all synapse variables #}
+  create_hidden_weightmatrix(brian::_dynamic_array_{{synapses.name}}__synaptic_pre, brian::_dynamic_array_{{synapses.name}}__synaptic_post, _hidden_weightmatrix{{synapses.name}}{{_offset}},{{synapses.srcN}}, {{synapses.trgN}});
+  {% else %} {# for sparse matrix representations #}
+  {% set _offset = ' + _batch * ' ~ synapses.srcN ~ ' * maxRowLength' ~ synapses.name if batch_size > 1 else '' %}
+  {% for var in synapses.variables %}
+  {% if synapses.variablescope[var] == 'brian' and var not in synapses.variable_initialisers %}
   convert_dynamic_arrays_2_sparse_synapses(brian::_dynamic_array_{{synapses.name}}_{{var}},
 					   sparseSynapseIndices{{synapses.name}},
-                                           {{var}}{{synapses.name}},
+                                           {{var}}{{synapses.name}}{{_offset}},
                                            {{synapses.srcN}}, {{synapses.trgN}});
   {% endif %}
   {% endfor %} {# all synapse variables #}
   {% endif %} {# dense/sparse #}
-  {% for var in synapses.shared_variables %}
-  std::copy_n(brian::_array_{{synapses.name}}_{{var}}, 1, &{{var}}{{synapses.name}});
-  {% endfor %} {# shared variables #}
+  {% endcall %}
   {% endfor %} {# all synapse_models #}
 
   // copy variable arrays
   {% for neuron in neuron_models %} 
+  {% set _offset = ' + _batch * ' ~ neuron.N if batch_size > 1 else '' %}
   {% for var in neuron.variables %}
-  {% if neuron.variablescope[var] == 'brian' %}
-  std::copy_n(brian::_array_{{neuron.name}}_{{var}}, {{neuron.N}}, {{var}}{{neuron.name}});
+  {% if neuron.variablescope[var] == 'brian' and var not in neuron.variable_initialisers %}
+  std::copy_n(brian::_array_{{neuron.name}}_{{var}}, {{neuron.N}}, {{var}}{{neuron.name}}{{_offset}});
   {% endif %}
   {% endfor %}
   {% endfor %}
+  {% if batch_size > 1 %}
+  }
+  eng.initBatches();
+  {% endif %}
 
-  // copy scalar variables
-  {% for neuron in neuron_models %}
-  {% for var in neuron.shared_variables %}
-  std::copy_n(brian::_array_{{neuron.name}}_{{var}}, 1, &{{var}}{{neuron.name}});
-  {% endfor %}
+  // copy the spikes of the spike generators that emit them on the device
+  {% for spkGen in spikegenerator_models %}
+  {% if spkGen.on_device %}
+  {
+      const std::vector<int32_t> _timebins = b2g::sort_spikes_by_neuron(brian::{{spkGen.neuron_index_array}}, brian::{{spkGen.timebins_array}},
+                                                                        brian::{{spkGen.lastindex_array}}[0], {{spkGen.N}},
+                                                                        startSpike{{spkGen.name}}, endSpike{{spkGen.name}},
+                                                                        nextSpike{{spkGen.name}});
+      const unsigned int _num_spikes = std::max<unsigned int>(_timebins.size(), 1);
+      allocatetimebins{{spkGen.name}}(_num_spikes);
+      std::copy(_timebins.begin(), _timebins.end(), timebins{{spkGen.name}});
+      pushtimebins{{spkGen.name}}ToDevice(_num_spikes);
+      periodBins{{spkGen.name}} = brian::{{spkGen.period_array}}[0];
+  }
+  {% endif %}
   {% endfor %}
-  
+
+  {% if runtime_parameters %}
+  // set the parameters that can be changed without recompiling
+  {
+      std::ifstream _parameter_file("{{runtime_parameters_file}}");
+      if (!_parameter_file)
+      {
+          fprintf(stderr, "Could not open the parameter file {{runtime_parameters_file}}\n");
+          return 1;
+      }
+      std::string _group_name, _param_name;
+      double _value;
+      while (_parameter_file >> _group_name >> _param_name >> _value)
+      {
+          {% for group_name, param_name in runtime_parameters %}
+          {% if not loop.first %}else {% endif %}if (_group_name == "{{group_name}}" && _param_name == "{{param_name}}")
+              {{param_name}}{{group_name}} = _value;
+          {% endfor %}
+      }
+  }
+  {% endif %}
+
   // initialise random seeds (if any are used)
   {% for neuron in neuron_models %} ;
   {% if '_seed' in neuron.variables %}
-  for (unsigned int i= 0; i < {{neuron.N}}; i++) {
+  for (unsigned int i= 0; i < {{neuron.N * batch_size}}; i++) {
       _seed{{neuron.name}}[i]= (uint64_t) (rand()*0x0000FFFFFFFFFFFFLL);
   }
   {% endif %}
   {% endfor %}
   {% for synapses in synapse_models %}
   {% if '_seed' in synapses.variables %}
-  for (unsigned int i= 0; i < (maxRowLength{{synapses.name}} * {{synapses.srcN}}); i++) {
+  for (unsigned int i= 0; i < (maxRowLength{{synapses.name}} * {{synapses.srcN * batch_size}}); i++) {
       _seed{{synapses.name}}[i]= (uint64_t) (rand()*0x0000FFFFFFFFFFFFLL);
   }
   {% endif %}
@@ -123,51 +256,52 @@ int main(int argc, char *argv[])
 
   // Perform final stage of initialization, uploading manually initialized variables to GPU etc
   initializeSparse();
+  eng.initRecording();
+  _initialisation_time = b2g::elapsed_seconds(_initialisation_start);
   
   //------------------------------------------------------------------
   // output general parameters to output file and start the simulation
   fprintf(stderr, "# We are running with fixed time step %f \n", DT);
 
-  t= 0.;
-  void *devPtr;
-  {{'\n'.join(code_lines['before_network_run'])|autoindent}}
-  eng.run(totalTime); // run for the full duration
-  {{'\n'.join(code_lines['after_network_run'])|autoindent}}
-  cerr << t << " done ..." << endl;
-  {% if profiled %}
-  {% for kt in ('neuronUpdateTime', 'presynapticUpdateTime', 'postsynapticUpdateTime', 'synapseDynamicsTime', 'initTime', 'initSparseTime') %}
-  fprintf(timef,"%f ", {{kt}});
-  {% endfor %}
-  fprintf(timef,"\n");
-  {% endif %} 
-
+  // copy the state of the simulation back into the brian arrays
+  auto _collect_results = [&]() -> int
+  {
   // get the final results from the GPU 
   eng.getStateFromGPU();
   eng.getSpikesFromGPU();
+  {% for stream_name, filename in spike_streams %}
+  {{stream_name}}.flush();
+  {% endfor %}
+  {% for stream_name, c_type, filename, row_size in state_streams %}
+  {{stream_name}}.flush();
+  {% endfor %}
 
+  {% if batch_size > 1 %}
+  // write the results of all but the first model instance into separate
+  // directories, the results of the first instance are written last
+  for (int _batch = {{batch_size - 1}}; _batch >= 0; _batch--)
+  {
+  {% endif %}
   // translate GeNN arrays back to synaptic arrays
   {% for synapses in synapse_models %}
-  {% if synapses.connectivity == 'DENSE' %}
+  {% call(connectivity) _connectivity_cases(synapses) %}
+  {% if connectivity == 'DENSE' %}
+  {% set _offset = ' + _batch * ' ~ synapses.srcN * synapses.trgN if batch_size > 1 else '' %}
   {% for var in synapses.variables %}
   {% if synapses.variablescope[var] == 'brian' %}
-  convert_dense_matrix_2_dynamic_arrays({{var}}{{synapses.name}}, {{synapses.srcN}}, {{synapses.trgN}},brian::_dynamic_array_{{synapses.name}}__synaptic_pre, brian::_dynamic_array_{{synapses.name}}__synaptic_post, brian::_dynamic_array_{{synapses.name}}_{{var}});
+  convert_dense_matrix_2_dynamic_arrays({{var}}{{synapses.name}}{{_offset}}, {{synapses.srcN}}, {{synapses.trgN}},brian::_dynamic_array_{{synapses.name}}__synaptic_pre, brian::_dynamic_array_{{synapses.name}}__synaptic_post, brian::_dynamic_array_{{synapses.name}}_{{var}});
   {% endif %}
   {% endfor %} {# all synapse variables #}
   {% else %} {# for sparse matrix representations #} 
-  {% set _first_var = true %}
+  {% set _offset = ' + _batch * ' ~ synapses.srcN ~ ' * maxRowLength' ~ synapses.name if batch_size > 1 else '' %}
   {% for var in synapses.variables %}
   {% if synapses.variablescope[var] == 'brian' %}
-      {% if _first_var %}
-      {% set _mode = 'b2g::FULL_MONTY' %}
-      {% set _first_var = false %}
-      {% else %}
-      {% set _mode = 'b2g::COPY_ONLY' %}
-      {% endif %}
-      convert_sparse_synapses_2_dynamic_arrays(rowLength{{synapses.name}}, ind{{synapses.name}}, maxRowLength{{synapses.name}},
-                                               {{var}}{{synapses.name}}, {{synapses.srcN}}, {{synapses.trgN}}, brian::_dynamic_array_{{synapses.name}}__synaptic_pre, brian::_dynamic_array_{{synapses.name}}__synaptic_post, brian::_dynamic_array_{{synapses.name}}_{{var}}, {{_mode}});
+      convert_sparse_synapses_2_dynamic_arrays({{var}}{{synapses.name}}{{_offset}}, sparseSynapseIndices{{synapses.name}},
+                                               brian::_dynamic_array_{{synapses.name}}_{{var}});
   {% endif %}
   {% endfor %} {# all synapse variables #}
   {% endif %} {# dense/sparse #}
+  {% endcall %}
   {% for var in synapses.shared_variables %}
   std::copy_n(&{{var}}{{synapses.name}}, 1, brian::_array_{{synapses.name}}_{{var}});
   {% endfor %} {# shared variables #}
@@ -175,9 +309,10 @@ int main(int argc, char *argv[])
 
   // copy variable arrays
   {% for neuron in neuron_models %} 
+  {% set _offset = ' + _batch * ' ~ neuron.N if batch_size > 1 else '' %}
   {% for var in neuron.variables %}
   {% if neuron.variablescope[var] == 'brian' %}
-  std::copy_n({{var}}{{neuron.name}}, {{neuron.N}}, brian::_array_{{neuron.name}}_{{var}});
+  std::copy_n({{var}}{{neuron.name}}{{_offset}}, {{neuron.N}}, brian::_array_{{neuron.name}}_{{var}});
   {% endif %}
   {% endfor %}
   {% endfor %}
@@ -188,10 +323,174 @@ int main(int argc, char *argv[])
   std::copy_n(&{{var}}{{neuron.name}}, 1, brian::_array_{{neuron.name}}_{{var}});
   {% endfor %}
   {% endfor %}
+  {% if batch_size > 1 %}
+
+  // StateMonitors recorded one row per model instance and time step
+  {% for sm in state_monitor_models %}
+  brian::{{sm.N_array}}[0] = brian::{{sm.t_array}}.size() / {{batch_size}};
+  {% endfor %}
+  if (_batch > 0)
+  {
+      const std::string _batch_dir = "{{batch_results_directory}}/" + std::to_string(_batch);
+      if (b2g_chdir(_batch_dir.c_str()) != 0)
+      {
+          fprintf(stderr, "Could not change to the directory %s\n", _batch_dir.c_str());
+          return 1;
+      }
+      eng.swapBatch(_batch);
+      _write_arrays();
+      {% if array_index %}
+      _write_array_index();
+      {% endif %}
+      eng.swapBatch(_batch);
+      {% for sm in state_monitor_models %}
+      b2g::write_batch_rows(brian::{{sm.t_array}}, _batch, {{batch_size}}, "{{sm.t_filename}}");
+      {% for array_name, filename in sm.recorded_arrays %}
+      b2g::write_batch_rows(brian::{{array_name}}, _batch, {{batch_size}}, "{{filename}}");
+      {% endfor %}
+      {% endfor %}
+      if (b2g_chdir("../..") != 0)
+      {
+          fprintf(stderr, "Could not change back to the project directory\n");
+          return 1;
+      }
+  }
+  }
+  {% for sm in state_monitor_models %}
+  b2g::compact_batch_rows(brian::{{sm.t_array}}, {{batch_size}});
+  {% for array_name, filename in sm.recorded_arrays %}
+  b2g::compact_batch_rows(brian::{{array_name}}, {{batch_size}});
+  {% endfor %}
+  {% endfor %}
+  {% endif %}
+  return 0;
+  };
+
+  t= 0.;
+  void *devPtr;
+  {% if persistent %}
+  // execute the commands sent by brian2genn until it asks us to quit
+  std::string _command;
+  while (std::cin >> _command)
+  {
+      if (_command == "run")
+      {
+          double _duration;
+          std::cin >> _duration;
+          {{'\n'.join(code_lines['before_network_run'])|autoindent}}
+          const b2g::time_point _simulation_start = b2g::now();
+          eng.run(_duration);
+          _simulation_time = b2g::elapsed_seconds(_simulation_start);
+          {{'\n'.join(code_lines['after_network_run'])|autoindent}}
+          cerr << t << " done ..." << endl;
+          {% if profiled %}
+          {% for kt in ('neuronUpdateTime', 'presynapticUpdateTime', 'postsynapticUpdateTime', 'synapseDynamicsTime', 'initTime', 'initSparseTime') %}
+          fprintf(timef,"%f ", {{kt}});
+          {% endfor %}
+          fprintf(timef,"\n");
+          fflush(timef);
+          {% endif %}
+      }
+      else if (_command == "write")
+      {
+          const b2g::time_point _results_start = b2g::now();
+          if (_collect_results() != 0)
+              return 1;
+          _write_arrays();
+          {% if array_index %}
+          _write_array_index();
+          {% endif %}
+          _results_time = b2g::elapsed_seconds(_results_start);
+          b2g::write_stage_timings("results/stage_timings.txt", _initialisation_time,
+                                   _simulation_time, _results_time);
+          // only the first run includes the initialisation
+          _initialisation_time = 0.0;
+      }
+      else if (_command == "load")
+      {
+          std::string _array_name, _filename;
+          std::cin >> _array_name >> _filename;
+          {% for array_name, model, var, kind in server_arrays %}
+          {% if not loop.first %}else {% endif %}if (_array_name == "{{array_name}}")
+          {
+              {% if kind == 'shared' %}
+              if (!b2g::read_array(_filename, brian::{{array_name}}, 1))
+                  return 1;
+              {{var}}{{model.name}} = brian::{{array_name}}[0];
+              {% elif kind == 'neuron' %}
+              if (!b2g::read_array(_filename, brian::{{array_name}}, {{model.N}}))
+                  return 1;
+              std::copy_n(brian::{{array_name}}, {{model.N}}, {{var}}{{model.name}});
+              push{{var}}{{model.name}}ToDevice();
+              {% else %}
+              if (!b2g::read_array(_filename, &brian::{{array_name}}[0], brian::{{array_name}}.size()))
+                  return 1;
+              {% call(connectivity) _connectivity_cases(model) %}
+              {% if connectivity == 'DENSE' %}
+              convert_dynamic_arrays_2_dense_matrix(brian::_dynamic_array_{{model.name}}__synaptic_pre, brian::_dynamic_array_{{model.name}}__synaptic_post, brian::{{array_name}}, {{var}}{{model.name}}, {{model.srcN}}, {{model.trgN}}, false);
+              {% else %}
+              convert_dynamic_arrays_2_sparse_synapses(brian::{{array_name}}, sparseSynapseIndices{{model.name}},
+                                                       {{var}}{{model.name}}, {{model.srcN}}, {{model.trgN}});
+              {% endif %}
+              {% endcall %}
+              push{{var}}{{model.name}}ToDevice();
+              {% endif %}
+          }
+          {% endfor %}
+          {% if server_arrays %}else{% endif %}
+          {
+              fprintf(stderr, "Cannot set the values of %s\n", _array_name.c_str());
+              return 1;
+          }
+      }
+      else if (_command == "quit")
+      {
+          break;
+      }
+      else
+      {
+          fprintf(stderr, "Unknown command %s\n", _command.c_str());
+          return 1;
+      }
+      std::cout << "{{server_acknowledgement}}" << std::endl;
+  }
+  {% else %}
+  {{'\n'.join(code_lines['before_network_run'])|autoindent}}
+  const b2g::time_point _simulation_start = b2g::now();
+  eng.run(totalTime); // run for the full duration
+  _simulation_time = b2g::elapsed_seconds(_simulation_start);
+  {{'\n'.join(code_lines['after_network_run'])|autoindent}}
+  cerr << t << " done ..." << endl;
+  {% if profiled %}
+  {% for kt in ('neuronUpdateTime', 'presynapticUpdateTime', 'postsynapticUpdateTime', 'synapseDynamicsTime', 'initTime', 'initSparseTime') %}
+  fprintf(timef,"%f ", {{kt}});
+  {% endfor %}
+  fprintf(timef,"\n");
+  {% endif %} 
+  {% endif %}
+
+  const b2g::time_point _results_start = b2g::now();
+  if (_collect_results() != 0)
+      return 1;
 
   {{'\n'.join(code_lines['before_end'])|autoindent}}
   _write_arrays();
+  {% if array_index %}
+  _write_array_index();
+  {% endif %}
+  _results_time = b2g::elapsed_seconds(_results_start);
+  b2g::write_stage_timings("results/stage_timings.txt", _initialisation_time,
+                           _simulation_time, _results_time);
   _dealloc_arrays();
+  {% if packed_static_arrays %}
+  _unload_static_arrays();
+  {% endif %}
+  {% for stream_name, filename in spike_streams %}
+  {{stream_name}}.close();
+  {% endfor %}
+  {% for stream_name, c_type, filename, row_size in state_streams %}
+  {{stream_name}}.close();
+  {% endfor %}
   {{'\n'.join(code_lines['after_end'])|autoindent}}
   cerr << "everything finished." << endl;
   return 0;
@@ -210,6 +509,9 @@ int main(int argc, char *argv[])
 using namespace std;
 #include <cassert>
 #include <cstdint>
+#include <fstream>
+#include <iostream>
+#include <string>
 #include <vector>
 
 // we will hard-code some stuff ... because at the end of the day that is 
@@ -224,7 +526,7 @@ using namespace std;
 // synapse variables into genn SPARSE synaptic arrays (needed for run_regularly)
 
 {% for synapses in synapse_models %}
-{% if synapses.connectivity != 'DENSE' %}
+{% if 'SPARSE' in synapses.connectivity_options %}
 std::vector<size_t> sparseSynapseIndices{{synapses.name}};
 {% endif %}
 {% endfor %}
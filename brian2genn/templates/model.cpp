@@ -6,6 +6,14 @@
 
 #include "objects.h"
 #include "objects.cpp"
+{% if packed_static_arrays %}
+#include "static_arrays.cpp"
+{% endif %}
+{% if auto_connectivity %}
+#include <fstream>
+#include <iostream>
+#include "b2glib/connectivity.h"
+{% endif %}
 
 {% for header in header_files %}
 {% if header.startswith('"') or header.startswith('<') %}
@@ -23,9 +31,9 @@ double Network::_last_run_completed_fraction = 0.0;
 {{inc}}
 {% endfor %}
 
-{% for inc in max_row_length_include %}
-{{inc}}
-{% endfor %}
+{% if random_state_file %}
+#include "b2glib/synapse_file.h"
+{% endif %}
 
 //--------------------------------------------------------------------------
 /*! \brief This function defines the Brian2GeNN_model
@@ -58,7 +66,8 @@ public:
     {% endfor %}
     });
     SET_EXTRA_GLOBAL_PARAMS({
-    {% for var,type in zip(neuron_model.shared_variables, neuron_model.shared_variabletypes) %}
+    {% set clock_parameters = ['_clock_tick'] if neuron_model.step > 1 else [] %}
+    {% for var,type in zip(neuron_model.shared_variables + neuron_model.runtime_parameters + neuron_model.recording_parameters + neuron_model.run_regularly_parameters + clock_parameters, neuron_model.shared_variabletypes + neuron_model.runtime_parametertypes + neuron_model.recording_parametertypes + ['int'] * (neuron_model.run_regularly_parameters + clock_parameters)|length) %}
         {"{{var}}", "{{type}}"}{% if not loop.last %},{% endif %}
     {% endfor %}
     });
@@ -67,17 +76,59 @@ public:
 IMPLEMENT_MODEL({{neuron_model.name}}NEURON);
 {% endfor %}
 
-//
-// define the synapse model classes
-{% for synapse_model in synapse_models %}
-class {{synapse_model.name}}WEIGHTUPDATE : public WeightUpdateModels::Base
+{% if spikegenerator_models | selectattr('on_device') | list %}
+// SpikeGeneratorGroups that emit their spikes on the device. The time bins of
+// the spikes of each neuron are stored in the range [startSpike, endSpike) of
+// timebins, nextSpike is the next spike that has not been emitted yet.
+class SpikeGeneratorNEURON : public NeuronModels::Base
+{
+public:
+    DECLARE_MODEL(SpikeGeneratorNEURON, 0, 3);
+
+    SET_SIM_CODE("int64_t _timebin = (int64_t)($(t)/DT + 0.5);\n\
+if ($(periodBins) > 0)\n\
+{\n\
+    _timebin %= $(periodBins);\n\
+    // start again with the first spike when the period has passed\n\
+    if ($(nextSpike) > $(startSpike) && $(timebins)[$(nextSpike) - 1] >= _timebin)\n\
+        $(nextSpike) = $(startSpike);\n\
+}\n\
+const bool _cond = $(nextSpike) < $(endSpike) && $(timebins)[$(nextSpike)] <= _timebin;");
+    SET_THRESHOLD_CONDITION_CODE("_cond");
+    SET_RESET_CODE("$(nextSpike)++;");
+
+    SET_VARS({
+        {"startSpike", "unsigned int"},
+        {"endSpike", "unsigned int"},
+        {"nextSpike", "unsigned int"}
+    });
+    SET_EXTRA_GLOBAL_PARAMS({
+        {"timebins", "int*"},
+        {"periodBins", "int"}
+    });
+    SET_NEEDS_AUTO_REFRACTORY(false);
+};
+IMPLEMENT_MODEL(SpikeGeneratorNEURON);
+
+{% endif %}
+{% macro _var_init(model, var) %}
+{% if var in model.variable_initialisers %}
+{% set snippet, snippet_params = model.variable_initialisers[var] %}
+initVar<{{snippet}}>({ {{snippet_params|join(', ')}} })
+{%- else %}
+uninitialisedVar()
+{%- endif %}
+{% endmacro %}
+
+{% macro _weight_update_model(synapse_model, class_name, connectivity, main_code_lines) %}
+class {{class_name}} : public WeightUpdateModels::Base
 {
 public:
-    DECLARE_MODEL({{synapse_model.name}}WEIGHTUPDATE, {{synapse_model.pvalue.__len__()}}, {{synapse_model.variables.__len__() + (1 if synapse_model.connectivity == 'DENSE' else 0)}});
+    DECLARE_MODEL({{class_name}}, {{synapse_model.pvalue.__len__()}}, {{synapse_model.variables.__len__() + (1 if connectivity == 'DENSE' else 0)}});
 
-    SET_SIM_CODE("{% for line in synapse_model.main_code_lines['pre'] %}{{line}}{% endfor %}");
-    SET_LEARN_POST_CODE("{% for line in synapse_model.main_code_lines['post'] %}{{line}}{% endfor %}");
-    SET_SYNAPSE_DYNAMICS_CODE("{% for line in synapse_model.main_code_lines['dynamics'] %}{{line}}{% endfor %}");
+    SET_SIM_CODE("{% for line in main_code_lines['pre'] %}{{line}}{% endfor %}");
+    SET_LEARN_POST_CODE("{% for line in main_code_lines['post'] %}{{line}}{% endfor %}");
+    SET_SYNAPSE_DYNAMICS_CODE("{% for line in main_code_lines['dynamics'] %}{{line}}{% endfor %}");
 
     SET_SIM_SUPPORT_CODE("{% for line in synapse_model.support_code_lines['pre'] %}{{line}}{% endfor %}");
     SET_LEARN_POST_SUPPORT_CODE("{% for line in synapse_model.support_code_lines['post'] %}{{line}}{% endfor %}");
@@ -93,13 +144,13 @@ public:
     {% for var, type in zip(synapse_model.variables, synapse_model.variabletypes) %}
         {"{{var}}", "{{type}}"}{% if not loop.last %},{% endif %}
     {% endfor %}
-    {% if synapse_model.connectivity == 'DENSE' %}
+    {% if connectivity == 'DENSE' %}
         ,{"_hidden_weightmatrix", "char"}
     {% endif %}
     });
 
     SET_EXTRA_GLOBAL_PARAMS({
-    {% for var, type in zip(synapse_model.shared_variables, synapse_model.shared_variabletypes) %}
+    {% for var, type in zip(synapse_model.shared_variables + synapse_model.runtime_parameters + synapse_model.run_regularly_parameters, synapse_model.shared_variabletypes + synapse_model.runtime_parametertypes + ['int'] * synapse_model.run_regularly_parameters|length) %}
         {"{{var}}", "{{type}}"}{% if not loop.last %},{% endif %}
     {% endfor %}
     });
@@ -109,7 +160,17 @@ public:
 
 };
 
-IMPLEMENT_MODEL({{synapse_model.name}}WEIGHTUPDATE);
+IMPLEMENT_MODEL({{class_name}});
+{% endmacro %}
+
+//
+// define the synapse model classes
+{% for synapse_model in synapse_models %}
+{% if synapse_model.connectivity == 'AUTO' %}
+// weight update model for the DENSE connectivity (chosen during the model definition)
+{{ _weight_update_model(synapse_model, synapse_model.name ~ 'WEIGHTUPDATE_DENSE', 'DENSE', synapse_model.dense_main_code_lines) }}
+{% endif %}
+{{ _weight_update_model(synapse_model, synapse_model.name ~ 'WEIGHTUPDATE', synapse_model.connectivity, synapse_model.main_code_lines) }}
 
 class {{synapse_model.name}}POSTSYN : public PostsynapticModels::Base
 {
@@ -121,6 +182,37 @@ public:
 IMPLEMENT_MODEL({{synapse_model.name}}POSTSYN);
 {% endfor %}
 
+{% if fixed_number_post_snippet %}
+// connectivity initialisation snippet for a fixed number of synapses for each
+// presynaptic neuron, selecting the postsynaptic neurons without replacement
+// (selection sampling) as Brian's sample(N_post, size=...)
+class {{fixed_number_post_snippet}} : public InitSparseConnectivitySnippet::Base
+{
+public:
+    DECLARE_SNIPPET({{fixed_number_post_snippet}}, 1);
+
+    SET_ROW_BUILD_CODE(
+        "if($(selected) == (unsigned int)$(rowLength) || $(k) == $(num_post)) {\n"
+        "   $(endRow);\n"
+        "}\n"
+        "if(($(num_post) - $(k)) * $(gennrand_uniform) < ($(rowLength) - $(selected))) {\n"
+        "   $(addSynapse, $(k));\n"
+        "   $(selected)++;\n"
+        "}\n"
+        "$(k)++;\n");
+    SET_ROW_BUILD_STATE_VARS({ {"k", "unsigned int", 0}, {"selected", "unsigned int", 0} });
+
+    SET_PARAM_NAMES({"rowLength"});
+
+    SET_CALC_MAX_ROW_LENGTH_FUNC(
+        [](unsigned int, unsigned int, const std::vector<double> &pars)
+        {
+            return (unsigned int)pars[0];
+        });
+};
+IMPLEMENT_SNIPPET({{fixed_number_post_snippet}});
+{% endif %}
+
 // parameter values
 // neurons
 {% for neuron_model in neuron_models %}
@@ -150,7 +242,7 @@ IMPLEMENT_MODEL({{synapse_model.name}}POSTSYN);
 {% if neuron_model.variables.__len__() > 0 %}
 (
     {% for k in neuron_model.variables %}
-    uninitialisedVar(){% if not loop.last %},{% endif %}
+    {{ _var_init(neuron_model, k) }}{% if not loop.last %},{% endif %}
     {% endfor %}
 ){% endif %};
 {% endfor %}
@@ -162,12 +254,21 @@ IMPLEMENT_MODEL({{synapse_model.name}}POSTSYN);
 {% if synapse_model.variables.__len__() > 0 or synapse_model.connectivity == 'DENSE' %}
 (
     {% for k in synapse_model.variables %}
-    uninitialisedVar(){% if not loop.last %},{% endif %}
+    {{ _var_init(synapse_model, k) }}{% if not loop.last %},{% endif %}
     {% endfor %}
     {% if synapse_model.connectivity == 'DENSE' %}
     ,uninitialisedVar()
     {% endif %}
 ){% endif %};
+{% if synapse_model.connectivity == 'AUTO' %}
+{{synapse_model.name}}WEIGHTUPDATE_DENSE::VarValues {{synapse_model.name}}_ini_DENSE
+(
+    {% for k in synapse_model.variables %}
+    {{ _var_init(synapse_model, k) }},
+    {% endfor %}
+    uninitialisedVar()
+);
+{% endif %}
 {% endfor %}
 
 
@@ -175,18 +276,23 @@ void modelDefinition(NNmodel &model)
 {
   _init_arrays();
   _load_arrays();
+  {% if packed_static_arrays %}
+  if (!_load_static_arrays())
+      exit(1);
+  {% endif %}
   {{'\n'.join(code_lines['before_start'])|autoindent}}
   rk_randomseed(brian::_mersenne_twister_states[0]);
+  {% if random_state_file %}
+  // the simulation starts with the same random numbers
+  if (!b2g::write_random_state("{{random_state_file}}", brian::_mersenne_twister_states[0]))
+      exit(1);
+  {% endif %}
   {{'\n'.join(code_lines['after_start'])|autoindent}}
   {
 	  using namespace brian;
 	  {{ main_lines | autoindent }}
   }
 
-  {% for max_row_length in max_row_length_run_calls %}
-  {{max_row_length}}
-  {% endfor %}
-
   {% for synapses in max_row_length_synapses %}
   const long maxRow{{synapses}}= std::max(*std::max_element(brian::_dynamic_array_{{synapses}}_N_outgoing.begin(),brian::_dynamic_array_{{synapses}}_N_outgoing.end()),1);
   const long maxCol{{synapses}}= std::max(*std::max_element(brian::_dynamic_array_{{synapses}}_N_incoming.begin(),brian::_dynamic_array_{{synapses}}_N_incoming.end()),1);
@@ -225,31 +331,72 @@ void modelDefinition(NNmodel &model)
     {% if profiled %}
     model.setTiming(true);
     {% endif %}
+    {% if batch_size > 1 %}
+    model.setBatchSize({{batch_size}});
+    {% endif %}
     {% for neuron_model in neuron_models %}
+    {% if neuron_model.spike_recording %}
+    // the spikes are recorded on the device, see devices.genn.spike_recording
+    auto *{{neuron_model.name}}_pop = model.addNeuronPopulation<{{neuron_model.name}}NEURON>("{{neuron_model.name}}", {{neuron_model.N}}, {{neuron_model.name}}_p, {{neuron_model.name}}_ini);
+    {{neuron_model.name}}_pop->setSpikeRecordingEnabled(true);
+    {% else %}
     model.addNeuronPopulation<{{neuron_model.name}}NEURON>("{{neuron_model.name}}", {{neuron_model.N}}, {{neuron_model.name}}_p, {{neuron_model.name}}_ini);
+    {% endif %}
     {% endfor %}
     {% for spikeGen_model in spikegenerator_models %}
+    {% if spikeGen_model.on_device %}
+    model.addNeuronPopulation<SpikeGeneratorNEURON>("{{spikeGen_model.name}}", {{spikeGen_model.N}}, {},
+                                                    {uninitialisedVar(), uninitialisedVar(), uninitialisedVar()});
+    {% else %}
     model.addNeuronPopulation<NeuronModels::SpikeSource>("{{spikeGen_model.name}}", {{spikeGen_model.N}}, {}, {});
+    {% endif %}
     {% endfor %}
+    {% if auto_connectivity %}
+    // the connectivity formats chosen for synapses with the connectivity 'AUTO'
+    std::ofstream _connectivity_header("{{connectivity_header_file}}");
+    _connectivity_header << "#pragma once" << std::endl;
+    {% endif %}
     {% for synapse_model in synapse_models %}
     {
-    // TODO: Consider flexible use of DENSE and SPARSE (but beware of difficulty of judging which to use at compile time)
     {% if synapse_model.delay == 0 %}
     const unsigned int delaySteps = NO_DELAY;
     {% else %}
     const unsigned int delaySteps = {{synapse_model.delay}};
     {% endif %}
-    auto *syn = model.addSynapsePopulation<{{synapse_model.name}}WEIGHTUPDATE, {{synapse_model.name}}POSTSYN>(
-        "{{synapse_model.name}}", SynapseMatrixType::{{synapse_model.connectivity}}_INDIVIDUALG, delaySteps,
+    {% if synapse_model.connectivity == 'AUTO' %}
+    const int _connectivity = b2g::choose_connectivity(brian::_dynamic_array_{{synapse_model.name}}_N_outgoing,
+                                                       {{synapse_model.srcN}}, {{synapse_model.trgN}},
+                                                       {{synapse_model.synapse_bytes}},
+                                                       {{'true' if 'BITMASK' in synapse_model.connectivity_options else 'false'}});
+    _connectivity_header << "#define B2G_CONNECTIVITY_{{synapse_model.name}} " << _connectivity << std::endl;
+    std::cout << "Using " << b2g::connectivity_name(_connectivity) << " connectivity for {{synapse_model.name}}" << std::endl;
+    {% endif %}
+    {% for connectivity in synapse_model.connectivity_options %}
+    {% if synapse_model.connectivity == 'AUTO' %}
+    {{ '' if loop.first else 'else ' }}if (_connectivity == B2G_{{connectivity}})
+    {% endif %}
+    {
+    {% set weight_update = synapse_model.name ~ ('WEIGHTUPDATE_DENSE' if synapse_model.connectivity == 'AUTO' and connectivity == 'DENSE' else 'WEIGHTUPDATE') %}
+    {% set ini = synapse_model.name ~ ('_ini_DENSE' if synapse_model.connectivity == 'AUTO' and connectivity == 'DENSE' else '_ini') %}
+    auto *syn = model.addSynapsePopulation<{{weight_update}}, {{synapse_model.name}}POSTSYN>(
+        "{{synapse_model.name}}", SynapseMatrixType::{{connectivity ~ ('_GLOBALG' if connectivity in ['BITMASK', 'PROCEDURAL'] else '_INDIVIDUALG')}}, delaySteps,
         "{{synapse_model.srcname}}", "{{synapse_model.trgname}}",
-        {{synapse_model.name}}_p, {{synapse_model.name}}_ini,
+        {{synapse_model.name}}_p, {{ini}},
+        {% if synapse_model.connectivity_initialiser %}
+        {% set snippet, snippet_params = synapse_model.connectivity_initialiser %}
+        {}, {},
+        initConnectivity<{{snippet}}>({% if snippet_params %}{ {{snippet_params|join(', ')}} }{% endif %}));
+        {% else %}
         {}, {});
+        {% endif %}
     syn->setSpanType(SynapseGroup::SpanType::{{prefs['devices.genn.synapse_span_type']}});
-    {% if synapse_model.connectivity == 'SPARSE' %}
+    {% if connectivity == 'SPARSE' and not synapse_model.connectivity_initialiser %}
     syn->setMaxConnections(maxRow{{synapse_model.name}});
     syn->setMaxSourceConnections(maxCol{{synapse_model.name}});
     {% endif %}
     }
     {% endfor %}
+    }
+    {% endfor %}
 }
 
@@ -6,6 +6,11 @@
 
 #ifndef _BRIAN_NETWORK_H
 #define _BRIAN_NETWORK_H
+{% if packed_static_arrays %}
+// Brian2's objects.h includes this file, the packed static arrays are declared
+// in a separate header
+#include "static_arrays.h"
+{% endif %}
 class Network
 {
     public:
@@ -3,6 +3,14 @@
 // Update "constant over dt" subexpressions (if any)
 {{(scalar_code['subexpression_update'] + vector_code['subexpression_update'])|autoindent}}
 
+{% for block, parameter in run_regularly_blocks %}
+// run_regularly operation {{block}} (if due in this time step)
+if ($({{parameter}}))
+{
+    {{(scalar_code[block] + vector_code[block])|autoindent}}
+}
+{% endfor %}
+
 // PoissonInputs targetting this group (if any)
 {{(scalar_code['poisson_input'] + vector_code['poisson_input'])|autoindent}}
 
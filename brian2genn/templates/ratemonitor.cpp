@@ -1,14 +1,28 @@
-{# IS_OPENMP_COMPATIBLE #}
 {% extends 'common_group.cpp' %}
 
 {% block extra_headers %}
 #include "magicnetwork_model_CODE/definitions.h"
+{% if rate_counter is defined %}
+// the time steps counted on the device that have not been processed yet
+// (defined in engine.cpp)
+extern unsigned long long _rate_counting_start;
+extern unsigned int _rate_counting_steps;
+{% endif %}
 {% endblock%}
 
 {% block maincode %}
 	{# USES_VARIABLES { N, rate, t, _clock_t, _clock_dt, _spikespace,
 	                    _num_source_neurons, _source_start, _source_stop } #}
     {# WRITES_TO_READ_ONLY_VARIABLES { N } #}
+        {% if rate_counter is defined %}
+        // The spikes of each time step have been counted on the device
+        for (unsigned int _k = 0; _k < _rate_counting_steps; _k++)
+        {
+            {{_dynamic_rate}}.push_back(1.0*{{rate_counter}}[_k]/{{_clock_dt}}/_num_source_neurons);
+            {{_dynamic_t}}.push_back((_rate_counting_start + _k) * DT);
+        }
+        {{N}} += _rate_counting_steps;
+        {% else %}
         {% set sourcename= _spikespace.replace('_ptr_array_','').replace('__spikespace','') %}
         int _num_spikes = spikeCount_{{sourcename}};
 	// For subgroups, we do not want to record all spikes
@@ -25,5 +39,6 @@
 	{{_dynamic_rate}}.push_back(1.0*_nSpikes/{{_clock_dt}}/_num_source_neurons);
 	{{_dynamic_t}}.push_back(t);
 	{{N}}++;
+        {% endif %}
 {% endblock %}
 
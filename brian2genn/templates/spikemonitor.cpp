@@ -4,6 +4,17 @@
 {% block extra_headers %}
 {% set sourcename= eventspace_variable.owner.name %}
 #include "magicnetwork_model_CODE/definitions.h"
+{% if spike_stream is defined %}
+#include "b2glib/spike_stream.h"
+// defined in main.cpp
+extern b2g::SpikeStream {{spike_stream}};
+{% endif %}
+{% if spike_recording is defined %}
+// the time steps in GeNN's spike recording buffers that have not been
+// processed yet (defined in engine.cpp)
+extern unsigned long long _spike_recording_start;
+extern unsigned int _spike_recording_row, _spike_recording_steps;
+{% endif %}
 {% endblock %}
 
 {% block maincode %}
@@ -13,16 +24,46 @@
                         _source_start, _source_stop} #}
     {# WRITES_TO_READ_ONLY_VARIABLES { N, count } #}
     {#  Get the name of the array that stores these events (i.e. the spikespace array - other cases not (yet?) supported) #}
+    {% if spike_recording is defined %}
+    // GeNN records the spikes of each time step as a bitfield with one bit per
+    // neuron, the rows of all recorded time steps follow each other
+    const unsigned int _num_words = ({{eventspace_variable.owner.N}} + 31) / 32;
+    unsigned int _true_events = 0;
+    for (unsigned int _k = 0; _k < _spike_recording_steps; _k++)
+    {
+	const double _t = (_spike_recording_start + _k) * DT;
+	const uint32_t *_words = recordSpk{{sourcename}} + (size_t)(_spike_recording_row + _k) * _num_words;
+	for (unsigned int _w = _source_start / 32; _w < (_source_stop + 31) / 32; _w++)
+	{
+	    uint32_t _bits = _words[_w];
+	    for (unsigned int _bit = 0; _bits != 0; _bit++, _bits >>= 1)
+	    {
+		const int _idx = _w * 32 + _bit;
+		if ((_bits & 1) && (_idx >= _source_start) && (_idx < _source_stop)) {
+		    {% if spike_stream is defined %}
+		    {{spike_stream}}.push(_idx - _source_start, _t);
+		    {% else %}
+		    {% for varname, var in record_variables | dictsort %}
+		    {% if varname == 't' %}
+		    {{get_array_name(var, access_data=False)}}.push_back(_t);
+		    {% else %}
+		    {{get_array_name(var, access_data=False)}}.push_back(_idx - _source_start);
+		    {% endif %}
+		    {% endfor %}
+		    {% endif %}
+		    {{count}}[_idx-_source_start]++;
+		    _true_events++;
+		}
+	    }
+	}
+    }
+    {{N}} += _true_events;
+    {% else %}
     {% set _eventspace = 'spike_'+sourcename %}
     {% set _num_events = 'spikeCount_'+sourcename %}
+	// The spikes have already been pulled from the device in engine.cpp
 	int32_t _num_events = {{_num_events}};
 
-	{% for varname, var in record_variables.items() %}
-	{% if (varname != 't') and (varname != 'i') %}
-	pull{{sourcename}}CurrentSpikesFromDevice();
-	{% endif %}
-	{% endfor %}
-
 
     if (_num_events > 0)
     {
@@ -31,7 +72,10 @@
 	{
 	    const int _idx = {{_eventspace}}[_j];
 	    if ((_idx >= _source_start) && (_idx < _source_stop)) {
-		{% for varname, var in record_variables.items() %}
+		{% if spike_stream is defined %}
+		{{spike_stream}}.push(_idx - _source_start, t);
+		{% else %}
+		{% for varname, var in record_variables | dictsort %}
 		{% if varname == 't' %}
 		{{get_array_name(var, access_data=False)}}.push_back(t);
 		{% else %}
@@ -42,11 +86,13 @@
 		{% endif %}
 		{% endif %}
 		{% endfor %}
+		{% endif %}
 		{{count}}[_idx-_source_start]++;
 		_true_events++;
 	    }
 	}
 	{{N}} += _true_events;
     }
+    {% endif %}
 
 {% endblock %}
@@ -2,11 +2,27 @@
 
 {% block extra_headers %}
 #include "magicnetwork_model_CODE/definitions.h"
+{% if state_stream is defined %}
+#include "b2glib/state_stream.h"
+// defined in main.cpp
+extern b2g::StateStream<double> {{state_stream}}_t;
+{% for varname, var in _recorded_variables | dictsort %}
+extern b2g::StateStream<{{c_data_type(var.dtype)}}> {{state_stream}}_{{varname}};
+{% endfor %}
+{% endif %}
 {% endblock%}
 
 {% block maincode %}
     {# USES_VARIABLES { t, _clock_t, _indices, N } #}
     {# WRITES_TO_READ_ONLY_VARIABLES { t, N } #}
+    {% if state_stream is defined %}
+    // The recorded values are written to disk instead of the dynamic arrays
+    {{state_stream}}_t.row()[0] = t;
+    {{state_stream}}_t.push_row();
+    {% for varname, var in _recorded_variables | dictsort %}
+    {{c_data_type(var.dtype)}} * const _row_{{varname}} = {{state_stream}}_{{varname}}.row();
+    {% endfor %}
+    {% else %}
     {{ openmp_pragma('single') }}
     {{_dynamic_t}}.push_back(t);
 
@@ -18,6 +34,7 @@
     {{ openmp_pragma('single') }}
     {{_recorded}}.resize(_new_size, _num_indices);
     {% endfor %}
+    {% endif %}
 
     // scalar code
 	const int _vectorisation_idx = -1;
@@ -31,9 +48,20 @@
         const int _vectorisation_idx = _idx;
         {{vector_code|autoindent}}
         {% for varname, var in _recorded_variables | dictsort %}
+        {% if state_stream is defined %}
+        _row_{{varname}}[_i] = _to_record_{{varname}};
+        {% else %}
         {% set _recorded =  get_array_name(var, access_data=False) %}
         {{_recorded}}(_new_size-1, _i) = _to_record_{{varname}};
+        {% endif %}
         {% endfor %}
     }
+    {% if state_stream is defined %}
+    {% for varname, var in _recorded_variables | dictsort %}
+    {{state_stream}}_{{varname}}.push_row();
+    {% endfor %}
+    {{N}} += 1;
+    {% else %}
     {{N}} = _new_size;
+    {% endif %}
 {% endblock %}
@@ -0,0 +1,62 @@
+{% macro cpp_file() %}
+// Static arrays (e.g. the values of TimedArrays or the spikes of
+// SpikeGeneratorGroups) that are stored together in a single file, and are
+// accessed directly in the memory-mapped file instead of being copied.
+
+#include "static_arrays.h"
+#include "b2glib/mapped_file.h"
+
+namespace brian {
+
+{% for name, dtype_spec, N, offset in packed_static_array_specs %}
+{{dtype_spec}} *{{name}} = 0;
+const int _num_{{name}} = {{N}};
+{% endfor %}
+
+}
+
+static b2g::MappedFile _packed_static_arrays;
+
+bool _load_static_arrays()
+{
+	if (!_packed_static_arrays.open("{{filename}}", {{size}}))
+		return false;
+	char *_data = _packed_static_arrays.data();
+	{% for name, dtype_spec, N, offset in packed_static_array_specs %}
+	brian::{{name}} = reinterpret_cast<{{dtype_spec}}*>(_data + {{offset}});
+	{% endfor %}
+	return true;
+}
+
+void _unload_static_arrays()
+{
+	{% for name, dtype_spec, N, offset in packed_static_array_specs %}
+	brian::{{name}} = 0;
+	{% endfor %}
+	_packed_static_arrays.close();
+}
+
+{% endmacro %}
+
+{% macro h_file() %}
+
+#ifndef _BRIAN2GENN_STATIC_ARRAYS_H
+#define _BRIAN2GENN_STATIC_ARRAYS_H
+
+#include "brianlib/stdint_compat.h"
+
+namespace brian {
+
+{% for name, dtype_spec, N, offset in packed_static_array_specs %}
+extern {{dtype_spec}} *{{name}};
+extern const int _num_{{name}};
+{% endfor %}
+
+}
+
+bool _load_static_arrays();
+void _unload_static_arrays();
+
+#endif
+
+{% endmacro %}
@@ -0,0 +1,51 @@
+{# USES_VARIABLES { _synaptic_pre, _synaptic_post,
+                    N_incoming, N_outgoing, N,
+                    N_pre, N_post } #}
+{# WRITES_TO_READ_ONLY_VARIABLES { _synaptic_pre, _synaptic_post,
+                                   N_incoming, N_outgoing, N}
+#}
+{# Replaces the synapse creation for synapses that are created by a GeNN
+   connectivity initialisation snippet (see the
+   devices.genn.connectivity_init_on_device preference). GeNN has already
+   created the synapses when this code is executed, they are copied into
+   Brian's data structures in the same order as Brian would have created them
+   (row by row, with ascending postsynaptic indices) #}
+{% extends 'common_synapses.cpp' %}
+
+{% block extra_headers %}
+{{ super() }}
+#include "magicnetwork_model_CODE/definitions.h"
+{% endblock %}
+
+{% block maincode %}
+    const size_t _N_pre = {{constant_or_scalar('N_pre', variables['N_pre'])}};
+    const size_t _N_post = {{constant_or_scalar('N_post', variables['N_post'])}};
+    pull{{owner.name}}ConnectivityFromDevice();
+    size_t _synapses = 0;
+    for (size_t _i = 0; _i < _N_pre; _i++)
+        _synapses += rowLength{{owner.name}}[_i];
+    {{_dynamic__synaptic_pre}}.resize(_synapses);
+    {{_dynamic__synaptic_post}}.resize(_synapses);
+    {{_dynamic_N_incoming}}.assign(_N_post, 0);
+    {{_dynamic_N_outgoing}}.assign(_N_pre, 0);
+    size_t _idx = 0;
+    for (size_t _i = 0; _i < _N_pre; _i++)
+    {
+        const unsigned int *_row = ind{{owner.name}} + _i * maxRowLength{{owner.name}};
+        // GeNN's snippets add the synapses of a row in ascending order
+        for (unsigned int _k = 0; _k < rowLength{{owner.name}}[_i]; _k++, _idx++)
+        {
+            {{_dynamic__synaptic_pre}}[_idx] = _i;
+            {{_dynamic__synaptic_post}}[_idx] = _row[_k];
+            {{_dynamic_N_incoming}}[_row[_k]] += 1;
+        }
+        {{_dynamic_N_outgoing}}[_i] = rowLength{{owner.name}}[_i];
+    }
+    // now we need to resize all registered variables
+    const int32_t newsize = _synapses;
+    {% for varname in owner._registered_variables | variables_to_array_names(access_data=False) | sort %}
+    {{varname}}.resize(newsize);
+    {% endfor %}
+    // Also update the total number of synapses
+    {{N}} = newsize;
+{% endblock %}
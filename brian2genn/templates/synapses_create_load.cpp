@@ -0,0 +1,30 @@
+{# USES_VARIABLES { _synaptic_pre, _synaptic_post,
+                    N_incoming, N_outgoing, N } #}
+{# WRITES_TO_READ_ONLY_VARIABLES { _synaptic_pre, _synaptic_post,
+                                   N_incoming, N_outgoing, N}
+#}
+{# Replaces the synapse creation in the simulation: the synapses have already
+   been created by the same connect call in the model definition, which stored
+   them in a file (see GeNNDevice.make_connectivity_lines), together with the
+   state of the random number generator after the call #}
+{% extends 'common_synapses.cpp' %}
+
+{% block extra_headers %}
+{{ super() }}
+#include "b2glib/synapse_file.h"
+{% endblock %}
+
+{% block maincode %}
+    if (!b2g::read_synapses("{{connectivity_file}}",
+                            {{_dynamic__synaptic_pre}}, {{_dynamic__synaptic_post}},
+                            {{_dynamic_N_incoming}}, {{_dynamic_N_outgoing}},
+                            brian::_mersenne_twister_states[0]))
+        exit(1);
+    // now we need to resize all registered variables
+    const int32_t newsize = {{_dynamic__synaptic_pre}}.size();
+    {% for varname in owner._registered_variables | variables_to_array_names(access_data=False) | sort %}
+    {{varname}}.resize(newsize);
+    {% endfor %}
+    // Also update the total number of synapses
+    {{N}} = newsize;
+{% endblock %}
@@ -0,0 +1,16 @@
+{% macro cpp_file() %}
+{% for block, parameter in run_regularly_blocks %}
+// run_regularly operation {{block}} (if due in this time step)
+if ($({{parameter}}))
+{
+    {{vector_code[block]|autoindent}}
+}
+{% endfor %}
+
+{{vector_code['stateupdate']|autoindent}}
+{% endmacro %}
+
+{% macro h_file() %}
+{{support_code_lines|autoindent}}
+{{hashdefine_lines|autoindent}}
+{% endmacro %}